@@ -0,0 +1,317 @@
+"""
+Module with the async versions of the customer and order endpoints.
+
+The routes mirror the synchronous endpoints in main.py but run on the event
+loop against the psycopg 3 async connection pool, so a single worker can hold
+many in-flight requests. main.py serves these routes when DB_MODE=async.
+"""
+
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+import psycopg
+from async_db import get_async_db, get_async_read_db
+from auth import READ_CUSTOMERS, READ_ORDERS, WRITE_CUSTOMERS, WRITE_ORDERS
+from cache import aread_customer, get_customer_cache
+from bulk import aload_customers, aload_orders, read_bulk_payload
+from export import (
+    CUSTOMER_COLUMNS,
+    ORDER_COLUMNS,
+    async_export_response,
+    customer_export_query,
+    order_export_query,
+)
+from idempotency import (
+    IDEMPOTENCY_HEADER,
+    IDEMPOTENCY_KEY_MAX_LENGTH,
+    SAVE_RESPONSE_SQL,
+    aclaim_key,
+    replay_response,
+    request_hash,
+    save_response_params,
+)
+from listing_cache import aread_watermark, cache_listing, listing_from_cache
+from models import (
+    CustomerCreate,
+    CustomerListQuery,
+    CustomerPage,
+    DailyRevenueQuery,
+    ExportQuery,
+    OrderCreate,
+    OrderExportQuery,
+    OrderListQuery,
+    OrderPage,
+)
+from order_batcher import ORDER_BATCHING, OrderBatchError, UnknownCustomerError, get_order_batcher
+from outbox import INSERT_OUTBOX_SQL, SMS_DELIVERY, outbox_params
+from pagination import (
+    PageTokenError,
+    customer_page,
+    customer_page_query,
+    order_page,
+    order_page_query,
+)
+from responses import TypedJSONResponse
+from sms_dispatcher import SMSJob, get_dispatcher
+from stats import (
+    CUSTOMER_STATS_SQL,
+    DAILY_REVENUE_SQL,
+    customer_stats_page_query,
+    daily_revenue_page,
+    daily_revenue_range,
+)
+
+router = APIRouter()
+
+
+@router.post("/customers/", status_code=201, dependencies=[WRITE_CUSTOMERS])
+async def create_customer(customer: CustomerCreate, conn=Depends(get_async_db)):
+    """
+    Endpoint to add a new customer.
+    """
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO customers (customer_code, name, telephone, location)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (customer_code) DO NOTHING
+            RETURNING customer_id;
+            """,
+            (customer.customer_code, customer.name, customer.telephone, customer.location),
+        )
+        result = await cur.fetchone()
+    if not result:
+        raise HTTPException(status_code=409, detail="Customer code already exists.")
+    await conn.commit()
+    get_customer_cache().invalidate(customer.telephone, customer.customer_code)
+    return {"customer_id": result["customer_id"], "message": "Customer created successfully"}
+
+
+@router.post("/orders/", status_code=201, dependencies=[WRITE_ORDERS])
+async def create_order(
+    order: OrderCreate,
+    conn=Depends(get_async_db),
+    idempotency_key: Optional[str] = Header(
+        None, alias=IDEMPOTENCY_HEADER, max_length=IDEMPOTENCY_KEY_MAX_LENGTH
+    ),
+):
+    """
+    Endpoint to add a new order.
+
+    A retry carrying the Idempotency-Key of an earlier request gets that
+    request's response back instead of creating another order. With
+    ORDER_BATCHING enabled, orders without a key are inserted by the group
+    commit batcher; keyed orders need the key in their own transaction.
+    """
+    try:
+        async with conn.cursor() as cur:
+            if idempotency_key:
+                body_hash = request_hash(order)
+                stored = await aclaim_key(cur, idempotency_key, body_hash)
+                if stored is not None:
+                    await conn.rollback()
+                    return replay_response(stored, body_hash)
+
+            customer = await aread_customer(
+                get_customer_cache(), cur, "telephone", order.telephone
+            )
+            if customer is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Telephone number does not exist. Please provide a valid Telephone number."
+                )
+            job = SMSJob.from_order(order)
+            if ORDER_BATCHING and not idempotency_key:
+                # Inserted and committed together with concurrent orders
+                await conn.rollback()
+                order_id = await get_order_batcher().ainsert(customer["customer_id"], order, job)
+            else:
+                await cur.execute(
+                    """
+                    INSERT INTO orders (customer_id, telephone, item, amount, order_time)
+                    VALUES (%s, %s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP))
+                    RETURNING order_id;
+                    """,
+                    (customer["customer_id"], order.telephone, order.item, order.amount, order.order_time),
+                )
+                order_id = (await cur.fetchone())["order_id"]
+                if SMS_DELIVERY == "outbox":
+                    # Committed atomically with the order, the outbox relay sends it
+                    await cur.execute(INSERT_OUTBOX_SQL, outbox_params(order_id, job))
+            response = {
+                "order_id": order_id,
+                "message": "Order created successfully and notification queued"
+            }
+            if idempotency_key:
+                await cur.execute(
+                    SAVE_RESPONSE_SQL, save_response_params(idempotency_key, 201, response)
+                )
+        await conn.commit()
+    except (psycopg.errors.ForeignKeyViolation, UnknownCustomerError) as exc:
+        raise HTTPException(
+            status_code=400,
+            detail="Telephone number does not exist. Please provide a valid Telephone number."
+        ) from exc
+    except (psycopg.Error, OrderBatchError) as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"An unexpected error occurred: {str(e)}"
+        ) from e
+
+    if SMS_DELIVERY == "queue":
+        # Queue the SMS, the dispatcher workers send it in the background
+        get_dispatcher().enqueue(job)
+
+    return response
+
+
+@router.post("/customers/bulk", status_code=200, dependencies=[WRITE_CUSTOMERS])
+async def bulk_create_customers(payload=Depends(read_bulk_payload), conn=Depends(get_async_db)):
+    """
+    Endpoint to add customers from a JSON array, NDJSON or CSV upload.
+    """
+    report = await aload_customers(conn, payload)
+    cache = get_customer_cache()
+    for index in (row["index"] for row in report["created"]):
+        row = payload.rows[index]
+        cache.invalidate(row.get("telephone"), row.get("customer_code"))
+    return report
+
+
+@router.post("/orders/bulk", status_code=200, dependencies=[WRITE_ORDERS])
+async def bulk_create_orders(payload=Depends(read_bulk_payload), conn=Depends(get_async_db)):
+    """
+    Endpoint to add orders from a JSON array, NDJSON or CSV upload.
+    """
+    report, jobs = await aload_orders(conn, payload, write_outbox=SMS_DELIVERY == "outbox")
+    if SMS_DELIVERY == "queue" and jobs:
+        get_dispatcher().enqueue_many(jobs)
+    return report
+
+
+@router.get("/customers/", status_code=200, response_model=CustomerPage, dependencies=[READ_CUSTOMERS])
+async def list_customers(request: Request, params: CustomerListQuery = Depends(), conn=Depends(get_async_read_db)):
+    """
+    Endpoint to list customers using keyset pagination, with conditional GET
+    and the listing cache.
+
+    Returns:
+        dict: The page of customers and the next_page_token.
+    """
+    try:
+        query, args = customer_page_query(params)
+    except PageTokenError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    async with conn.cursor() as cur:
+        watermark = await aread_watermark(cur, "customers")
+        response = listing_from_cache(request, watermark, params)
+        if response is None:
+            await cur.execute(query, args)
+            page = TypedJSONResponse(customer_page(await cur.fetchall(), params.limit), CustomerPage)
+            response = cache_listing(watermark, params, page)
+        return response
+
+
+@router.get("/orders/", status_code=200, response_model=OrderPage, dependencies=[READ_ORDERS])
+async def list_orders(request: Request, params: OrderListQuery = Depends(), conn=Depends(get_async_read_db)):
+    """
+    Endpoint to list orders using keyset pagination and filters, with
+    conditional GET and the listing cache.
+
+    Returns:
+        dict: The page of orders and the next_page_token.
+    """
+    try:
+        query, args = order_page_query(params)
+    except PageTokenError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    async with conn.cursor() as cur:
+        watermark = await aread_watermark(cur, "orders")
+        response = listing_from_cache(request, watermark, params)
+        if response is None:
+            await cur.execute(query, args)
+            page = TypedJSONResponse(order_page(await cur.fetchall(), params), OrderPage)
+            response = cache_listing(watermark, params, page)
+        return response
+
+
+@router.get("/customers/telephone/{telephone}", status_code=200, dependencies=[READ_CUSTOMERS])
+async def get_customer_by_telephone(telephone: str, conn=Depends(get_async_db)):
+    """
+    Endpoint to read a customer by telephone number through the customer cache.
+    """
+    return await _read_customer_or_404(conn, "telephone", telephone)
+
+
+@router.get("/customers/code/{customer_code}", status_code=200, dependencies=[READ_CUSTOMERS])
+async def get_customer_by_code(customer_code: str, conn=Depends(get_async_db)):
+    """
+    Endpoint to read a customer by customer code through the customer cache.
+    """
+    return await _read_customer_or_404(conn, "customer_code", customer_code)
+
+
+async def _read_customer_or_404(conn, by, value):
+    async with conn.cursor() as cur:
+        customer = await aread_customer(get_customer_cache(), cur, by, value)
+    if customer is None:
+        raise HTTPException(status_code=404, detail="Customer not found.")
+    return customer
+
+
+@router.get("/stats/customers", status_code=200, dependencies=[READ_ORDERS])
+async def list_customer_stats(params: CustomerListQuery = Depends(), conn=Depends(get_async_read_db)):
+    """
+    Endpoint to list per-customer order statistics from the customer_order_stats rollup.
+
+    Returns:
+        dict: The page of customer statistics and the next_page_token.
+    """
+    try:
+        query, args = customer_stats_page_query(params)
+    except PageTokenError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    async with conn.cursor() as cur:
+        await cur.execute(query, args)
+        return customer_page(await cur.fetchall(), params.limit)
+
+
+@router.get("/stats/customers/{customer_id}", status_code=200, dependencies=[READ_ORDERS])
+async def get_customer_stats(customer_id: int, conn=Depends(get_async_read_db)):
+    """
+    Endpoint to read the order statistics of one customer.
+    """
+    async with conn.cursor() as cur:
+        await cur.execute(CUSTOMER_STATS_SQL, (customer_id,))
+        stats = await cur.fetchone()
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Customer not found.")
+    return stats
+
+
+@router.get("/stats/daily-revenue", status_code=200, dependencies=[READ_ORDERS])
+async def get_daily_revenue(params: DailyRevenueQuery = Depends(), conn=Depends(get_async_read_db)):
+    """
+    Endpoint to read the order count and revenue of each day from the daily_revenue rollup.
+    """
+    from_date, to_date = daily_revenue_range(params)
+    if from_date >= to_date:
+        raise HTTPException(status_code=400, detail="from_date must be before to_date.")
+    async with conn.cursor() as cur:
+        await cur.execute(DAILY_REVENUE_SQL, (from_date, to_date))
+        return daily_revenue_page(await cur.fetchall(), from_date, to_date)
+
+
+@router.get("/customers/export", status_code=200, dependencies=[READ_CUSTOMERS])
+async def export_customers(export: ExportQuery = Depends()):
+    """
+    Endpoint to stream all customers as NDJSON or CSV.
+    """
+    return async_export_response(customer_export_query(), CUSTOMER_COLUMNS, export, "customers")
+
+
+@router.get("/orders/export", status_code=200, dependencies=[READ_ORDERS])
+async def export_orders(params: OrderExportQuery = Depends()):
+    """
+    Endpoint to stream orders as NDJSON or CSV, with the same filters as GET /orders/.
+    """
+    return async_export_response(order_export_query(params), ORDER_COLUMNS, params, "orders")
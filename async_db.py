@@ -0,0 +1,233 @@
+"""
+Module managing the psycopg 3 async connection pool used with DB_MODE=async.
+
+The async routes borrow connections from a shared AsyncConnectionPool sized
+by the same DB_POOL_* settings as the synchronous pool in db.py. It is kept
+apart from db.py so that sync workers start without importing psycopg 3.
+The read-only routes go through get_async_read_db, which routes them to the
+replicas in DB_REPLICA_URLS like replicas.get_read_db does for the sync ones.
+"""
+
+from contextlib import AsyncExitStack, asynccontextmanager
+from psycopg import AsyncCursor
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from db import (
+    DB_HOST,
+    DB_NAME,
+    DB_PASSWORD,
+    DB_POOL_IDLE_TIMEOUT,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_PORT,
+    DB_USER,
+)
+from metrics import phase
+from replicas import DB_REPLICA_URLS, Replica, ReplicaRouter, replica_name
+
+
+class TimedAsyncCursor(AsyncCursor):
+    """
+    psycopg 3 AsyncCursor recording the db_execute and db_fetch phases like TimedDictCursor.
+    """
+
+    async def execute(self, query, params=None, **kwargs):  # pylint: disable=arguments-differ
+        with phase("db_execute"):
+            return await super().execute(query, params, **kwargs)
+
+    async def executemany(self, query, params_seq, **kwargs):  # pylint: disable=arguments-differ
+        with phase("db_execute"):
+            return await super().executemany(query, params_seq, **kwargs)
+
+    async def fetchone(self):
+        with phase("db_fetch"):
+            return await super().fetchone()
+
+    async def fetchmany(self, size=0):
+        with phase("db_fetch"):
+            return await super().fetchmany(size)
+
+    async def fetchall(self):
+        with phase("db_fetch"):
+            return await super().fetchall()
+
+
+def get_async_conninfo():
+    """
+    Build the libpq connection string used by the async pool.
+
+    Returns:
+        str: Connection string for the customer_order_db database.
+    """
+    params = {
+        "dbname": DB_NAME,
+        "user": DB_USER,
+        "password": DB_PASSWORD,
+        "host": DB_HOST,
+        "port": DB_PORT,
+    }
+    return make_conninfo(**{key: value for key, value in params.items() if value})
+
+
+def new_async_pool(conninfo):
+    """
+    Create an unopened async pool configured by the DB_POOL_* settings.
+
+    Parameters:
+    - conninfo (str): libpq connection string of the server.
+
+    Returns:
+        psycopg_pool.AsyncConnectionPool: The pool, to be opened by the caller.
+    """
+    return AsyncConnectionPool(
+        conninfo,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        max_idle=DB_POOL_IDLE_TIMEOUT,
+        kwargs={"row_factory": dict_row, "cursor_factory": TimedAsyncCursor},
+        check=AsyncConnectionPool.check_connection,
+        open=False,
+    )
+
+
+_async_pool = None
+_async_router = None
+
+
+async def init_async_pool():
+    """
+    Create and open the psycopg 3 async connection pool.
+
+    Returns:
+        psycopg_pool.AsyncConnectionPool: The shared async connection pool.
+    """
+    global _async_pool  # pylint: disable=global-statement
+    if _async_pool is None:
+        pool = new_async_pool(get_async_conninfo())
+        await pool.open()
+        _async_pool = pool
+    return _async_pool
+
+
+async def get_async_pool():
+    """
+    Return the shared async connection pool, creating it on first use.
+    """
+    if _async_pool is None:
+        return await init_async_pool()
+    return _async_pool
+
+
+async def close_async_pool(timeout=10.0):
+    """
+    Gracefully drain and close the shared async connection pool.
+    """
+    global _async_pool  # pylint: disable=global-statement
+    pool, _async_pool = _async_pool, None
+    if pool is not None:
+        await pool.close(timeout)
+
+
+async def init_async_replicas(urls=None):
+    """
+    Create the async replica router and an async pool per replica.
+
+    Parameters:
+    - urls (list): Replica connection URIs, DB_REPLICA_URLS by default.
+
+    Returns:
+        ReplicaRouter: The shared router, without replicas if none are configured.
+    """
+    global _async_router  # pylint: disable=global-statement
+    if _async_router is None:
+        replicas = []
+        for url in DB_REPLICA_URLS if urls is None else urls:
+            pool = new_async_pool(url)
+            # Connections are opened in the background, an unreachable replica is skipped on checkout
+            await pool.open()
+            replicas.append(Replica(replica_name(url), pool))
+        _async_router = ReplicaRouter(replicas)
+    return _async_router
+
+
+async def get_async_replica_router():
+    """
+    Return the shared async replica router, creating it on first use.
+    """
+    if _async_router is None:
+        return await init_async_replicas()
+    return _async_router
+
+
+async def close_async_replicas(timeout=10.0):
+    """
+    Drain and close the async replica pools.
+    """
+    global _async_router  # pylint: disable=global-statement
+    router, _async_router = _async_router, None
+    if router is not None:
+        for replica in router.replicas:
+            await replica.pool.close(timeout)
+
+
+def async_pool_stats(pool):
+    """
+    Report async pool metrics using the same keys as ConnectionPool.stats.
+
+    Parameters:
+    - pool (psycopg_pool.AsyncConnectionPool): The pool to inspect.
+
+    Returns:
+        dict: Pool size limits and the checked_out, idle, waiting, created and recycled counters.
+    """
+    stats = pool.get_stats()
+    size = stats.get("pool_size", 0)
+    idle = stats.get("pool_available", 0)
+    return {
+        "min_size": stats.get("pool_min", pool.min_size),
+        "max_size": stats.get("pool_max", pool.max_size),
+        "size": size,
+        "checked_out": size - idle,
+        "idle": idle,
+        "waiting": stats.get("requests_waiting", 0),
+        "created": stats.get("connections_num", 0),
+        "recycled": stats.get("connections_lost", 0) + stats.get("returns_bad", 0),
+    }
+
+
+async def get_async_db():
+    """
+    FastAPI dependency yielding an async pooled connection for the duration of a request.
+
+    The connection is a psycopg.AsyncConnection whose cursors return dict rows.
+    """
+    pool = await get_async_pool()
+    async with AsyncExitStack() as stack:
+        with phase("db_acquire"):
+            conn = await stack.enter_async_context(pool.connection())
+        yield conn
+
+
+@asynccontextmanager
+async def async_read_connection():
+    """
+    Async context manager yielding a connection for a read-only query, from
+    a replica when one can serve it and from the primary otherwise.
+    """
+    pool = await get_async_pool()
+    router = await get_async_replica_router()
+    async with router.aconnection(pool) as conn:
+        yield conn
+
+
+async def get_async_read_db():
+    """
+    FastAPI dependency yielding an async connection for read-only endpoints.
+    """
+    async with AsyncExitStack() as stack:
+        with phase("db_acquire"):
+            conn = await stack.enter_async_context(async_read_connection())
+        yield conn
@@ -0,0 +1,354 @@
+"""
+Module verifying the OAuth 2.0 access tokens sent to the API.
+
+Tokens are verified locally against the identity provider's signing keys
+(its JWKS), without a call to the provider per request. The key set is
+fetched once and cached; a background thread refreshes it every
+JWKS_REFRESH_INTERVAL seconds, and a token signed with a key id that is not
+cached triggers an immediate refresh, at most once every
+JWKS_MIN_REFRESH_INTERVAL seconds so made-up key ids cannot flood the
+provider. Verified claims are cached until the token expires, so a client
+reusing its token costs a dictionary lookup.
+
+Routes declare the scopes they need with require_scopes(). Scopes are read
+from the token's "scope" claim and from Auth0's "permissions" claim. With
+AUTH_ENABLED=false (the default) the routes stay open.
+"""
+
+import threading
+import time
+from authlib.jose import JsonWebKey, JsonWebToken
+from authlib.jose.errors import JoseError
+from fastapi import Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPBearer
+from cache import TTLCache
+from http_client import get_http_client
+from metrics import phase
+from settings import env
+
+AUTH_ENABLED = env.bool("AUTH_ENABLED", False)
+AUTH0_DOMAIN = env.str("AUTH0_DOMAIN")
+AUTH0_API_AUDIENCE = env.str("AUTH0_API_AUDIENCE")
+# Default to Auth0's issuer and key set URLs for AUTH0_DOMAIN
+AUTH_ISSUER = env.str("AUTH_ISSUER") or f"https://{AUTH0_DOMAIN}/"
+AUTH_JWKS_URL = env.str("AUTH_JWKS_URL") or f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"
+# Seconds of clock skew tolerated on exp, nbf and iat
+AUTH_LEEWAY = env.int("AUTH_LEEWAY", 30)
+AUTH_CLAIMS_CACHE_SIZE = env.int("AUTH_CLAIMS_CACHE_SIZE", 10000)
+JWKS_REFRESH_INTERVAL = env.float("JWKS_REFRESH_INTERVAL", 3600)
+JWKS_MIN_REFRESH_INTERVAL = env.float("JWKS_MIN_REFRESH_INTERVAL", 30)
+JWKS_FETCH_TIMEOUT = env.float("JWKS_FETCH_TIMEOUT", 5)
+
+# Only asymmetric signatures, so a token cannot be signed with a public key as an HMAC secret
+AUTH_ALGORITHMS = ["RS256"]
+
+
+class AuthError(Exception):
+    """
+    Raised when an access token is missing, malformed, expired or not trusted.
+    """
+
+
+class UnknownKeyError(AuthError):
+    """
+    Raised when a token is signed with a key id missing from the cached key set.
+    """
+
+    def __init__(self, kid):
+        super().__init__(f"Token signed with unknown key {kid!r}.")
+        self.kid = kid
+
+
+def fetch_jwks(url, timeout=JWKS_FETCH_TIMEOUT):
+    """
+    Download a JSON Web Key Set.
+
+    Returns:
+        dict: The key set document.
+    """
+    response = get_http_client().get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+class JWKSCache:
+    """
+    Cached signing keys of the identity provider, by key id.
+    """
+
+    def __init__(
+        self,
+        url=AUTH_JWKS_URL,
+        fetch=fetch_jwks,
+        refresh_interval=JWKS_REFRESH_INTERVAL,
+        min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL,
+        clock=time.monotonic,
+    ):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._fetch = fetch
+        self._clock = clock
+        self._keys = {}  # replaced as a whole on refresh, so reads need no lock
+        self._last_refresh = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._stats = {"refreshes": 0, "refresh_errors": 0}
+
+    def get(self, kid):
+        """
+        Return the cached key with this key id, or None.
+        """
+        return self._keys.get(kid)
+
+    def refresh(self):
+        """
+        Download the key set and replace the cached keys.
+        """
+        with self._lock:
+            self._refresh()
+
+    def refresh_for(self, kid):
+        """
+        Refresh the key set because a token named an unknown key id, unless
+        the last refresh was less than min_refresh_interval seconds ago.
+
+        Returns:
+            bool: True if the key is cached afterwards.
+        """
+        with self._lock:
+            # Another request may have refreshed while this one waited
+            if kid in self._keys:
+                return True
+            if self._last_refresh is not None and self._clock() - self._last_refresh < self.min_refresh_interval:
+                return False
+            try:
+                self._refresh()
+            except Exception as e:  # pylint: disable=broad-except
+                print("Error refreshing the JWKS:", e)
+                return False
+            return kid in self._keys
+
+    def _refresh(self):
+        self._last_refresh = self._clock()
+        try:
+            key_set = JsonWebKey.import_key_set(self._fetch(self.url))
+        except Exception:
+            self._stats["refresh_errors"] += 1
+            raise
+        self._keys = {key.kid: key for key in key_set.keys}
+        self._stats["refreshes"] += 1
+
+    def start(self):
+        """
+        Load the keys and refresh them from a background thread.
+
+        A provider that cannot be reached at startup is retried when the first
+        token arrives, it does not stop the API from starting.
+        """
+        try:
+            self.refresh()
+        except Exception as e:  # pylint: disable=broad-except
+            print("Error loading the JWKS:", e)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="jwks-refresh", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the background refresh.
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        """
+        Snapshot of the refresh counters and the number of cached keys.
+        """
+        with self._lock:
+            return dict(self._stats, keys=len(self._keys))
+
+    def _run(self):
+        while not self._stopping.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:  # pylint: disable=broad-except
+                # Keep the current keys, they stay valid until the provider drops them
+                print("Error refreshing the JWKS:", e)
+
+
+class TokenVerifier:
+    """
+    Verifies RS256 access tokens for one issuer and audience and caches their claims.
+    """
+
+    def __init__(
+        self,
+        jwks,
+        issuer=AUTH_ISSUER,
+        audience=AUTH0_API_AUDIENCE,
+        leeway=AUTH_LEEWAY,
+        claims_cache_size=AUTH_CLAIMS_CACHE_SIZE,
+    ):
+        self.jwks = jwks
+        self.leeway = leeway
+        self.claims_cache = TTLCache(maxsize=claims_cache_size, ttl=0)
+        self._jwt = JsonWebToken(AUTH_ALGORITHMS)
+        self._claims_options = {
+            "iss": {"essential": True, "value": issuer},
+            "aud": {"essential": True, "value": audience},
+            "exp": {"essential": True},
+        }
+
+    def verify(self, token):
+        """
+        Verify a token, refreshing the key set if it names an unknown key.
+
+        Parameters:
+        - token (str): The encoded access token.
+
+        Returns:
+            dict: The token's claims.
+
+        Raises:
+            AuthError: If the token is not valid.
+        """
+        try:
+            return self._verify(token)
+        except UnknownKeyError as exc:
+            self.jwks.refresh_for(exc.kid)
+        return self._verify(token)
+
+    async def averify(self, token):
+        """
+        Same as verify, but downloads the key set in the threadpool instead
+        of blocking the event loop.
+        """
+        try:
+            return self._verify(token)
+        except UnknownKeyError as exc:
+            await run_in_threadpool(self.jwks.refresh_for, exc.kid)
+        return self._verify(token)
+
+    def _verify(self, token):
+        claims = self.claims_cache.get(token)
+        if claims is not None:
+            return claims
+        try:
+            decoded = self._jwt.decode(token, self._key, claims_options=self._claims_options)
+            decoded.validate(leeway=self.leeway)
+        except JoseError as exc:
+            raise AuthError(f"Invalid token: {exc.description or exc.error}.") from exc
+        except ValueError as exc:
+            raise AuthError("Invalid token.") from exc
+        claims = dict(decoded)
+        # Cached until the token expires, so expired tokens are never served from the cache
+        lifetime = claims["exp"] - time.time()
+        if lifetime > 0:
+            self.claims_cache.set(token, claims, ttl=lifetime)
+        return claims
+
+    def _key(self, header, _payload):
+        key = self.jwks.get(header.get("kid"))
+        if key is None:
+            raise UnknownKeyError(header.get("kid"))
+        return key
+
+
+def token_scopes(claims):
+    """
+    Return the scopes granted by a token's claims.
+
+    Returns:
+        set: The space-separated "scope" claim plus Auth0's "permissions" list.
+    """
+    scopes = set((claims.get("scope") or "").split())
+    scopes.update(claims.get("permissions") or ())
+    return scopes
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier():
+    """
+    Return the shared token verifier, creating it on first use.
+    """
+    global _verifier  # pylint: disable=global-statement
+    with _verifier_lock:
+        if _verifier is None:
+            _verifier = TokenVerifier(JWKSCache())
+        return _verifier
+
+
+def start_verifier():
+    """
+    Load the signing keys and start their background refresh.
+    """
+    get_verifier().jwks.start()
+
+
+def stop_verifier():
+    """
+    Stop the background key refresh of the shared verifier.
+    """
+    global _verifier  # pylint: disable=global-statement
+    with _verifier_lock:
+        verifier, _verifier = _verifier, None
+    if verifier is not None:
+        verifier.jwks.stop()
+
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def require_scopes(*scopes):
+    """
+    Build a route dependency that requires a valid access token granting scopes.
+
+    Parameters:
+    - scopes (str): The scopes the route needs, all of which must be granted.
+
+    Returns:
+        callable: A FastAPI dependency returning the token's claims, or None
+        when AUTH_ENABLED is false.
+    """
+    async def check_scopes(credentials=Depends(bearer_scheme)):
+        if not AUTH_ENABLED:
+            return None
+        if credentials is None:
+            raise HTTPException(
+                status_code=401, detail="Not authenticated.", headers={"WWW-Authenticate": "Bearer"}
+            )
+        with phase("auth"):
+            try:
+                claims = await get_verifier().averify(credentials.credentials)
+            except AuthError as exc:
+                raise HTTPException(
+                    status_code=401,
+                    detail=str(exc),
+                    headers={"WWW-Authenticate": 'Bearer error="invalid_token"'},
+                ) from exc
+        missing = set(scopes) - token_scopes(claims)
+        if missing:
+            raise HTTPException(
+                status_code=403,
+                detail=f"Missing scope: {' '.join(sorted(missing))}.",
+                headers={"WWW-Authenticate": f'Bearer error="insufficient_scope", scope="{" ".join(scopes)}"'},
+            )
+        return claims
+
+    return check_scopes
+
+
+# Route dependencies shared by main.py and async_api.py
+READ_CUSTOMERS = Depends(require_scopes("read:customers"))
+WRITE_CUSTOMERS = Depends(require_scopes("write:customers"))
+READ_ORDERS = Depends(require_scopes("read:orders"))
+WRITE_ORDERS = Depends(require_scopes("write:orders"))
@@ -0,0 +1,164 @@
+"""
+Response encoding benchmark for the order listing.
+
+Builds pages of generated order rows, shaped like the ones psycopg2 returns
+(Decimal amounts, datetime order times), and measures for each page size:
+
+- encode: the time to turn the page into JSON bytes, with FastAPI's default
+  path (jsonable_encoder then json.dumps) and with TypedJSONResponse's
+  pydantic serializer.
+- compress: the time and bytes on the wire of the JSON with gzip at
+  COMPRESSION_GZIP_LEVEL and, when the brotli package is installed, brotli at
+  COMPRESSION_BROTLI_QUALITY.
+
+No database is needed.
+
+Usage:
+    python3 benchmarks/encode.py --rows 10000 1000000 --runs 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # pylint: disable=wrong-import-position
+from compression import (  # pylint: disable=wrong-import-position
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_GZIP_LEVEL,
+    BrotliCompressor,
+    GzipCompressor,
+    brotli,
+)
+from models import OrderPage  # pylint: disable=wrong-import-position
+from responses import type_adapter  # pylint: disable=wrong-import-position
+
+ITEMS = ("Pizza", "Burger", "Salad", "Soda", "Fries", "Noodles")
+
+
+def generate_page(rows):
+    """
+    Build an order page of the given number of rows.
+    """
+    started = datetime(2024, 1, 1)
+    items = [
+        {
+            "order_id": order_id,
+            "customer_id": order_id % 10000 + 1,
+            "telephone": f"+2547{order_id % 10000:08d}",
+            "item": ITEMS[order_id % len(ITEMS)],
+            "amount": Decimal(order_id % 5000) / 100,
+            "order_time": started + timedelta(seconds=order_id * 7),
+        }
+        for order_id in range(1, rows + 1)
+    ]
+    return {"items": items, "next_page_token": "MTAwMDAw"}
+
+
+def encode_default(page):
+    """
+    Encode a page the way FastAPI's default JSONResponse does.
+    """
+    return json.dumps(
+        jsonable_encoder(page), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def encode_typed(page):
+    """
+    Encode a page the way TypedJSONResponse does.
+    """
+    return type_adapter(OrderPage).dump_json(page)
+
+
+def compress(compressor, body):
+    """
+    Compress a body in one go.
+    """
+    return compressor.compress(body) + compressor.finish()
+
+
+def best_of(runs, function, *args):
+    """
+    Run a function several times.
+
+    Returns:
+        tuple: The fastest run in milliseconds and the last result.
+    """
+    seconds = []
+    result = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function(*args)
+        seconds.append(time.perf_counter() - started)
+    return round(min(seconds) * 1000, 1), result
+
+
+def measure(rows, runs):
+    """
+    Measure encoding and compression of one page size.
+
+    Returns:
+        dict: Milliseconds and bytes per method.
+    """
+    page = generate_page(rows)
+    default_ms, default_body = best_of(runs, encode_default, page)
+    typed_ms, typed_body = best_of(runs, encode_typed, page)
+    if json.loads(default_body) != json.loads(typed_body):
+        raise SystemExit("The typed encoding differs from the default one.")
+
+    result = {
+        "encode": {
+            "default_ms": default_ms,
+            "typed_ms": typed_ms,
+            "speedup": round(default_ms / typed_ms, 1) if typed_ms else None,
+        },
+        "bytes": {"identity": len(typed_body)},
+        "compress_ms": {},
+    }
+    compressors = {"gzip": lambda: GzipCompressor(COMPRESSION_GZIP_LEVEL)}
+    if brotli is not None:
+        compressors["br"] = lambda: BrotliCompressor(COMPRESSION_BROTLI_QUALITY)
+    for name, factory in compressors.items():
+        milliseconds, body = best_of(runs, lambda: compress(factory(), typed_body))
+        result["compress_ms"][name] = milliseconds
+        result["bytes"][name] = len(body)
+    return result
+
+
+def main():
+    """
+    Run the benchmark and print, or write, the results.
+    """
+    parser = argparse.ArgumentParser(description="Measure response encoding and compression.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "gzip_level": COMPRESSION_GZIP_LEVEL,
+            "brotli_quality": COMPRESSION_BROTLI_QUALITY if brotli is not None else None,
+        },
+        "rows": {},
+    }
+    for rows in args.rows:
+        results["rows"][str(rows)] = measure(rows, args.runs)
+        print(f"{rows} rows: {json.dumps(results['rows'][str(rows)])}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
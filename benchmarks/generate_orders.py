@@ -0,0 +1,89 @@
+"""
+Generate customers and orders for load and benchmark runs.
+
+Orders are spread evenly over the last --months months in time order, as
+they would have arrived, so they land in the matching monthly partitions.
+Generated customers use codes GEN<n> and can be rerun against the same
+database; orders are always added.
+
+Usage:
+    python3 benchmarks/generate_orders.py --orders 10000000 --customers 100000 --months 24
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT  # pylint: disable=wrong-import-position
+from partitions import add_months, month_start  # pylint: disable=wrong-import-position
+
+GENERATE_CUSTOMERS_SQL = """
+    INSERT INTO customers (customer_code, name, telephone, location)
+    SELECT 'GEN' || n, 'Generated customer ' || n, '+2549' || lpad(n::text, 8, '0'), 'Nairobi'
+    FROM generate_series(1, %(customers)s) AS n
+    ON CONFLICT DO NOTHING;
+"""
+
+GENERATE_ORDERS_SQL = """
+    INSERT INTO orders (customer_id, telephone, item, amount, order_time)
+    SELECT c.customer_id, c.telephone, 'Item ' || (n %% 500), (n %% 10000) / 100.0,
+           %(start)s + (n - 1) * %(step)s
+    FROM generate_series(%(first)s, %(last)s) AS n
+    JOIN customers c ON c.customer_code = 'GEN' || (1 + (n * 7919) %% %(customers)s)
+    ORDER BY n;
+"""
+
+
+def generate_orders(cur, customers, orders, months, end=None, chunk=1_000_000):
+    """
+    Insert generated customers and orders through the given cursor.
+
+    Parameters:
+    - cur: Cursor whose search_path points at the target tables.
+    - customers (int): Number of customers to create.
+    - orders (int): Number of orders to create.
+    - months (int): Orders cover this many whole months before end.
+    - end (datetime): End of the covered period, the start of next month by default.
+    - chunk (int): Orders inserted per statement.
+
+    Returns:
+        float: Seconds spent inserting orders.
+    """
+    end = end or add_months(month_start(datetime.now()), 1)
+    start = add_months(end, -months)
+    cur.execute(GENERATE_CUSTOMERS_SQL, {"customers": customers})
+    step = (end - start) / orders
+    started = time.perf_counter()
+    for first in range(1, orders + 1, chunk):
+        last = min(first + chunk - 1, orders)
+        cur.execute(GENERATE_ORDERS_SQL, {
+            "customers": customers, "start": start, "step": step, "first": first, "last": last,
+        })
+        print(f"Generated orders {first} to {last}.", file=sys.stderr)
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate customers and orders.")
+    parser.add_argument("--orders", type=int, default=10_000_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--months", type=int, default=24)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(
+        dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
+    )
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            seconds = generate_orders(cursor, args.customers, args.orders, args.months)
+            cursor.execute("ANALYZE customers; ANALYZE orders;")
+        print(f"Inserted {args.orders} orders in {seconds:.1f}s.")
+    finally:
+        conn.close()
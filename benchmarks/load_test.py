@@ -0,0 +1,386 @@
+"""
+Load test harness for the customer and order API.
+
+Three commands:
+
+- seed: create the database, apply the migrations and generate customers and
+  orders (see generate_orders.py). Point DB_NAME at a database kept for
+  benchmarks, the generated rows are added to whatever is there.
+- run: start the API (serve.py) with the SMS gateway and OIDC provider
+  stubbed, drive each endpoint in turn with concurrent requests, and write
+  p50/p95/p99 latency, throughput, errors and PostgreSQL connection counts
+  per endpoint to a JSON file named after the current commit.
+- compare: diff two result files and exit non-zero when an endpoint got
+  slower or lost throughput by more than --max-regression.
+
+Usage:
+    python3 benchmarks/load_test.py seed --customers 100000 --orders 1000000
+    python3 benchmarks/load_test.py run --concurrency 32 --duration 30
+    python3 benchmarks/load_test.py compare results/old.json results/new.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+import psycopg2
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from db import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+from generate_orders import generate_orders
+from stubs import OIDCStub
+
+RESULTS_DIR = os.path.join(HERE, "results")
+
+CONNECTIONS_SQL = """
+    SELECT count(*), count(*) FILTER (WHERE state = 'active')
+    FROM pg_stat_activity
+    WHERE datname = %s AND pid <> pg_backend_pid();
+"""
+
+
+def connect():
+    """
+    Open a connection to the benchmark database.
+    """
+    return psycopg2.connect(
+        dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
+    )
+
+
+# Each scenario builds (method, path, params, json) for one request from a
+# random generator and a sample of existing customer telephone numbers.
+SCENARIOS = {
+    "create_order": lambda rng, phones: ("POST", "/orders/", None, {
+        "telephone": rng.choice(phones),
+        "item": f"Item {rng.randrange(500)}",
+        "amount": round(rng.uniform(1, 500), 2),
+    }),
+    "list_orders": lambda rng, phones: ("GET", "/orders/", {"limit": 50}, None),
+    "list_orders_by_customer": lambda rng, phones: (
+        "GET", "/orders/", {"limit": 50, "telephone": rng.choice(phones)}, None
+    ),
+    "list_customers": lambda rng, phones: ("GET", "/customers/", {"limit": 50}, None),
+    "get_customer": lambda rng, phones: (
+        "GET", f"/customers/telephone/{rng.choice(phones)}", None, None
+    ),
+    "customer_stats": lambda rng, phones: ("GET", "/stats/customers", {"limit": 50}, None),
+}
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarise(latencies, errors, seconds, connections):
+    """
+    Turn one scenario's raw measurements into its result entry.
+
+    Parameters:
+    - latencies (list): Seconds taken by each successful request.
+    - errors (int): Requests that failed or returned a 5xx/4xx status.
+    - seconds (float): Length of the measured window.
+    - connections (list): (total, active) PostgreSQL connection samples.
+
+    Returns:
+        dict: Request counts, throughput, latency percentiles in
+        milliseconds and connection counts.
+    """
+    latencies = sorted(latencies)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    totals = [total for total, _ in connections]
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "db_connections": {
+            "max": max(totals, default=0),
+            "mean": round(statistics.mean(totals), 1) if totals else 0,
+            "max_active": max((active for _, active in connections), default=0),
+        },
+    }
+
+
+class ConnectionSampler:
+    """
+    Samples the number of PostgreSQL connections to the benchmark database.
+    """
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        conn = connect()
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                while not self._stop.is_set():
+                    cur.execute(CONNECTIONS_SQL, (DB_NAME,))
+                    self.samples.append(cur.fetchone())
+                    self._stop.wait(self.interval)
+        finally:
+            conn.close()
+
+
+async def drive(client, scenario, phones, concurrency, duration, warmup, seed):
+    """
+    Send requests for one scenario from concurrency workers.
+
+    Returns:
+        tuple: Latencies of successful requests and the error count, both
+        counted after the warmup only.
+    """
+    latencies, errors = [], 0
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+
+    async def worker(worker_id):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            method, path, params, body = SCENARIOS[scenario](rng, phones)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, params=params, json=body)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if started < measure_from:
+                continue
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies, errors
+
+
+def sample_telephones(limit=1000):
+    """
+    Pick telephone numbers of existing customers to send orders for.
+    """
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT telephone FROM customers ORDER BY random() LIMIT %s;", (limit,))
+            phones = [row[0] for row in cur.fetchall()]
+    finally:
+        conn.close()
+    if not phones:
+        raise SystemExit("No customers found, run the seed command first.")
+    return phones
+
+
+def start_server(port, stub):
+    """
+    Start serve.py and wait until it answers.
+
+    Returns:
+        subprocess.Popen: The server process.
+    """
+    env = dict(os.environ, OIDC_STUB_URL=stub.url, SMS_BACKEND="fake")
+    process = subprocess.Popen([sys.executable, os.path.join(HERE, "serve.py"), "--port", str(port)], env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("The API exited during startup.")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/openapi.json", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("The API did not start within 30 seconds.")
+
+
+def git_commit():
+    """
+    The current commit and whether the working tree has local changes.
+    """
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=False)
+        return result.stdout.strip()
+
+    return git("rev-parse", "--short", "HEAD") or "unknown", bool(git("status", "--porcelain"))
+
+
+def run(args):
+    """
+    Run every selected scenario against the API and write the results file.
+    """
+    phones = sample_telephones()
+    stub = OIDCStub().start()
+    process = None if args.url else start_server(args.port, stub)
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    token = stub.issue_token(scope="read:customers write:customers read:orders write:orders")
+    commit, dirty = git_commit()
+    results = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "url": base_url,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "db_mode": os.getenv("DB_MODE", "sync"),
+            "sms_fake_latency": float(os.getenv("SMS_FAKE_LATENCY", "0")),
+        },
+        "endpoints": {},
+    }
+    try:
+        async def all_scenarios():
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            headers = {"Authorization": f"Bearer {token}"}
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, headers=headers, timeout=30) as client:
+                for name in args.endpoints:
+                    with ConnectionSampler() as sampler:
+                        latencies, errors = await drive(
+                            client, name, phones, args.concurrency, args.duration, args.warmup, args.seed
+                        )
+                    results["endpoints"][name] = summarise(latencies, errors, args.duration, sampler.samples)
+                    print(f"{name}: {json.dumps(results['endpoints'][name])}", file=sys.stderr)
+
+        asyncio.run(all_scenarios())
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        stub.stop()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}_{commit}{'-dirty' if dirty else ''}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(output)
+
+
+def compare(old, new, max_regression):
+    """
+    Compare two result files endpoint by endpoint.
+
+    Returns:
+        list: Descriptions of the regressions beyond max_regression.
+    """
+    regressions = []
+    for name, before in old["endpoints"].items():
+        after = new["endpoints"].get(name)
+        if after is None:
+            continue
+        print(f"{name}:")
+        for metric, higher_is_worse in (("rps", False), ("p50_ms", True), ("p95_ms", True), ("p99_ms", True)):
+            if not before.get(metric) or after.get(metric) is None:
+                continue
+            change = (after[metric] - before[metric]) / before[metric]
+            worse = change > max_regression if higher_is_worse else change < -max_regression
+            flag = "  REGRESSION" if worse else ""
+            print(f"  {metric:>7}: {before[metric]:>10} -> {after[metric]:>10} ({change:+.1%}){flag}")
+            if worse:
+                regressions.append(f"{name} {metric} {change:+.1%}")
+    return regressions
+
+
+def seed(args):
+    """
+    Create, migrate and fill the benchmark database.
+    """
+    # Imported here so that run and compare do not need the migration tooling
+    from customer_order_db import create_database  # pylint: disable=import-outside-toplevel
+    from migrate import Migrator  # pylint: disable=import-outside-toplevel
+
+    create_database()
+    Migrator().migrate()
+    conn = connect()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            seconds = generate_orders(cur, args.customers, args.orders, args.months)
+            cur.execute("ANALYZE;")
+    finally:
+        conn.close()
+    print(f"Seeded {args.customers} customers and {args.orders} orders in {seconds:.1f}s.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the customer and order API.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="create and fill the benchmark database")
+    seed_parser.add_argument("--customers", type=int, default=10_000)
+    seed_parser.add_argument("--orders", type=int, default=1_000_000)
+    seed_parser.add_argument("--months", type=int, default=12)
+
+    run_parser = commands.add_parser("run", help="run the load test and store the results")
+    run_parser.add_argument("--url", help="test an API that is already running instead of starting one")
+    run_parser.add_argument("--port", type=int, default=8001)
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--duration", type=float, default=30, help="measured seconds per endpoint")
+    run_parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds per endpoint")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument(
+        "--endpoints", type=lambda value: value.split(","), default=list(SCENARIOS),
+        help=f"comma-separated scenarios, default all of {','.join(SCENARIOS)}",
+    )
+    run_parser.add_argument("--output", help="results file, results/<time>_<commit>.json by default")
+
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--max-regression", type=float, default=0.10)
+
+    cli_args = parser.parse_args()
+    if cli_args.command == "seed":
+        seed(cli_args)
+    elif cli_args.command == "run":
+        unknown = set(cli_args.endpoints) - set(SCENARIOS)
+        if unknown:
+            parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+        run(cli_args)
+    else:
+        with open(cli_args.old, encoding="utf-8") as old_file, open(cli_args.new, encoding="utf-8") as new_file:
+            found = compare(json.load(old_file), json.load(new_file), cli_args.max_regression)
+        if found:
+            print(f"{len(found)} regression(s): {'; '.join(found)}")
+            sys.exit(1)
@@ -0,0 +1,119 @@
+"""
+Fan-out benchmark for the live order feed.
+
+Runs an OrderFeed in-process with N subscribers, each drained by its own
+task the way a StreamingResponse drains it, publishes events as the
+listener thread would and measures how long it takes until every
+subscriber has received each event. A share of the subscribers can be made
+slow (they stop reading) to check they do not delay the others.
+
+No database or network is involved: this measures the cost the feed itself
+adds per worker, not the delivery over sockets.
+
+Usage:
+    python3 benchmarks/order_feed.py --subscribers 1000 5000 10000 --events 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_feed import OrderFeed, encode_orders  # pylint: disable=wrong-import-position
+
+ORDER = {"order_id": 1, "customer_id": 1, "telephone": "+254700000000", "item": "Pizza",
+         "amount": 20.5, "order_time": "2024-11-16T12:00:00"}
+
+
+async def measure(subscribers, events, slow_share, orders_per_event):
+    """
+    Publish events to subscribers and time their delivery.
+
+    Returns:
+        dict: Median and worst fan-out times in milliseconds, and the resets
+        sent to slow subscribers.
+    """
+    feed = OrderFeed(max_subscribers=subscribers)
+    remaining = {"count": 0}
+    delivered = asyncio.Event()
+
+    async def consume(subscriber, slow):
+        async for _event in feed.stream(subscriber):
+            remaining["count"] -= 1
+            if remaining["count"] == 0:
+                delivered.set()
+            if slow:
+                # Stops reading after its first event, like a stalled client
+                await asyncio.sleep(3600)
+
+    slow_count = int(subscribers * slow_share)
+    fast = []
+    tasks = []
+    for index in range(subscribers):
+        subscriber = feed.subscribe()
+        slow = index < slow_count
+        if not slow:
+            fast.append(subscriber)
+        tasks.append(asyncio.create_task(consume(subscriber, slow)))
+    # Let every stream send its first (retry) event
+    remaining["count"] = subscribers
+    await delivered.wait()
+
+    event = encode_orders([dict(ORDER, order_id=number) for number in range(orders_per_event)])
+    seconds = []
+    for _ in range(events):
+        delivered.clear()
+        remaining["count"] = len(fast)
+        started = time.perf_counter()
+        feed.publish(event)
+        await delivered.wait()
+        seconds.append(time.perf_counter() - started)
+
+    resets = sum(1 for subscriber in list(feed._subscribers) if subscriber.resets)  # pylint: disable=protected-access
+    feed.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {
+        "median_ms": round(statistics.median(seconds) * 1000, 2),
+        "max_ms": round(max(seconds) * 1000, 2),
+        "event_bytes": len(event),
+        "slow_subscribers_reset": resets,
+    }
+
+
+def main():
+    """
+    Run the benchmark and print, or write, the results.
+    """
+    parser = argparse.ArgumentParser(description="Measure the order feed fan-out.")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--orders-per-event", type=int, default=1)
+    parser.add_argument("--slow-share", type=float, default=0.01, help="share of subscribers that stop reading")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {"started_at": datetime.now(timezone.utc).isoformat(), "python": sys.version.split()[0]},
+        "subscribers": {},
+    }
+    for subscribers in args.subscribers:
+        result = asyncio.run(measure(subscribers, args.events, args.slow_share, args.orders_per_event))
+        results["subscribers"][str(subscribers)] = result
+        print(f"{subscribers} subscribers: {json.dumps(result)}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Benchmark the monthly-partitioned orders table against a single table.
+
+Both layouts are created side by side in their own PostgreSQL schemas with the
+same indexes, loaded by generate_orders.py with the same rows, and then
+measured for:
+
+- bulk load and single-row insert throughput (the create_order INSERT),
+- one-month range aggregates and time-filtered listing pages, with the
+  number of partitions each plan touches,
+- VACUUM of the data that receives new writes: the whole single table
+  against only the current month's partition.
+
+Results are printed as JSON.
+
+Usage:
+    python3 benchmarks/orders_partitioning.py --orders 10000000 --months 24
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from db import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+from partitions import add_months, month_start, partition_name
+from generate_orders import generate_orders
+
+CUSTOMERS_TABLE = """
+    CREATE TABLE customers (
+        customer_id SERIAL PRIMARY KEY,
+        customer_code VARCHAR(50) UNIQUE NOT NULL,
+        name VARCHAR(100) NOT NULL,
+        telephone VARCHAR(15) UNIQUE NOT NULL,
+        location VARCHAR(100)
+    );
+"""
+
+ORDERS_COLUMNS = """
+    order_id SERIAL,
+    customer_id INTEGER NOT NULL REFERENCES customers(customer_id) ON DELETE CASCADE,
+    telephone VARCHAR(15),
+    item VARCHAR(255) NOT NULL,
+    amount NUMERIC(10, 2) NOT NULL CHECK (amount >= 0),
+    order_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+"""
+
+ORDERS_INDEXES = """
+    CREATE INDEX ON orders (customer_id, order_time);
+    CREATE INDEX ON orders USING BRIN (order_time);
+    CREATE INDEX ON orders (telephone, order_id);
+    CREATE INDEX ON orders (order_time, order_id);
+    CREATE INDEX ON orders (item text_pattern_ops);
+"""
+
+LAYOUTS = {
+    "bench_single": f"""
+        CREATE TABLE orders ({ORDERS_COLUMNS}, PRIMARY KEY (order_id));
+    """,
+    "bench_partitioned": f"""
+        CREATE TABLE orders ({ORDERS_COLUMNS}, PRIMARY KEY (order_id, order_time))
+            PARTITION BY RANGE (order_time);
+        CREATE TABLE orders_default PARTITION OF orders DEFAULT;
+    """,
+}
+
+INSERT_ORDER_SQL = """
+    INSERT INTO orders (customer_id, telephone, item, amount, order_time)
+    VALUES (%s, %s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP))
+    RETURNING order_id;
+"""
+
+RANGE_AGGREGATE_SQL = """
+    SELECT count(*), sum(amount) FROM orders
+    WHERE order_time >= %s AND order_time < %s;
+"""
+
+# The list endpoint's query for a time-filtered page
+RANGE_PAGE_SQL = """
+    SELECT * FROM orders
+    WHERE order_time >= %s AND order_time < %s AND order_id > %s
+    ORDER BY order_id ASC LIMIT 51;
+"""
+
+
+def create_layout(cur, schema, months, now):
+    """
+    Recreate one benchmark schema, with monthly partitions if partitioned.
+    """
+    cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema};")
+    cur.execute(f"SET search_path TO {schema};")
+    cur.execute(CUSTOMERS_TABLE)
+    cur.execute(LAYOUTS[schema])
+    if schema == "bench_partitioned":
+        start = add_months(month_start(now), -months)
+        for _ in range(months + 2):
+            end = add_months(start, 1)
+            cur.execute(
+                f"CREATE TABLE {partition_name(start)} PARTITION OF orders "
+                "FOR VALUES FROM (%s) TO (%s);",
+                (start, end),
+            )
+            start = end
+    cur.execute(ORDERS_INDEXES)
+
+
+def summarise(timings, seconds):
+    """
+    Summarise query latencies in milliseconds and throughput per second.
+    """
+    timings = sorted(timings)
+    return {
+        "runs": len(timings),
+        "per_second": round(len(timings) / seconds, 1),
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[max(int(len(timings) * 0.95) - 1, 0)] * 1000, 3),
+    }
+
+
+def time_queries(cur, sql, params_list):
+    """
+    Run one query per parameter tuple and summarise the results.
+    """
+    timings = []
+    started = time.perf_counter()
+    for params in params_list:
+        began = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        timings.append(time.perf_counter() - began)
+    return summarise(timings, time.perf_counter() - started)
+
+
+def relations_scanned(cur, sql, params):
+    """
+    Count the tables a query plan reads, i.e. the partitions left after pruning.
+    """
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    relations = set()
+    stack = [cur.fetchone()[0][0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        if "Relation Name" in node:
+            relations.add(node["Relation Name"])
+        stack.extend(node.get("Plans", []))
+    return len(relations)
+
+
+def run(customers, orders, months, inserts, queries):
+    """
+    Load both layouts, measure them and return the results.
+    """
+    conn = psycopg2.connect(
+        dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
+    )
+    conn.autocommit = True
+    now = datetime.now()
+    results = {"orders": orders, "customers": customers, "months": months}
+    # One month in the middle of the data, and the last week of it
+    month = add_months(month_start(now), -(months // 2))
+    ranges = [
+        (month, add_months(month, 1)),
+        (month_start(now) - timedelta(days=7), month_start(now)),
+    ]
+    try:
+        with conn.cursor() as cur:
+            for schema in LAYOUTS:
+                create_layout(cur, schema, months, now)
+                load_seconds = generate_orders(cur, customers, orders, months, month_start(now))
+                cur.execute("ANALYZE customers; ANALYZE orders;")
+
+                started = time.perf_counter()
+                timings = []
+                for n in range(inserts):
+                    began = time.perf_counter()
+                    cur.execute(INSERT_ORDER_SQL, (1 + n % customers, None, "Pizza", 20.0, None))
+                    cur.fetchone()
+                    timings.append(time.perf_counter() - began)
+                insert = summarise(timings, time.perf_counter() - started)
+
+                started = time.perf_counter()
+                if schema == "bench_partitioned":
+                    cur.execute(f"VACUUM ANALYZE {partition_name(month_start(now))};")
+                else:
+                    cur.execute("VACUUM ANALYZE orders;")
+                vacuum_seconds = time.perf_counter() - started
+
+                results[schema] = {
+                    "load_rows_per_second": round(orders / load_seconds, 1),
+                    "single_row_insert": insert,
+                    "hot_data_vacuum_seconds": round(vacuum_seconds, 3),
+                }
+                for label, (start, end) in zip(("month", "recent_week"), ranges):
+                    results[schema][f"{label}_aggregate"] = time_queries(
+                        cur, RANGE_AGGREGATE_SQL, [(start, end)] * queries
+                    )
+                    results[schema][f"{label}_page"] = time_queries(
+                        cur, RANGE_PAGE_SQL, [(start, end, 0)] * queries
+                    )
+                    results[schema][f"{label}_relations_scanned"] = relations_scanned(
+                        cur, RANGE_AGGREGATE_SQL, (start, end)
+                    )
+    finally:
+        conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare partitioned and single-table orders.")
+    parser.add_argument("--orders", type=int, default=10_000_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--inserts", type=int, default=5000, help="single-row inserts to time")
+    parser.add_argument("--queries", type=int, default=50, help="runs of each range query")
+    args = parser.parse_args()
+    print(json.dumps(run(args.customers, args.orders, args.months, args.inserts, args.queries), indent=2))
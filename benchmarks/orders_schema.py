@@ -0,0 +1,216 @@
+"""
+Benchmark per-customer order lookups before and after the customer_id schema change.
+
+Two copies of the orders schema are seeded side by side in their own PostgreSQL
+schemas: "bench_before" has the old telephone foreign key and no indexes,
+"bench_after" has the customer_id foreign key with the (customer_id, order_time)
+and BRIN order_time indexes. The same random customers are then looked up in
+both, and the timings are printed as JSON.
+
+Usage:
+    python3 benchmarks/orders_schema.py --orders 10000000 --customers 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT  # pylint: disable=wrong-import-position
+
+SCHEMAS = {
+    "bench_before": """
+        CREATE TABLE customers (
+            customer_id SERIAL PRIMARY KEY,
+            customer_code VARCHAR(50) UNIQUE NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            telephone VARCHAR(15) UNIQUE NOT NULL,
+            location VARCHAR(100)
+        );
+        CREATE TABLE orders (
+            order_id SERIAL PRIMARY KEY,
+            telephone VARCHAR(15) REFERENCES customers(telephone) ON DELETE CASCADE,
+            item VARCHAR(255) NOT NULL,
+            amount NUMERIC(10, 2) NOT NULL CHECK (amount >= 0),
+            order_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """,
+    "bench_after": """
+        CREATE TABLE customers (
+            customer_id SERIAL PRIMARY KEY,
+            customer_code VARCHAR(50) UNIQUE NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            telephone VARCHAR(15) UNIQUE NOT NULL,
+            location VARCHAR(100)
+        );
+        CREATE TABLE orders (
+            order_id SERIAL PRIMARY KEY,
+            customer_id INTEGER NOT NULL REFERENCES customers(customer_id) ON DELETE CASCADE,
+            telephone VARCHAR(15),
+            item VARCHAR(255) NOT NULL,
+            amount NUMERIC(10, 2) NOT NULL CHECK (amount >= 0),
+            order_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """,
+}
+
+# Created after the data load, as a migration on a populated table would
+AFTER_INDEXES = """
+    CREATE INDEX orders_customer_id_order_time_idx ON orders (customer_id, order_time);
+    CREATE INDEX orders_order_time_brin_idx ON orders USING BRIN (order_time);
+"""
+
+SEED_CUSTOMERS_SQL = """
+    INSERT INTO customers (customer_code, name, telephone, location)
+    SELECT 'CUST' || n, 'Customer ' || n, '+2547' || lpad(n::text, 8, '0'), 'Nairobi'
+    FROM generate_series(1, %(customers)s) AS n;
+"""
+
+# Orders arrive in time order, so order_time correlates with the heap like
+# production data and the BRIN index is effective
+SEED_ORDERS_SQL = {
+    "bench_before": """
+        INSERT INTO orders (telephone, item, amount, order_time)
+        SELECT '+2547' || lpad((1 + (n * 7919) %% %(customers)s)::text, 8, '0'),
+               'Item ' || (n %% 500), (n %% 10000) / 100.0,
+               TIMESTAMP '2023-01-01' + n * INTERVAL '3 seconds'
+        FROM generate_series(1, %(orders)s) AS n;
+    """,
+    "bench_after": """
+        INSERT INTO orders (customer_id, telephone, item, amount, order_time)
+        SELECT 1 + (n * 7919) %% %(customers)s,
+               '+2547' || lpad((1 + (n * 7919) %% %(customers)s)::text, 8, '0'),
+               'Item ' || (n %% 500), (n %% 10000) / 100.0,
+               TIMESTAMP '2023-01-01' + n * INTERVAL '3 seconds'
+        FROM generate_series(1, %(orders)s) AS n;
+    """,
+}
+
+LOOKUP_SQL = {
+    "bench_before": """
+        SELECT * FROM orders WHERE telephone = %s
+        ORDER BY order_time DESC LIMIT 50;
+    """,
+    "bench_after": """
+        SELECT * FROM orders WHERE customer_id = %s
+        ORDER BY order_time DESC LIMIT 50;
+    """,
+}
+
+RANGE_SQL = """
+    SELECT count(*), sum(amount) FROM orders
+    WHERE order_time >= TIMESTAMP '2023-02-01' AND order_time < TIMESTAMP '2023-02-02';
+"""
+
+
+def seed(cur, schema, customers, orders):
+    """
+    Recreate one benchmark schema and load it with generated rows.
+
+    Returns:
+        float: Seconds taken to load the data and build the indexes.
+    """
+    cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema};")
+    cur.execute(f"SET search_path TO {schema};")
+    cur.execute(SCHEMAS[schema])
+    started = time.perf_counter()
+    params = {"customers": customers, "orders": orders}
+    cur.execute(SEED_CUSTOMERS_SQL, params)
+    cur.execute(SEED_ORDERS_SQL[schema], params)
+    if schema == "bench_after":
+        cur.execute(AFTER_INDEXES)
+    cur.execute("ANALYZE customers; ANALYZE orders;")
+    return time.perf_counter() - started
+
+
+def time_queries(cur, sql, params_list):
+    """
+    Run one query per parameter tuple and summarise the latencies in milliseconds.
+    """
+    timings = []
+    for params in params_list:
+        started = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "runs": len(timings),
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+        "max_ms": round(timings[-1], 3),
+    }
+
+
+def plan(cur, sql, params):
+    """
+    Return the top plan node of a query, e.g. "Seq Scan" or "Index Scan".
+    """
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    node = cur.fetchone()[0][0]["Plan"]
+    while node.get("Plans") and node["Node Type"] in ("Limit", "Sort", "Aggregate", "Gather"):
+        node = node["Plans"][0]
+    return node["Node Type"]
+
+
+def time_cascade_delete(conn, cur, customer_id):
+    """
+    Time deleting one customer and its orders, rolled back afterwards.
+    """
+    started = time.perf_counter()
+    cur.execute("DELETE FROM customers WHERE customer_id = %s;", (customer_id,))
+    elapsed = (time.perf_counter() - started) * 1000
+    conn.rollback()
+    return round(elapsed, 3)
+
+
+def run(customers, orders, lookups, keep):
+    """
+    Seed both schemas, run the lookups against each and return the results.
+    """
+    conn = psycopg2.connect(
+        dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
+    )
+    conn.autocommit = True
+    sample = random.Random(42).sample(range(1, customers + 1), min(lookups, customers))
+    results = {"orders": orders, "customers": customers, "lookups": len(sample)}
+    try:
+        with conn.cursor() as cur:
+            for schema in ("bench_before", "bench_after"):
+                load_seconds = seed(cur, schema, customers, orders)
+                if schema == "bench_before":
+                    params_list = [("+2547" + str(n).zfill(8),) for n in sample]
+                else:
+                    params_list = [(n,) for n in sample]
+                conn.autocommit = False
+                results[schema] = {
+                    "load_seconds": round(load_seconds, 1),
+                    "lookup_plan": plan(cur, LOOKUP_SQL[schema], params_list[0]),
+                    "lookup": time_queries(cur, LOOKUP_SQL[schema], params_list),
+                    "time_range_plan": plan(cur, RANGE_SQL, None),
+                    "time_range": time_queries(cur, RANGE_SQL, [None] * 5),
+                    "cascade_delete_ms": time_cascade_delete(conn, cur, sample[0]),
+                }
+                conn.autocommit = True
+                if not keep:
+                    cur.execute(f"DROP SCHEMA {schema} CASCADE;")
+    finally:
+        conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=10_000_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark schemas afterwards")
+    args = parser.parse_args()
+    print(json.dumps(run(args.customers, args.orders, args.lookups, args.keep), indent=2))
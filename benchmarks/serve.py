@@ -0,0 +1,41 @@
+"""
+Run the API for load tests, with the SMS gateway and OIDC provider stubbed.
+
+Started by load_test.py with the environment it needs; OIDC_STUB_URL is the
+base URL of the OIDCStub the load test runs, and SMS_BACKEND=fake keeps
+messages local. Any other API setting (DB_MODE, pool sizes, ...) is taken
+from the environment as usual.
+
+Usage:
+    OIDC_STUB_URL=http://127.0.0.1:9000 python3 benchmarks/serve.py --port 8001
+"""
+
+import argparse
+import os
+import sys
+
+import uvicorn
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stubs import STUB_AUDIENCE, STUB_DOMAIN  # pylint: disable=wrong-import-position
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the API with stubbed external services.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SMS_BACKEND", "fake")
+    os.environ.setdefault("AT_USERNAME", "sandbox")
+    os.environ.setdefault("AT_API_KEY", "stub")
+    os.environ.setdefault("AUTH0_DOMAIN", STUB_DOMAIN)
+    os.environ.setdefault("AUTH0_API_AUDIENCE", STUB_AUDIENCE)
+    # Every request is authenticated, so token verification is part of the measurement
+    os.environ.setdefault("AUTH_ENABLED", "true")
+    os.environ.setdefault("AUTH_JWKS_URL", f"{os.environ['OIDC_STUB_URL']}/.well-known/jwks.json")
+
+    # The API serves static files relative to the working directory
+    os.chdir(ROOT)
+    uvicorn.run("main:app", host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,133 @@
+"""
+Startup time benchmark for the API.
+
+Measures two things, each over several runs in fresh processes:
+
+- import: the time `import main` takes in a new interpreter, i.e. the cost
+  every worker pays before it can run its lifespan.
+- ready: the time from starting server.py until GET /health first answers,
+  which adds interpreter startup, the supervisor, the workers' imports and their
+  lifespan (pool, SMS dispatcher, HTTP clients, signing keys).
+
+The server runs with the SMS gateway faked and authentication off, against
+the database configured in the environment.
+
+Usage:
+    python3 benchmarks/startup.py --runs 5 --workers 1 2 4
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+IMPORT_SCRIPT = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+
+def measure_import(runs):
+    """
+    Time `import main` in fresh interpreters.
+
+    Returns:
+        list: Seconds per run.
+    """
+    seconds = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        seconds.append(float(result.stdout.strip().splitlines()[-1]))
+    return seconds
+
+
+def measure_ready(workers, port, timeout=60.0):
+    """
+    Start server.py and time how long it takes until /health answers.
+
+    With several workers this is the time until the first worker is ready;
+    the others start in parallel.
+
+    Returns:
+        float: Seconds from spawning the server to the first answer.
+    """
+    env = dict(os.environ, SMS_BACKEND="fake", AUTH_ENABLED="false", SERVER_LOG_LEVEL="warning")
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "server.py"), "--workers", str(workers),
+         "--host", "127.0.0.1", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise SystemExit("The API exited during startup.")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+        raise SystemExit(f"The API did not start within {timeout:.0f} seconds.")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def summarise(seconds):
+    """
+    Median, min and max of a list of durations, in milliseconds.
+    """
+    return {
+        "runs": len(seconds),
+        "median_ms": round(statistics.median(seconds) * 1000, 1),
+        "min_ms": round(min(seconds) * 1000, 1),
+        "max_ms": round(max(seconds) * 1000, 1),
+    }
+
+
+def main():
+    """
+    Run the benchmark and print, or write, the results.
+    """
+    parser = argparse.ArgumentParser(description="Measure API import and startup times.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--import-only", action="store_true", help="skip the server startup runs")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "db_mode": os.getenv("DB_MODE", "sync"),
+        },
+        "import": summarise(measure_import(args.runs)),
+        "ready": {},
+    }
+    print(f"import main: {json.dumps(results['import'])}", file=sys.stderr)
+    if not args.import_only:
+        for workers in args.workers:
+            seconds = [measure_ready(workers, args.port) for _ in range(args.runs)]
+            results["ready"][str(workers)] = summarise(seconds)
+            print(f"ready with {workers} workers: {json.dumps(results['ready'][str(workers)])}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
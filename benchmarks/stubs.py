@@ -0,0 +1,153 @@
+"""
+Local stand-ins for the external services the API talks to, for load tests.
+
+OIDCStub is a minimal OpenID Connect provider on localhost: it publishes a
+JWKS and discovery document and issues RS256 access tokens from a
+client_credentials token endpoint, signed with a key generated at startup.
+The API is pointed at it with AUTH_JWKS_URL. The tests use it as a local
+issuer too, rotate_key() stands in for the provider rotating its signing key.
+
+The SMS gateway is replaced by the API's own fake backend
+(SMS_BACKEND=fake, with SMS_FAKE_LATENCY standing in for gateway latency).
+"""
+
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from authlib.jose import JsonWebKey, jwt
+
+STUB_DOMAIN = "oidc.stub.local"
+STUB_AUDIENCE = "customer-orders-api"
+
+
+class OIDCStub:
+    """
+    OpenID Connect provider serving discovery, JWKS and tokens on localhost.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, audience=STUB_AUDIENCE, domain=STUB_DOMAIN):
+        self.audience = audience
+        self.issuer = f"https://{domain}/"
+        self.keys = {}
+        self.kid = None
+        self.rotate_key("stub")
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        Base URL the stub listens on.
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def jwks_url(self):
+        """
+        URL of the published key set.
+        """
+        return f"{self.url}/.well-known/jwks.json"
+
+    def jwks(self):
+        """
+        The public key set, as served at /.well-known/jwks.json.
+        """
+        return {
+            "keys": [
+                key.as_dict(is_private=False, kid=kid, use="sig", alg="RS256")
+                for kid, key in self.keys.items()
+            ]
+        }
+
+    def rotate_key(self, kid):
+        """
+        Generate a new signing key and publish it next to the previous ones.
+        """
+        self.keys[kid] = JsonWebKey.generate_key("RSA", 2048, is_private=True, options={"kid": kid})
+        self.kid = kid
+
+    def issue_token(self, subject="load-test", scope="", lifetime=3600):
+        """
+        Sign an access token for the API audience.
+
+        Returns:
+            str: The encoded JWT.
+        """
+        now = int(time.time())
+        claims = {
+            "iss": self.issuer, "sub": subject, "aud": self.audience,
+            "iat": now, "exp": now + lifetime, "scope": scope,
+        }
+        return jwt.encode({"alg": "RS256", "kid": self.kid}, claims, self.keys[self.kid]).decode()
+
+    def start(self):
+        """
+        Serve requests from a daemon thread.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name="oidc-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving and close the socket.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Routes the discovery, JWKS and token endpoints.
+            """
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """
+                Serve the discovery document and the key set.
+                """
+                if self.path == "/.well-known/jwks.json":
+                    self._json(200, stub.jwks())
+                elif self.path == "/.well-known/openid-configuration":
+                    self._json(200, {
+                        "issuer": stub.issuer,
+                        "jwks_uri": stub.jwks_url,
+                        "token_endpoint": f"{stub.url}/oauth/token",
+                        "id_token_signing_alg_values_supported": ["RS256"],
+                    })
+                else:
+                    self._json(404, {"error": "not_found"})
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                """
+                Issue a token for a client_credentials grant.
+                """
+                if self.path != "/oauth/token":
+                    self._json(404, {"error": "not_found"})
+                    return
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    form = json.loads(body or "{}")
+                else:
+                    form = dict(urllib.parse.parse_qsl(body))
+                token = stub.issue_token(form.get("client_id", "load-test"), form.get("scope", ""))
+                self._json(200, {"access_token": token, "token_type": "Bearer", "expires_in": 3600})
+
+            def _json(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+        return Handler
+
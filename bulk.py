@@ -0,0 +1,372 @@
+"""
+Module implementing bulk customer and order ingestion.
+
+An upload (JSON array, NDJSON or CSV) is parsed and validated against the
+CustomerCreate/OrderCreate models in one pass, COPYed into a temporary
+staging table and merged into the real table with a single INSERT ... SELECT
+... ON CONFLICT. Rows that fail validation, would violate a constraint or
+reference an unknown customer are reported back by their index in the upload
+instead of failing the whole batch.
+"""
+
+import csv
+import io
+import json
+from typing import List
+from fastapi import HTTPException, Request
+from psycopg2.extras import execute_values
+from pydantic import TypeAdapter, ValidationError
+from models import CustomerCreate, OrderCreate
+from outbox import INSERT_OUTBOX_SQL, outbox_params
+from settings import env
+from sms_dispatcher import SMSJob
+
+BULK_MAX_ROWS = env.int("BULK_MAX_ROWS", 100000)
+
+CUSTOMER_FIELDS = ("customer_code", "name", "telephone", "location")
+ORDER_FIELDS = ("telephone", "item", "amount", "order_time")
+
+CREATE_CUSTOMERS_STAGING_SQL = """
+    CREATE TEMP TABLE customers_staging (
+        row_num INTEGER NOT NULL,
+        customer_code TEXT NOT NULL,
+        name TEXT NOT NULL,
+        telephone TEXT NOT NULL,
+        location TEXT
+    ) ON COMMIT DROP;
+"""
+
+COPY_CUSTOMERS_STAGING_SQL = """
+    COPY customers_staging (row_num, customer_code, name, telephone, location)
+    FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (customer_code, name, telephone))
+"""
+
+# Staging columns are unconstrained so one bad value cannot abort the COPY;
+# rows that would not fit the real table are reported and removed instead.
+REJECT_CUSTOMERS_SQL = """
+    DELETE FROM customers_staging
+    WHERE length(customer_code) > 50 OR length(name) > 100
+       OR length(telephone) > 15 OR length(location) > 100
+    RETURNING row_num, CASE
+        WHEN length(customer_code) > 50 THEN 'customer_code is longer than 50 characters'
+        WHEN length(name) > 100 THEN 'name is longer than 100 characters'
+        WHEN length(telephone) > 15 THEN 'telephone is longer than 15 characters'
+        ELSE 'location is longer than 100 characters'
+    END AS error;
+"""
+
+MERGE_CUSTOMERS_SQL = """
+    INSERT INTO customers (customer_code, name, telephone, location)
+    SELECT customer_code, name, telephone, location
+    FROM customers_staging
+    ORDER BY row_num
+    ON CONFLICT DO NOTHING
+    RETURNING customer_id, customer_code;
+"""
+
+CREATE_ORDERS_STAGING_SQL = """
+    CREATE TEMP TABLE orders_staging (
+        row_num INTEGER NOT NULL,
+        order_id INTEGER NOT NULL DEFAULT nextval(pg_get_serial_sequence('orders', 'order_id')),
+        telephone TEXT NOT NULL,
+        item TEXT NOT NULL,
+        amount NUMERIC NOT NULL,
+        order_time TIMESTAMP
+    ) ON COMMIT DROP;
+"""
+
+COPY_ORDERS_STAGING_SQL = """
+    COPY orders_staging (row_num, telephone, item, amount, order_time)
+    FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (telephone, item))
+"""
+
+REJECT_ORDERS_SQL = """
+    DELETE FROM orders_staging s
+    WHERE length(s.item) > 255 OR s.amount < 0 OR s.amount >= 100000000
+       OR NOT EXISTS (SELECT 1 FROM customers c WHERE c.telephone = s.telephone)
+    RETURNING s.row_num, CASE
+        WHEN length(s.item) > 255 THEN 'item is longer than 255 characters'
+        WHEN s.amount < 0 THEN 'amount must not be negative'
+        WHEN s.amount >= 100000000 THEN 'amount is too large'
+        ELSE 'Telephone number does not exist.'
+    END AS error;
+"""
+
+# order_id is drawn from the orders sequence while staging, so every upload
+# row already knows its id and no RETURNING mapping is needed.
+MERGE_ORDERS_SQL = """
+    INSERT INTO orders (order_id, customer_id, telephone, item, amount, order_time)
+    SELECT s.order_id, c.customer_id, s.telephone, s.item, s.amount,
+           COALESCE(s.order_time, CURRENT_TIMESTAMP)
+    FROM orders_staging s
+    JOIN customers c ON c.telephone = s.telephone
+    ORDER BY s.row_num
+    ON CONFLICT DO NOTHING;
+"""
+
+SELECT_STAGED_ORDERS_SQL = """
+    SELECT row_num, order_id FROM orders_staging ORDER BY row_num;
+"""
+
+
+class BulkPayload:
+    """
+    Raw rows of an upload, with the errors found while parsing it.
+    """
+    def __init__(self, rows, errors):
+        self.rows = rows
+        self.errors = errors
+
+
+def parse_rows(body, content_type):
+    """
+    Parse an upload into a list of dicts.
+
+    Parameters:
+    - body (bytes): The request body.
+    - content_type (str): application/json (array), application/x-ndjson or text/csv.
+
+    Returns:
+        BulkPayload: The rows, with None for lines that could not be parsed,
+        and an error entry for each of those lines.
+    """
+    media_type = (content_type or "application/json").split(";")[0].strip().lower()
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError as exc:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 encoded.") from exc
+
+    rows, errors = [], []
+    if media_type == "application/json":
+        try:
+            rows = json.loads(text) if text.strip() else []
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {exc}") from exc
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="JSON upload must be an array of objects.")
+    elif media_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                errors.append({"index": len(rows), "errors": ["Invalid JSON line."]})
+                rows.append(None)
+    elif media_type == "text/csv":
+        # Empty CSV cells mean "not provided" so optional fields fall back to their defaults
+        rows = [
+            {key: value if value != "" else None for key, value in row.items()}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail="Upload must be application/json, application/x-ndjson or text/csv.",
+        )
+
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=413, detail=f"Uploads are limited to {BULK_MAX_ROWS} rows."
+        )
+    return BulkPayload(rows, errors)
+
+
+async def read_bulk_payload(request: Request):
+    """
+    FastAPI dependency reading and parsing a bulk upload body.
+    """
+    return parse_rows(await request.body(), request.headers.get("content-type"))
+
+
+def validate_rows(payload, model):
+    """
+    Validate every parsed row against model.
+
+    The whole upload is validated by one TypeAdapter call. Only when that
+    fails are the offending rows identified from the error locations and the
+    remaining rows validated again in a second single call.
+
+    Returns:
+        tuple: List of (index, model instance) pairs and the list of errors.
+    """
+    errors = list(payload.errors)
+    bad = {error["index"] for error in errors}
+    candidates = [(index, row) for index, row in enumerate(payload.rows) if index not in bad]
+    adapter = TypeAdapter(List[model])
+    try:
+        items = adapter.validate_python([row for _, row in candidates])
+        return list(zip((index for index, _ in candidates), items)), errors
+    except ValidationError as exc:
+        row_errors = {}
+        for error in exc.errors():
+            position = error["loc"][0]
+            field = ".".join(str(part) for part in error["loc"][1:])
+            message = f"{field}: {error['msg']}" if field else error["msg"]
+            row_errors.setdefault(candidates[position][0], []).append(message)
+    errors.extend({"index": index, "errors": messages} for index, messages in row_errors.items())
+    candidates = [(index, row) for index, row in candidates if index not in row_errors]
+    items = adapter.validate_python([row for _, row in candidates])
+    return list(zip((index for index, _ in candidates), items)), errors
+
+
+def _staging_csv(valid, fields):
+    """
+    Render validated rows as CSV for COPY, prefixed with their upload index.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for index, item in valid:
+        writer.writerow([index] + [getattr(item, field) for field in fields])
+    buffer.seek(0)
+    return buffer
+
+
+def _customer_report(valid, inserted, rejected):
+    """
+    Match the customers RETURNING rows back to upload indexes.
+
+    Of several upload rows sharing a customer_code only the first can have
+    been inserted; rows whose code or telephone already existed were skipped
+    by ON CONFLICT DO NOTHING.
+    """
+    created, errors = [], [{"index": index, "errors": [error]} for index, error in rejected]
+    rejected_indexes = {index for index, _ in rejected}
+    ids = {row["customer_code"]: row["customer_id"] for row in inserted}
+    for index, customer in valid:
+        if index in rejected_indexes:
+            continue
+        customer_id = ids.pop(customer.customer_code, None)
+        if customer_id is None:
+            errors.append({"index": index, "errors": ["Customer code or telephone already exists."]})
+        else:
+            created.append({"index": index, "customer_id": customer_id})
+    return created, errors
+
+
+def _report(received, created, errors):
+    return {
+        "received": received,
+        "inserted": len(created),
+        "created": created,
+        "errors": sorted(errors, key=lambda error: error["index"]),
+    }
+
+
+def load_customers(conn, payload):
+    """
+    Validate and load a customer upload in one transaction.
+
+    Parameters:
+    - conn (psycopg2.connection): A pooled connection.
+    - payload (BulkPayload): The parsed upload.
+
+    Returns:
+        dict: received and inserted counts, the created customer ids and the per-row errors.
+    """
+    valid, errors = validate_rows(payload, CustomerCreate)
+    created = []
+    if valid:
+        with conn.cursor() as cur:
+            cur.execute(CREATE_CUSTOMERS_STAGING_SQL)
+            cur.copy_expert(COPY_CUSTOMERS_STAGING_SQL, _staging_csv(valid, CUSTOMER_FIELDS))
+            cur.execute(REJECT_CUSTOMERS_SQL)
+            rejected = [(row["row_num"], row["error"]) for row in cur.fetchall()]
+            cur.execute(MERGE_CUSTOMERS_SQL)
+            created, load_errors = _customer_report(valid, cur.fetchall(), rejected)
+        conn.commit()
+        errors.extend(load_errors)
+    return _report(len(payload.rows), created, errors)
+
+
+def load_orders(conn, payload, write_outbox=False):
+    """
+    Validate and load an order upload in one transaction.
+
+    Parameters:
+    - conn (psycopg2.connection): A pooled connection.
+    - payload (BulkPayload): The parsed upload.
+    - write_outbox (bool): Write the notifications to the outbox in the same transaction.
+
+    Returns:
+        tuple: The report (received and inserted counts, created order ids and
+        per-row errors) and the SMSJob list for the inserted orders.
+    """
+    valid, errors = validate_rows(payload, OrderCreate)
+    created, jobs = [], []
+    if valid:
+        with conn.cursor() as cur:
+            cur.execute(CREATE_ORDERS_STAGING_SQL)
+            cur.copy_expert(COPY_ORDERS_STAGING_SQL, _staging_csv(valid, ORDER_FIELDS))
+            cur.execute(REJECT_ORDERS_SQL)
+            errors.extend({"index": row["row_num"], "errors": [row["error"]]} for row in cur.fetchall())
+            cur.execute(MERGE_ORDERS_SQL)
+            cur.execute(SELECT_STAGED_ORDERS_SQL)
+            created = [{"index": row["row_num"], "order_id": row["order_id"]} for row in cur.fetchall()]
+            jobs = _order_jobs(valid, created)
+            if write_outbox and jobs:
+                execute_values(
+                    cur,
+                    "INSERT INTO outbox (order_id, telephone, payload) VALUES %s",
+                    [outbox_params(order_id, job) for order_id, job in jobs],
+                    template="(%s, %s, %s::jsonb)",
+                )
+        conn.commit()
+    return _report(len(payload.rows), created, errors), [job for _, job in jobs]
+
+
+def _order_jobs(valid, created):
+    """
+    Pair the inserted order ids with their notification.
+    """
+    orders = dict(valid)
+    return [(row["order_id"], SMSJob.from_order(orders[row["index"]])) for row in created]
+
+
+async def aload_customers(conn, payload):
+    """
+    Async counterpart of load_customers for a psycopg 3 connection.
+    """
+    valid, errors = validate_rows(payload, CustomerCreate)
+    created = []
+    if valid:
+        async with conn.cursor() as cur:
+            await cur.execute(CREATE_CUSTOMERS_STAGING_SQL)
+            async with cur.copy(COPY_CUSTOMERS_STAGING_SQL) as copy:
+                await copy.write(_staging_csv(valid, CUSTOMER_FIELDS).getvalue())
+            await cur.execute(REJECT_CUSTOMERS_SQL)
+            rejected = [(row["row_num"], row["error"]) for row in await cur.fetchall()]
+            await cur.execute(MERGE_CUSTOMERS_SQL)
+            created, load_errors = _customer_report(valid, await cur.fetchall(), rejected)
+        await conn.commit()
+        errors.extend(load_errors)
+    return _report(len(payload.rows), created, errors)
+
+
+async def aload_orders(conn, payload, write_outbox=False):
+    """
+    Async counterpart of load_orders for a psycopg 3 connection.
+    """
+    valid, errors = validate_rows(payload, OrderCreate)
+    created, jobs = [], []
+    if valid:
+        async with conn.cursor() as cur:
+            await cur.execute(CREATE_ORDERS_STAGING_SQL)
+            async with cur.copy(COPY_ORDERS_STAGING_SQL) as copy:
+                await copy.write(_staging_csv(valid, ORDER_FIELDS).getvalue())
+            await cur.execute(REJECT_ORDERS_SQL)
+            errors.extend(
+                {"index": row["row_num"], "errors": [row["error"]]} for row in await cur.fetchall()
+            )
+            await cur.execute(MERGE_ORDERS_SQL)
+            await cur.execute(SELECT_STAGED_ORDERS_SQL)
+            created = [
+                {"index": row["row_num"], "order_id": row["order_id"]} for row in await cur.fetchall()
+            ]
+            jobs = _order_jobs(valid, created)
+            if write_outbox and jobs:
+                await cur.executemany(
+                    INSERT_OUTBOX_SQL, [outbox_params(order_id, job) for order_id, job in jobs]
+                )
+        await conn.commit()
+    return _report(len(payload.rows), created, errors), [job for _, job in jobs]
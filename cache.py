@@ -0,0 +1,282 @@
+"""
+Module providing the read-through customer cache.
+
+Customers are cached by telephone and by customer_code in an in-process LRU
+with a TTL. A shared cache (for example Redis) can be plugged in behind the
+local one so workers and nodes share entries; InMemorySharedCache is a local
+stand-in with the same interface. create_customer invalidates both tiers.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from settings import env
+
+CUSTOMER_CACHE_SIZE = env.int("CUSTOMER_CACHE_SIZE", 10000)
+CUSTOMER_CACHE_TTL = env.float("CUSTOMER_CACHE_TTL", 300)
+# "local" keeps entries in-process only, "shared" adds the shared tier
+CUSTOMER_CACHE_BACKEND = env.str("CUSTOMER_CACHE_BACKEND", "local").lower()
+
+_MISSING = object()
+
+CUSTOMER_LOOKUP_SQL = {
+    "telephone": "SELECT * FROM customers WHERE telephone = %s;",
+    "customer_code": "SELECT * FROM customers WHERE customer_code = %s;",
+}
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire ttl seconds after being set.
+    """
+
+    def __init__(self, maxsize=CUSTOMER_CACHE_SIZE, ttl=CUSTOMER_CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for key, or default if absent or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self._stats["misses"] += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Cache value under key, evicting the least recently used entry when full.
+
+        ttl overrides the cache's entry lifetime for this entry.
+        """
+        with self._lock:
+            self._entries[key] = (self._clock() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def delete(self, key):
+        """
+        Remove key from the cache if present.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Remove every entry.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Snapshot of the hit, miss, eviction and expiration counters.
+        """
+        with self._lock:
+            return dict(self._stats, size=len(self._entries), maxsize=self.maxsize)
+
+
+class InMemorySharedCache:
+    """
+    Local stand-in for a shared cache such as Redis.
+
+    Values are stored serialized, as a networked cache would, behind the
+    get/set/delete interface a real shared cache client has to provide.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the stored string for key, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        """
+        Store the string value under key for ttl seconds.
+        """
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+
+    def delete(self, *keys):
+        """
+        Remove keys.
+        """
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+class CustomerCache:
+    """
+    Two-tier cache of customer rows keyed by telephone and customer_code.
+
+    Only existing customers are cached, so a customer created on another
+    node is never hidden by a stale "not found".
+    """
+
+    def __init__(self, local=None, shared=None, ttl=CUSTOMER_CACHE_TTL):
+        self.local = local if local is not None else TTLCache(ttl=ttl)
+        self.shared = shared
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._shared_stats = {"shared_hits": 0, "shared_misses": 0}
+
+    @staticmethod
+    def telephone_key(telephone):
+        """
+        Cache key of a customer looked up by telephone.
+        """
+        return f"customer:telephone:{telephone}"
+
+    @staticmethod
+    def code_key(customer_code):
+        """
+        Cache key of a customer looked up by customer_code.
+        """
+        return f"customer:code:{customer_code}"
+
+    def get_by_telephone(self, telephone):
+        """
+        Return the cached customer with this telephone, or None on a miss.
+        """
+        return self._get(self.telephone_key(telephone))
+
+    def get_by_code(self, customer_code):
+        """
+        Return the cached customer with this customer_code, or None on a miss.
+        """
+        return self._get(self.code_key(customer_code))
+
+    def store(self, customer):
+        """
+        Cache a customer row under both of its keys.
+        """
+        customer = dict(customer)
+        keys = (self.telephone_key(customer["telephone"]), self.code_key(customer["customer_code"]))
+        for key in keys:
+            self.local.set(key, customer)
+        if self.shared is not None:
+            payload = json.dumps(customer)
+            for key in keys:
+                self.shared.set(key, payload, self.ttl)
+
+    def invalidate(self, telephone=None, customer_code=None):
+        """
+        Drop the entries for a telephone and/or customer_code from both tiers.
+        """
+        keys = []
+        if telephone:
+            keys.append(self.telephone_key(telephone))
+        if customer_code:
+            keys.append(self.code_key(customer_code))
+        for key in keys:
+            self.local.delete(key)
+        if self.shared is not None and keys:
+            self.shared.delete(*keys)
+
+    def stats(self):
+        """
+        Snapshot of the local hit/miss/eviction counters and the shared tier counters.
+        """
+        with self._lock:
+            return dict(self.local.stats(), **self._shared_stats)
+
+    def _get(self, key):
+        customer = self.local.get(key)
+        if customer is not None or self.shared is None:
+            return customer
+        payload = self.shared.get(key)
+        with self._lock:
+            self._shared_stats["shared_hits" if payload is not None else "shared_misses"] += 1
+        if payload is None:
+            return None
+        customer = json.loads(payload)
+        self.local.set(key, customer)
+        return customer
+
+
+def _cached_customer(cache, by, value):
+    if by == "telephone":
+        return cache.get_by_telephone(value)
+    return cache.get_by_code(value)
+
+
+def read_customer(cache, cur, by, value):
+    """
+    Read a customer through the cache, querying the database on a miss.
+
+    Parameters:
+    - cache (CustomerCache): The customer cache.
+    - cur (psycopg2.cursor): Cursor used on a cache miss.
+    - by (str): "telephone" or "customer_code".
+    - value (str): The telephone or customer code to look up.
+
+    Returns:
+        dict: The customer row, or None if no such customer exists.
+    """
+    customer = _cached_customer(cache, by, value)
+    if customer is None:
+        cur.execute(CUSTOMER_LOOKUP_SQL[by], (value,))
+        customer = cur.fetchone()
+        if customer is not None:
+            cache.store(customer)
+    return customer
+
+
+async def aread_customer(cache, cur, by, value):
+    """
+    Async counterpart of read_customer for a psycopg 3 cursor.
+    """
+    customer = _cached_customer(cache, by, value)
+    if customer is None:
+        await cur.execute(CUSTOMER_LOOKUP_SQL[by], (value,))
+        customer = await cur.fetchone()
+        if customer is not None:
+            cache.store(customer)
+    return customer
+
+
+_customer_cache = None
+_customer_cache_lock = threading.Lock()
+
+
+def get_customer_cache():
+    """
+    Return the shared CustomerCache configured by CUSTOMER_CACHE_BACKEND.
+    """
+    global _customer_cache  # pylint: disable=global-statement
+    with _customer_cache_lock:
+        if _customer_cache is None:
+            shared = InMemorySharedCache() if CUSTOMER_CACHE_BACKEND == "shared" else None
+            _customer_cache = CustomerCache(shared=shared)
+        return _customer_cache
@@ -0,0 +1,219 @@
+"""
+Module compressing HTTP responses with gzip or brotli.
+
+CompressionMiddleware picks the encoding from the request's Accept-Encoding
+header, preferring brotli when the optional brotli package is installed and
+falling back to gzip. Responses smaller than COMPRESSION_MIN_SIZE bytes are
+sent as they are, since compressing them costs more CPU than it saves on the
+wire. Streaming responses (the exports) are compressed chunk by chunk as
+they are sent. Server-sent events and responses that already carry a
+Content-Encoding are never touched. The time spent compressing is recorded
+as the compress phase of the request.
+"""
+
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+from metrics import phase
+from settings import env
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+COMPRESSION_ENABLED = env.bool("COMPRESSION_ENABLED", True)
+# Smallest response body, in bytes, worth compressing
+COMPRESSION_MIN_SIZE = env.int("COMPRESSION_MIN_SIZE", 1024)
+# 1 (fastest) to 9 (smallest)
+COMPRESSION_GZIP_LEVEL = env.int("COMPRESSION_GZIP_LEVEL", 6)
+# 0 (fastest) to 11 (smallest), the high levels are meant for static assets
+COMPRESSION_BROTLI_QUALITY = env.int("COMPRESSION_BROTLI_QUALITY", 4)
+
+# Event streams must reach the client as they are written
+SKIPPED_CONTENT_TYPES = ("text/event-stream",)
+
+
+def parse_accept_encoding(header):
+    """
+    Parse an Accept-Encoding header.
+
+    Returns:
+        dict: The quality value of each listed coding, e.g. {"gzip": 1.0, "br": 0.5}.
+    """
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(header, brotli_available=None):
+    """
+    Pick the response encoding for an Accept-Encoding header.
+
+    Parameters:
+    - header (str): The request's Accept-Encoding header.
+    - brotli_available (bool): Whether brotli can be used, by default whether
+      the brotli package is installed.
+
+    Returns:
+        str: "br", "gzip", or None to send the response uncompressed.
+    """
+    if brotli_available is None:
+        brotli_available = brotli is not None
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    candidates = ("br", "gzip") if brotli_available else ("gzip",)
+    best, best_quality = None, 0.0
+    for coding in candidates:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class GzipCompressor:
+    """
+    Incremental gzip compressor.
+    """
+
+    def __init__(self, level=COMPRESSION_GZIP_LEVEL):
+        # wbits 31 writes the gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        """
+        Compress a chunk, returning whatever output is ready.
+        """
+        return self._compressor.compress(data)
+
+    def finish(self):
+        """
+        Return the remaining output and the gzip trailer.
+        """
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    """
+    Incremental brotli compressor.
+    """
+
+    def __init__(self, quality=COMPRESSION_BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        """
+        Compress a chunk, returning whatever output is ready.
+        """
+        return self._compressor.process(data)
+
+    def finish(self):
+        """
+        Return the remaining output.
+        """
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with the encoding the client prefers.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE, gzip_level=COMPRESSION_GZIP_LEVEL,
+                 brotli_quality=COMPRESSION_BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSender(self, encoding, send))
+
+    def compressor(self, encoding):
+        """
+        Create a compressor for the negotiated encoding.
+        """
+        if encoding == "br":
+            return BrotliCompressor(self.brotli_quality)
+        return GzipCompressor(self.gzip_level)
+
+
+class _CompressingSender:
+    """
+    ASGI send callable of one response, holding back the response start
+    until the first body chunk shows whether to compress.
+    """
+
+    def __init__(self, middleware, encoding, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        if self.passthrough:
+            await self.send(message)
+            return
+        if self.compressor is None:
+            await self._first_body(message)
+            return
+        with phase("compress"):
+            body = self.compressor.compress(message.get("body", b""))
+            if not message.get("more_body", False):
+                body += self.compressor.finish()
+        await self.send({**message, "body": body})
+
+    async def _first_body(self, message):
+        headers = MutableHeaders(raw=self.start["headers"])
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        skipped = (
+            "content-encoding" in headers
+            or headers.get("content-type", "").startswith(SKIPPED_CONTENT_TYPES)
+            or (not more_body and len(body) < self.middleware.minimum_size)
+        )
+        if skipped:
+            self.passthrough = True
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        self.compressor = self.middleware.compressor(self.encoding)
+        with phase("compress"):
+            body = self.compressor.compress(body)
+            if not more_body:
+                body += self.compressor.finish()
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(body))
+        await self.send(self.start)
+        await self.send({**message, "body": body})
@@ -1,14 +1,14 @@
 """
 Module to create and manage the customer_order_db database.
 This module provides functions to create the database, create tables, insert sample data.
+Tables are created and upgraded by the versioned migrations applied through migrate.py.
 """
 
-from dotenv import load_dotenv
+import argparse
 import psycopg2
 from psycopg2 import sql
 from db import connect_to_server, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
-
-load_dotenv()
+from migrate import Migrator
 
 # Function to create the database if it does not exist
 def create_database():
@@ -33,49 +33,34 @@ def create_database():
 
 
 # Function to create tables in the customer_order_db
-def create_tables():
+def create_tables(dry_run=False, target=None):
     """
-    Create tables for customers and orders in the customer_order_db database.
+    Create or upgrade the tables in the customer_order_db database by applying
+    the pending migrations in the migrations directory. Existing data is kept.
+
+    Parameters:
+    - dry_run (bool): Print the pending migrations without applying them.
+    - target (int): The last migration version to apply, all of them if None.
     """
     try:
-        with psycopg2.connect(
-            dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
-        ) as conn:
-            with conn.cursor() as cur:
-                cur.execute("DROP TABLE IF EXISTS orders CASCADE;")
-                cur.execute("DROP TABLE IF EXISTS customers CASCADE;")
-
-                # SQL Command to create customers table
-                create_customers_table = """
-                CREATE TABLE IF NOT EXISTS customers (
-                    customer_id SERIAL PRIMARY KEY,
-                    customer_code VARCHAR(50) UNIQUE NOT NULL,
-                    name VARCHAR(100) NOT NULL,
-                    telephone VARCHAR(15) UNIQUE NOT NULL,
-                    location VARCHAR(100)
-                );
-                """
-
-                # SQL Command to create orders table
-                create_orders_table = """
-                CREATE TABLE IF NOT EXISTS orders (
-                    order_id SERIAL PRIMARY KEY,
-                    telephone VARCHAR(15) REFERENCES customers(telephone) ON DELETE CASCADE,
-                    item VARCHAR(255) NOT NULL,
-                    amount NUMERIC(10, 2) NOT NULL CHECK (amount >= 0),
-                    order_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-                """
-
-                # Execute table creation
-                cur.execute(create_customers_table)
-                cur.execute(create_orders_table)
-
-                print("Tables created successfully.")
+        applied = Migrator().migrate(target=target, dry_run=dry_run)
+        if dry_run:
+            print(f"{len(applied)} migration(s) pending.")
+        else:
+            print(f"Tables up to date, {len(applied)} migration(s) applied.")
     except Exception as e:
         print("Error creating tables:", e)
 
 
+# Function to show which migrations have been applied
+def migration_status():
+    """
+    Print every migration and whether it has been applied.
+    """
+    for version, name, applied in Migrator().status():
+        print(f"{version:04d} {name:<40} {'applied' if applied else 'pending'}")
+
+
 # Function to insert sample data
 def insert_sample_data():
     """
@@ -86,6 +71,11 @@ def insert_sample_data():
             dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
         ) as conn:
             with conn.cursor() as cur:
+                # Tables are no longer recreated, so only seed an empty database
+                cur.execute("SELECT EXISTS (SELECT 1 FROM orders);")
+                if cur.fetchone()[0]:
+                    print("Sample data skipped, orders already exist.")
+                    return
 
                 # Insert sample customers with telephone numbers
                 customers_data = [
@@ -105,16 +95,17 @@ def insert_sample_data():
 
                 # Insert sample orders using telephone numbers
                 orders_data = [
-                    ("+254701234567", "Laptop", 1200.00),
-                    ("+254712345678", "Smartphone", 800.00),
-                    ("+254701234567", "Headphones", 150.00),
-                    ("+254723456789", "Keyboard", 100.00),
-                    ("+254734567890", "Monitor", 300.00),
+                    ("Laptop", 1200.00, "+254701234567"),
+                    ("Smartphone", 800.00, "+254712345678"),
+                    ("Headphones", 150.00, "+254701234567"),
+                    ("Keyboard", 100.00, "+254723456789"),
+                    ("Monitor", 300.00, "+254734567890"),
                 ]
                 cur.executemany(
                     """
-                    INSERT INTO orders (telephone, item, amount)
-                    VALUES (%s, %s, %s);
+                    INSERT INTO orders (customer_id, telephone, item, amount)
+                    SELECT customer_id, telephone, %s, %s
+                    FROM customers WHERE telephone = %s;
                     """,
                     orders_data,
                 )
@@ -125,6 +116,22 @@ def insert_sample_data():
 
 
 if __name__ == "__main__":
-    create_database()
-    create_tables()
-    insert_sample_data()
+    parser = argparse.ArgumentParser(description="Create and migrate the customer_order_db database.")
+    commands = parser.add_subparsers(dest="command")
+    migrate_parser = commands.add_parser("migrate", help="apply pending migrations")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="print the pending migrations only")
+    migrate_parser.add_argument("--target", type=int, help="last migration version to apply")
+    commands.add_parser("status", help="list migrations and whether they are applied")
+    commands.add_parser("sample-data", help="insert the sample customers and orders")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        create_tables(dry_run=args.dry_run, target=args.target)
+    elif args.command == "status":
+        migration_status()
+    elif args.command == "sample-data":
+        insert_sample_data()
+    else:
+        create_database()
+        create_tables()
+        insert_sample_data()
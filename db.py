@@ -2,21 +2,37 @@
 db.py: Module for managing database operations.
 
 This module provides functionality to connect to a PostgreSQL database,
-create tables, and perform CRUD operations.
+create tables, and perform CRUD operations. Request handlers borrow
+connections from a shared ConnectionPool instead of opening a new
+connection per request. The psycopg 3 pool used with DB_MODE=async lives in
+async_db.py, so sync workers never import psycopg 3.
 """
 
-import os
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import RealDictCursor
-from dotenv import load_dotenv
+from metrics import phase
+from settings import env
 
-load_dotenv()
+DB_NAME = env.str("DB_NAME")
+DB_USER = env.str("DB_USER")
+DB_PASSWORD = env.str("DB_PASSWORD")
+DB_HOST = env.str("DB_HOST")
+DB_PORT = env.str("DB_PORT")
 
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
+# "sync" serves the API with psycopg2 in the threadpool, "async" with psycopg 3 on the event loop
+DB_MODE = env.str("DB_MODE", "sync").lower()
+
+# Connection pool settings (shared by the sync and async pools)
+DB_POOL_MIN_SIZE = env.int("DB_POOL_MIN_SIZE", 1)
+DB_POOL_MAX_SIZE = env.int("DB_POOL_MAX_SIZE", 10)
+DB_POOL_TIMEOUT = env.float("DB_POOL_TIMEOUT", 30)
+DB_POOL_IDLE_TIMEOUT = env.float("DB_POOL_IDLE_TIMEOUT", 300)
+DB_POOL_HEALTH_CHECK_INTERVAL = env.float("DB_POOL_HEALTH_CHECK_INTERVAL", 30)
 
 
 def get_db_connection():
@@ -32,10 +48,38 @@ def get_db_connection():
         password=DB_PASSWORD,
         host=DB_HOST,
         port=DB_PORT,
-        cursor_factory=RealDictCursor
+        cursor_factory=TimedDictCursor
     )
     return conn
 
+
+class TimedDictCursor(RealDictCursor):
+    """
+    RealDictCursor recording the time spent executing queries and fetching
+    rows as the db_execute and db_fetch phases of the current request.
+    """
+
+    def execute(self, query, vars=None):  # pylint: disable=redefined-builtin
+        with phase("db_execute"):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with phase("db_execute"):
+            return super().executemany(query, vars_list)
+
+    def fetchone(self):
+        with phase("db_fetch"):
+            return super().fetchone()
+
+    def fetchmany(self, size=None):
+        with phase("db_fetch"):
+            return super().fetchmany(size)
+
+    def fetchall(self):
+        with phase("db_fetch"):
+            return super().fetchall()
+
+
 # Function to connect to the PostgreSQL server
 def connect_to_server():
     """
@@ -53,3 +97,304 @@ def connect_to_server():
     except Exception as e:
         print("Error connecting to PostgreSQL server:", e)
         return None
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no connection becomes available within the checkout timeout.
+    """
+
+
+class PoolClosed(Exception):
+    """
+    Raised when a connection is requested from a pool that is shutting down.
+    """
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of PostgreSQL connections.
+
+    Idle connections are kept for reuse and closed once they have been idle
+    for longer than idle_timeout (the pool never shrinks below min_size).
+    Connections that have sat idle for longer than health_check_interval are
+    pinged before being handed out, and broken ones are replaced.
+    """
+
+    def __init__(
+        self,
+        connect=get_db_connection,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        idle_timeout=DB_POOL_IDLE_TIMEOUT,
+        health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+    ):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1.")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (connection, last_used) pairs, most recently used on the right
+        self._size = 0
+        self._closed = False
+
+        # Metrics
+        self._checked_out = 0
+        self._waiting = 0
+        self._created = 0
+        self._recycled = 0
+
+    def open(self):
+        """
+        Eagerly open min_size connections.
+        """
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._new_connection()
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def getconn(self, timeout=None):
+        """
+        Check a connection out of the pool.
+
+        Parameters:
+        - timeout (float): Seconds to wait for a free connection, defaults to the pool timeout.
+
+        Returns:
+            psycopg2.connection: A healthy connection owned by the caller until putconn.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            conn, last_used = self._acquire_slot(deadline)
+            if conn is None:
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._checked_out -= 1
+                        self._cond.notify()
+                    raise
+                return conn
+            if self._is_healthy(conn, last_used):
+                return conn
+            self._discard(conn, checked_out=True)
+
+    def putconn(self, conn, discard=False):
+        """
+        Return a connection to the pool.
+
+        Parameters:
+        - conn (psycopg2.connection): The connection obtained from getconn.
+        - discard (bool): Close the connection instead of keeping it for reuse.
+        """
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        if discard or conn.closed:
+            self._discard(conn, checked_out=True)
+            return
+        with self._cond:
+            self._checked_out -= 1
+            if self._closed:
+                self._size -= 1
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify_all()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager that checks out a connection and always returns it.
+        """
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        except BaseException:
+            self.putconn(conn, discard=bool(conn.closed))
+            raise
+        self.putconn(conn)
+
+    def close(self, timeout=10.0):
+        """
+        Drain the pool: refuse new checkouts, wait up to timeout seconds for
+        checked-out connections to be returned, then close every connection.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            while self._checked_out and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        """
+        Snapshot of the pool metrics.
+
+        Returns:
+            dict: Pool size limits and the checked_out, idle, waiting, created and recycled counters.
+        """
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "checked_out": self._checked_out,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "created": self._created,
+                "recycled": self._recycled,
+            }
+
+    def _acquire_slot(self, deadline):
+        """
+        Wait for either an idle connection or room to open a new one.
+
+        Returns (connection, last_used) for an idle connection, or (None, None)
+        when the caller has reserved a slot and must open the connection itself.
+        """
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise PoolClosed("Connection pool is closed.")
+                    self._expire_idle()
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        self._checked_out += 1
+                        return conn, last_used
+                    if self._size < self.max_size:
+                        self._size += 1
+                        self._checked_out += 1
+                        return None, None
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f"No database connection available within {self.timeout}s."
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+    def _expire_idle(self):
+        """
+        Close connections idle for longer than idle_timeout. Caller holds the lock.
+        """
+        if self.idle_timeout <= 0:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        # The least recently used connections sit on the left of the deque.
+        while self._idle and self._size > self.min_size and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._recycled += 1
+            self._close_quietly(conn)
+
+    def _is_healthy(self, conn, last_used):
+        """
+        Check a connection before handing it out, pinging it if it has been idle a while.
+        """
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _discard(self, conn, checked_out):
+        with self._cond:
+            self._size -= 1
+            self._recycled += 1
+            if checked_out:
+                self._checked_out -= 1
+            self._cond.notify_all()
+        self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool():
+    """
+    Create the application connection pool and open its minimum connections.
+
+    Returns:
+        ConnectionPool: The shared connection pool.
+    """
+    global _pool  # pylint: disable=global-statement
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+            _pool.open()
+        return _pool
+
+
+def get_pool():
+    """
+    Return the shared connection pool, creating it on first use.
+    """
+    if _pool is None:
+        return init_pool()
+    return _pool
+
+
+def close_pool(timeout=10.0):
+    """
+    Gracefully drain and close the shared connection pool.
+    """
+    global _pool  # pylint: disable=global-statement
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close(timeout)
+
+
+def get_db():
+    """
+    FastAPI dependency yielding a pooled connection for the duration of a request.
+    """
+    with ExitStack() as stack:
+        with phase("db_acquire"):
+            conn = stack.enter_context(get_pool().connection())
+        yield conn
@@ -0,0 +1,319 @@
+"""
+Module streaming full-table exports of customers and orders.
+
+Rows are read through a server-side (named) cursor in batches of
+EXPORT_ITERSIZE, or with COPY ... TO STDOUT for CSV, and written to the
+client as they arrive, so memory use stays flat regardless of table size.
+The generators check out their own connection, from a read replica when one
+is configured, because the request's get_db connection is released before a
+StreamingResponse starts sending.
+"""
+
+import csv
+import io
+import json
+import queue
+import threading
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from fastapi.responses import StreamingResponse
+from pagination import order_filter_conditions
+from replicas import read_connection
+from settings import env
+
+EXPORT_ITERSIZE = env.int("EXPORT_ITERSIZE", 2000)
+# Bytes buffered before a COPY chunk is handed to the response
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+CUSTOMER_COLUMNS = ("customer_id", "customer_code", "name", "telephone", "location")
+ORDER_COLUMNS = ("order_id", "customer_id", "telephone", "item", "amount", "order_time")
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def customer_export_query():
+    """
+    Build the SELECT streamed by the customer export.
+
+    Returns:
+        tuple: SQL string (without a trailing semicolon, so it can be wrapped
+        in COPY) and its parameters.
+    """
+    return f"SELECT {', '.join(CUSTOMER_COLUMNS)} FROM customers ORDER BY customer_id", []
+
+
+def order_export_query(params):
+    """
+    Build the SELECT streamed by the order export.
+
+    Parameters:
+    - params (OrderExportQuery): The request's filters.
+
+    Returns:
+        tuple: SQL string and its parameters.
+    """
+    conditions, args = order_filter_conditions(params)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT {', '.join(ORDER_COLUMNS)} FROM orders{where} ORDER BY order_id", args
+
+
+def json_default(value):
+    """
+    json.dumps default for the column types returned by PostgreSQL.
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def ndjson_chunks(rows, batch=EXPORT_ITERSIZE):
+    """
+    Encode dict rows as newline-delimited JSON, one chunk per batch rows.
+    """
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, default=json_default))
+        if len(lines) >= batch:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def csv_chunks(rows, columns, batch=EXPORT_ITERSIZE):
+    """
+    Encode dict rows as CSV with a header line, one chunk per batch rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+        count += 1
+        if count >= batch:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_rows(query, args, itersize=EXPORT_ITERSIZE):
+    """
+    Yield the rows of query through a server-side cursor on a read connection.
+    """
+    with read_connection() as conn:
+        with conn.cursor(name=f"export_{uuid.uuid4().hex}") as cur:
+            cur.itersize = itersize
+            cur.execute(query, args)
+            yield from cur
+        conn.rollback()
+
+
+class ExportCancelled(Exception):
+    """
+    Raised inside a COPY when the client stops reading the export.
+    """
+
+
+class _QueueWriter:
+    """
+    File-like object handing COPY output to the response through a bounded queue.
+    """
+
+    def __init__(self, chunks, chunk_size=EXPORT_CHUNK_SIZE):
+        self._chunks = chunks
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        self.cancelled = threading.Event()
+
+    def write(self, data):
+        """
+        Buffer data and pass it on once a chunk is full.
+        """
+        self._buffer += data.encode() if isinstance(data, str) else data
+        if len(self._buffer) >= self._chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Hand the buffered bytes to the consumer, waiting while the queue is full.
+        """
+        if not self._buffer:
+            return
+        chunk, self._buffer = bytes(self._buffer), bytearray()
+        self.put(chunk)
+
+    def put(self, item):
+        """
+        Queue item for the consumer, giving up once the export is cancelled.
+        """
+        while True:
+            if self.cancelled.is_set():
+                raise ExportCancelled()
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+_DONE = object()
+
+
+def iter_copy_csv(query, args):
+    """
+    Yield CSV chunks produced by COPY (query) TO STDOUT on a read connection.
+
+    psycopg2 only exposes COPY through a blocking copy_expert call, so it
+    runs in a helper thread feeding a bounded queue. The queue applies
+    backpressure: a slow client pauses the COPY instead of buffering rows.
+    """
+    with read_connection() as conn:
+        with conn.cursor() as cur:
+            select = cur.mogrify(query, args).decode()
+        copy_sql = f"COPY ({select}) TO STDOUT WITH (FORMAT csv, HEADER)"
+        chunks = queue.Queue(maxsize=8)
+        writer = _QueueWriter(chunks)
+        outcome = {}
+
+        def run_copy():
+            try:
+                with conn.cursor() as copy_cur:
+                    copy_cur.copy_expert(copy_sql, writer)
+                writer.flush()
+                writer.put(_DONE)
+            except BaseException as exc:  # pylint: disable=broad-except
+                outcome["error"] = exc
+                try:
+                    writer.put(exc)
+                except ExportCancelled:
+                    pass
+
+        thread = threading.Thread(target=run_copy, name="export-copy", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = chunks.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+            conn.commit()
+        finally:
+            writer.cancelled.set()
+            thread.join()
+            if "error" in outcome:
+                # An interrupted COPY leaves the connection unusable
+                conn.close()
+
+
+def export_response(rows_query, columns, export, filename):
+    """
+    Build the StreamingResponse for a sync export.
+
+    Parameters:
+    - rows_query (tuple): SQL string and parameters selecting the rows.
+    - columns (tuple): Column names, in order, for the CSV header.
+    - export (ExportQuery): The requested format.
+    - filename (str): Base name of the downloaded file.
+
+    Returns:
+        StreamingResponse: The streamed export.
+    """
+    query, args = rows_query
+    if export.format == "csv" and export.use_copy:
+        body = iter_copy_csv(query, args)
+    elif export.format == "csv":
+        body = csv_chunks(iter_rows(query, args), columns)
+    else:
+        body = ndjson_chunks(iter_rows(query, args))
+    return _streaming_response(body, export.format, filename)
+
+
+async def aiter_rows(query, args, itersize=EXPORT_ITERSIZE):
+    """
+    Yield the rows of query through an async server-side cursor.
+    """
+    from async_db import async_read_connection  # pylint: disable=import-outside-toplevel
+    async with async_read_connection() as conn:
+        async with conn.cursor(name=f"export_{uuid.uuid4().hex}") as cur:
+            cur.itersize = itersize
+            await cur.execute(query, args)
+            async for row in cur:
+                yield row
+
+
+async def aiter_copy_csv(query, args):
+    """
+    Yield CSV chunks produced by COPY (query) TO STDOUT on an async read connection.
+    """
+    from async_db import async_read_connection  # pylint: disable=import-outside-toplevel
+    async with async_read_connection() as conn:
+        async with conn.cursor() as cur:
+            copy_sql = f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)"
+            async with cur.copy(copy_sql, args) as copy:
+                async for data in copy:
+                    yield bytes(data)
+
+
+async def ndjson_achunks(rows, batch=EXPORT_ITERSIZE):
+    """
+    Async counterpart of ndjson_chunks.
+    """
+    lines = []
+    async for row in rows:
+        lines.append(json.dumps(row, default=json_default))
+        if len(lines) >= batch:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def csv_achunks(rows, columns, batch=EXPORT_ITERSIZE):
+    """
+    Async counterpart of csv_chunks.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    async for row in rows:
+        writer.writerow([row[column] for column in columns])
+        count += 1
+        if count >= batch:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def async_export_response(rows_query, columns, export, filename):
+    """
+    Build the StreamingResponse for an async export, see export_response.
+    """
+    query, args = rows_query
+    if export.format == "csv" and export.use_copy:
+        body = aiter_copy_csv(query, args)
+    elif export.format == "csv":
+        body = csv_achunks(aiter_rows(query, args), columns)
+    else:
+        body = ndjson_achunks(aiter_rows(query, args))
+    return _streaming_response(body, export.format, filename)
+
+
+def _streaming_response(body, export_format, filename):
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'},
+    )
@@ -0,0 +1,178 @@
+"""
+Module holding the application's shared outbound HTTP clients.
+
+Outbound calls (the Auth0 token exchange, JWKS downloads, SMS gateway
+requests) go through one long-lived httpx client per calling style: an
+AsyncClient for handlers running on the event loop and a Client for code
+running in threads. Both keep connections alive between calls, so DNS, TCP
+and TLS setup is paid once per connection rather than once per call, and
+apply the timeouts and connection limits configured below.
+
+The clients are opened in the application lifespan and closed on shutdown;
+other processes (the outbox relay) create them on first use. Every call is
+timed into the http_client_request_duration_seconds histogram by host.
+"""
+
+import threading
+import time
+import httpx
+from metrics import REGISTRY
+from settings import env
+
+HTTP_CONNECT_TIMEOUT = env.float("HTTP_CONNECT_TIMEOUT", 5)
+HTTP_READ_TIMEOUT = env.float("HTTP_READ_TIMEOUT", 10)
+HTTP_WRITE_TIMEOUT = env.float("HTTP_WRITE_TIMEOUT", 10)
+# Seconds to wait for a free connection when HTTP_MAX_CONNECTIONS are in use
+HTTP_POOL_TIMEOUT = env.float("HTTP_POOL_TIMEOUT", 5)
+HTTP_MAX_CONNECTIONS = env.int("HTTP_MAX_CONNECTIONS", 100)
+HTTP_MAX_KEEPALIVE_CONNECTIONS = env.int("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)
+HTTP_KEEPALIVE_EXPIRY = env.float("HTTP_KEEPALIVE_EXPIRY", 30)
+
+HTTP_CLIENT_REQUEST_DURATION = REGISTRY.histogram(
+    "http_client_request_duration_seconds",
+    "Time from sending an outbound request to receiving its response headers.",
+    ("host", "status"),
+)
+
+
+def client_timeout():
+    """
+    Timeouts applied to every outbound call.
+    """
+    return httpx.Timeout(
+        connect=HTTP_CONNECT_TIMEOUT,
+        read=HTTP_READ_TIMEOUT,
+        write=HTTP_WRITE_TIMEOUT,
+        pool=HTTP_POOL_TIMEOUT,
+    )
+
+
+def client_limits():
+    """
+    Connection pool limits of each client.
+    """
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+class TimedTransport(httpx.BaseTransport):
+    """
+    Transport recording the duration of each request by host and status.
+
+    Failed requests are recorded with status "error".
+    """
+
+    def __init__(self, transport):
+        self._transport = transport
+
+    def handle_request(self, request):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = self._transport.handle_request(request)
+            status = response.status_code
+            return response
+        finally:
+            HTTP_CLIENT_REQUEST_DURATION.observe(
+                time.perf_counter() - started, host=request.url.host, status=status
+            )
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncTimedTransport(httpx.AsyncBaseTransport):
+    """
+    Async counterpart of TimedTransport.
+    """
+
+    def __init__(self, transport):
+        self._transport = transport
+
+    async def handle_async_request(self, request):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = await self._transport.handle_async_request(request)
+            status = response.status_code
+            return response
+        finally:
+            HTTP_CLIENT_REQUEST_DURATION.observe(
+                time.perf_counter() - started, host=request.url.host, status=status
+            )
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def create_http_client(transport=None):
+    """
+    Create a pooled, timed Client with the configured timeouts and limits.
+
+    Parameters:
+    - transport (httpx.BaseTransport): The underlying transport, for tests.
+    """
+    transport = transport or httpx.HTTPTransport(limits=client_limits())
+    return httpx.Client(timeout=client_timeout(), transport=TimedTransport(transport))
+
+
+def create_async_http_client(transport=None):
+    """
+    Create a pooled, timed AsyncClient with the configured timeouts and limits.
+
+    Parameters:
+    - transport (httpx.AsyncBaseTransport): The underlying transport, for tests.
+    """
+    transport = transport or httpx.AsyncHTTPTransport(limits=client_limits())
+    return httpx.AsyncClient(timeout=client_timeout(), transport=AsyncTimedTransport(transport))
+
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """
+    Return the shared Client for calls made from threads, creating it on first use.
+    """
+    global _client  # pylint: disable=global-statement
+    with _client_lock:
+        if _client is None:
+            _client = create_http_client()
+        return _client
+
+
+def get_async_http_client():
+    """
+    Return the shared AsyncClient for calls made on the event loop, creating it on first use.
+    """
+    global _async_client  # pylint: disable=global-statement
+    if _async_client is None:
+        _async_client = create_async_http_client()
+    return _async_client
+
+
+def open_http_clients():
+    """
+    Create both shared clients, called from the application lifespan.
+    """
+    get_http_client()
+    get_async_http_client()
+
+
+async def close_http_clients():
+    """
+    Close both shared clients and their kept-alive connections.
+    """
+    global _client, _async_client  # pylint: disable=global-statement
+    with _client_lock:
+        client, _client = _client, None
+    async_client, _async_client = _async_client, None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.aclose()
@@ -0,0 +1,197 @@
+"""
+Module implementing idempotency keys for order creation.
+
+A client that retries POST /orders/ after a timeout sends the same
+Idempotency-Key header with each attempt. The first attempt records the key
+in the idempotency_keys table in the same transaction as the order, along
+with a hash of the request body and the response. A later attempt with the
+key finds that row and gets the stored response back, without inserting the
+order or queueing its SMS again; one with a different body is rejected. A
+retry arriving while the first attempt is still running waits on the key's
+row lock and then replays its response.
+
+Keys expire IDEMPOTENCY_KEY_TTL seconds after they are recorded. An expired
+key is reused in place by the next request carrying it, and expired rows are
+deleted in batches by this module run as a separate process
+(python idempotency.py).
+"""
+
+import argparse
+import hashlib
+import json
+import time
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from migrate import connect_database
+from settings import env
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Seconds a key and its response are kept, retries after that create a new order
+IDEMPOTENCY_KEY_TTL = env.int("IDEMPOTENCY_KEY_TTL", 86400)
+IDEMPOTENCY_PURGE_BATCH_SIZE = env.int("IDEMPOTENCY_PURGE_BATCH_SIZE", 5000)
+IDEMPOTENCY_PURGE_INTERVAL = env.float("IDEMPOTENCY_PURGE_INTERVAL", 300)
+
+# Returns a row when the key is new or expired, i.e. the request should run
+CLAIM_KEY_SQL = """
+    INSERT INTO idempotency_keys (idempotency_key, request_hash, expires_at)
+    VALUES (%s, %s, CURRENT_TIMESTAMP + make_interval(secs => %s))
+    ON CONFLICT (idempotency_key) DO UPDATE
+    SET request_hash = EXCLUDED.request_hash,
+        status_code = NULL,
+        response = NULL,
+        created_at = CURRENT_TIMESTAMP,
+        expires_at = EXCLUDED.expires_at
+    WHERE idempotency_keys.expires_at <= CURRENT_TIMESTAMP
+    RETURNING idempotency_key;
+"""
+
+SELECT_KEY_SQL = """
+    SELECT request_hash, status_code, response
+    FROM idempotency_keys
+    WHERE idempotency_key = %s;
+"""
+
+SAVE_RESPONSE_SQL = """
+    UPDATE idempotency_keys
+    SET status_code = %s, response = %s::jsonb
+    WHERE idempotency_key = %s;
+"""
+
+PURGE_EXPIRED_SQL = """
+    DELETE FROM idempotency_keys
+    WHERE idempotency_key IN (
+        SELECT idempotency_key FROM idempotency_keys
+        WHERE expires_at <= CURRENT_TIMESTAMP
+        ORDER BY expires_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    );
+"""
+
+
+def request_hash(model):
+    """
+    Hash a request body so a reused key with a different body can be detected.
+
+    Parameters:
+    - model (pydantic.BaseModel): The parsed request body.
+
+    Returns:
+        str: Hex SHA-256 of the body's canonical JSON.
+    """
+    body = json.dumps(model.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def claim_key(cur, key, body_hash, ttl=IDEMPOTENCY_KEY_TTL):
+    """
+    Record a key in the caller's transaction, or return what it already holds.
+
+    Parameters:
+    - cur: Cursor of the transaction that will create the order.
+    - key (str): The Idempotency-Key header.
+    - body_hash (str): request_hash of the body.
+    - ttl (int): Seconds the key is kept.
+
+    Returns:
+        dict: None if the key was recorded and the request should run, else
+        the stored row to pass to replay_response.
+    """
+    cur.execute(CLAIM_KEY_SQL, (key, body_hash, ttl))
+    if cur.fetchone() is not None:
+        return None
+    cur.execute(SELECT_KEY_SQL, (key,))
+    return cur.fetchone()
+
+
+async def aclaim_key(cur, key, body_hash, ttl=IDEMPOTENCY_KEY_TTL):
+    """
+    Async version of claim_key for psycopg 3 cursors.
+    """
+    await cur.execute(CLAIM_KEY_SQL, (key, body_hash, ttl))
+    if await cur.fetchone() is not None:
+        return None
+    await cur.execute(SELECT_KEY_SQL, (key,))
+    return await cur.fetchone()
+
+
+def save_response_params(key, status_code, response):
+    """
+    Build the parameters for SAVE_RESPONSE_SQL.
+    """
+    return (status_code, json.dumps(response), key)
+
+
+def replay_response(stored, body_hash):
+    """
+    Build the response to a retried request from its stored row.
+
+    Parameters:
+    - stored (dict): The row returned by claim_key.
+    - body_hash (str): request_hash of the retried body.
+
+    Returns:
+        JSONResponse: The original status and body, marked as replayed.
+
+    Raises:
+        HTTPException: 422 if the key was used with a different body.
+    """
+    if stored["request_hash"].strip() != body_hash:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{IDEMPOTENCY_HEADER} was already used with a different request body."
+        )
+    if stored["status_code"] is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"A request with this {IDEMPOTENCY_HEADER} is still being processed."
+        )
+    return JSONResponse(
+        status_code=stored["status_code"],
+        content=stored["response"],
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def purge_expired(connect=connect_database, batch_size=IDEMPOTENCY_PURGE_BATCH_SIZE):
+    """
+    Delete expired keys in batches, committing after each batch so locks and
+    WAL stay small while orders keep being written.
+
+    Returns:
+        int: The number of keys deleted.
+    """
+    conn = connect()
+    deleted = 0
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            while True:
+                cur.execute(PURGE_EXPIRED_SQL, (batch_size,))
+                deleted += cur.rowcount
+                if cur.rowcount < batch_size:
+                    break
+    finally:
+        conn.close()
+    return deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete expired idempotency keys.")
+    parser.add_argument("--batch-size", type=int, default=IDEMPOTENCY_PURGE_BATCH_SIZE)
+    parser.add_argument("--interval", type=float, default=IDEMPOTENCY_PURGE_INTERVAL)
+    parser.add_argument("--once", action="store_true", help="run one pass and exit")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            print(f"Expired idempotency keys deleted: {purge_expired(batch_size=args.batch_size)}")
+        except Exception as e:  # pylint: disable=broad-except
+            print("Error deleting expired idempotency keys:", e)
+        if args.once:
+            break
+        try:
+            time.sleep(args.interval)
+        except KeyboardInterrupt:
+            break
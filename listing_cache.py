@@ -0,0 +1,204 @@
+"""
+Module with the change watermarks and rendered page cache of the customer
+and order listings.
+
+A table's watermark is its change counter from table_changes, bumped in the
+same transaction by every statement writing to it (see
+migrations/0007_table_changes.sql). Listing responses carry a weak ETag
+built from it, a Last-Modified time and Cache-Control: no-cache, so clients
+keep the page and revalidate it on every reuse. A request whose
+If-None-Match matches the current ETag is answered with 304 Not Modified
+after reading the watermark alone, without touching the rows.
+
+Other requests look the rendered JSON page up in an in-process LRU keyed by
+table, watermark and query parameters, so a page asked for again is served
+without querying or serializing rows until the table changes. Entries of
+older watermarks are never hit again and age out of the LRU.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional
+from fastapi.responses import Response
+from cache import TTLCache
+from metrics import REGISTRY
+from settings import env
+
+LISTING_CACHE_SIZE = env.int("LISTING_CACHE_SIZE", 256)
+LISTING_CACHE_TTL = env.float("LISTING_CACHE_TTL", 300)
+
+WATERMARK_SQL = (
+    "SELECT COALESCE(SUM(changes), 0) AS changes, MAX(changed_at) AS changed_at "
+    "FROM table_changes WHERE table_name = %s;"
+)
+
+# Clients may keep listings but must revalidate them before each reuse
+CACHE_CONTROL = "private, no-cache"
+
+LISTING_RESPONSES = REGISTRY.counter(
+    "listing_responses_total",
+    "Listing responses by how they were produced: not_modified, cached or rendered.",
+    ("table", "outcome"),
+)
+
+
+@dataclass(frozen=True)
+class Watermark:
+    """
+    The change counter of a table and the time of its last change.
+    """
+    table: str
+    changes: int
+    changed_at: Optional[datetime] = None
+
+    @property
+    def etag(self):
+        """
+        Weak ETag of the table's listings, weak as compression changes the bytes.
+        """
+        return f'W/"{self.table}-{self.changes}"'
+
+    def headers(self):
+        """
+        Validator and caching headers of a listing response.
+        """
+        headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+        if self.changed_at is not None:
+            changed_at = self.changed_at
+            if changed_at.tzinfo is None:
+                changed_at = changed_at.replace(tzinfo=timezone.utc)
+            headers["Last-Modified"] = format_datetime(changed_at.astimezone(timezone.utc), usegmt=True)
+        return headers
+
+
+def _watermark(table, row):
+    return Watermark(table, int(row["changes"]), row["changed_at"])
+
+
+def read_watermark(cur, table):
+    """
+    Read the watermark of a table.
+
+    Parameters:
+    - cur: A dict-row cursor.
+    - table (str): customers or orders.
+
+    Returns:
+        Watermark: The table's current watermark.
+    """
+    cur.execute(WATERMARK_SQL, (table,))
+    return _watermark(table, cur.fetchone())
+
+
+async def aread_watermark(cur, table):
+    """
+    Async counterpart of read_watermark for psycopg 3 cursors.
+    """
+    await cur.execute(WATERMARK_SQL, (table,))
+    return _watermark(table, await cur.fetchone())
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Whether an If-None-Match header matches an ETag, using the weak comparison.
+
+    Parameters:
+    - if_none_match (str): The request header, or None.
+    - etag (str): The current ETag.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ListingCache:
+    """
+    LRU of rendered listing pages keyed by table, watermark and query parameters.
+    """
+
+    def __init__(self, maxsize=LISTING_CACHE_SIZE, ttl=LISTING_CACHE_TTL):
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def key(watermark, params):
+        """
+        Cache key of a page, from its validated query parameters.
+        """
+        return (watermark.table, watermark.changes, params.model_dump_json())
+
+    def get(self, watermark, params):
+        """
+        Return the cached body of a page, or None on a miss.
+        """
+        return self.local.get(self.key(watermark, params))
+
+    def store(self, watermark, params, body):
+        """
+        Cache the rendered body of a page.
+        """
+        self.local.set(self.key(watermark, params), body)
+
+    def stats(self):
+        """
+        Snapshot of the hit, miss and eviction counters.
+        """
+        return self.local.stats()
+
+
+_listing_cache = None
+
+
+def get_listing_cache():
+    """
+    Return the shared listing cache, creating it on first use.
+    """
+    global _listing_cache  # pylint: disable=global-statement
+    if _listing_cache is None:
+        _listing_cache = ListingCache()
+    return _listing_cache
+
+
+def listing_from_cache(request, watermark, params):
+    """
+    Answer a listing request without reading rows, if possible.
+
+    Parameters:
+    - request (Request): The incoming request, for its If-None-Match header.
+    - watermark (Watermark): The listed table's current watermark.
+    - params: The validated query parameters of the listing.
+
+    Returns:
+        Response: 304 Not Modified when the client's copy is current, the
+        cached page when there is one, otherwise None.
+    """
+    if etag_matches(request.headers.get("if-none-match"), watermark.etag):
+        LISTING_RESPONSES.inc(table=watermark.table, outcome="not_modified")
+        return Response(status_code=304, headers=watermark.headers())
+    body = get_listing_cache().get(watermark, params)
+    if body is None:
+        return None
+    LISTING_RESPONSES.inc(table=watermark.table, outcome="cached")
+    return Response(body, media_type="application/json", headers=watermark.headers())
+
+
+def cache_listing(watermark, params, response):
+    """
+    Add the watermark headers to a freshly rendered listing and cache its body.
+
+    Returns:
+        Response: The same response.
+    """
+    response.headers.update(watermark.headers())
+    get_listing_cache().store(watermark, params, response.body)
+    LISTING_RESPONSES.inc(table=watermark.table, outcome="rendered")
+    return response
@@ -3,27 +3,160 @@ Module to handle the FastAPI application.
 
 This module contains the FastAPI application instance, Auth0 configuration, 
 and routes for login, register, logout, customer, and order management. 
-It also integrates the SendSMS service for sending notifications.
+Order notifications are handed to the background SMS dispatcher or written
+to the transactional outbox, depending on SMS_DELIVERY. With AUTH_ENABLED
+the customer and order routes require access tokens granting the scopes
+declared on each route (see auth.py). New orders are streamed to connected
+clients as server-sent events at GET /orders/stream (see order_feed.py).
 """
 
-import os
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
 from urllib.parse import urlencode
 import httpx
-from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi_auth0 import Auth0
 import psycopg2
 from psycopg2 import errorcodes
-from db import get_db_connection
-from models import CustomerCreate, OrderCreate
-from send_sms import SendSMS
+from auth import (
+    AUTH_ENABLED,
+    READ_CUSTOMERS,
+    READ_ORDERS,
+    WRITE_CUSTOMERS,
+    WRITE_ORDERS,
+    start_verifier,
+    stop_verifier,
+)
+from cache import get_customer_cache, read_customer
+from bulk import load_customers, load_orders, read_bulk_payload
+from compression import COMPRESSION_ENABLED, CompressionMiddleware
+from db import DB_MODE, close_pool, get_db, get_pool, init_pool
+from metrics import (
+    CONTENT_TYPE,
+    METRICS_ENABLED,
+    REGISTRY,
+    MetricsMiddleware,
+    TimedJSONResponse,
+    stats_gauges,
+)
+from http_client import close_http_clients, get_async_http_client, open_http_clients
+from export import (
+    CUSTOMER_COLUMNS,
+    ORDER_COLUMNS,
+    customer_export_query,
+    export_response,
+    order_export_query,
+)
+from idempotency import (
+    IDEMPOTENCY_HEADER,
+    IDEMPOTENCY_KEY_MAX_LENGTH,
+    SAVE_RESPONSE_SQL,
+    claim_key,
+    replay_response,
+    request_hash,
+    save_response_params,
+)
+from listing_cache import cache_listing, get_listing_cache, listing_from_cache, read_watermark
+from models import (
+    CustomerCreate,
+    CustomerListQuery,
+    CustomerPage,
+    DailyRevenueQuery,
+    ExportQuery,
+    OrderCreate,
+    OrderExportQuery,
+    OrderListQuery,
+    OrderPage,
+)
+from order_batcher import (
+    ORDER_BATCHING,
+    UnknownCustomerError,
+    get_order_batcher,
+    order_batcher_stats,
+    stop_order_batcher,
+)
+from order_feed import (
+    MEDIA_TYPE as EVENT_STREAM,
+    ORDER_FEED_ENABLED,
+    FeedFull,
+    get_order_feed,
+    order_feed_stats,
+    start_order_feed,
+    stop_order_feed,
+)
+from outbox import SMS_DELIVERY, write_notification
+from pagination import (
+    PageTokenError,
+    customer_page,
+    customer_page_query,
+    order_page,
+    order_page_query,
+)
+from replicas import close_replicas, get_read_db, get_replica_router, init_replicas
+from responses import TypedJSONResponse
+from settings import env
+from sms_dispatcher import SMSJob, dispatcher_stats, get_dispatcher, stop_dispatcher
+from stats import (
+    CUSTOMER_STATS_SQL,
+    DAILY_REVENUE_SQL,
+    customer_stats_page_query,
+    daily_revenue_page,
+    daily_revenue_range,
+)
 
-load_dotenv()
+if DB_MODE == "async":
+    # Only async workers load psycopg 3 and the async routes
+    import async_api
+    from async_db import (
+        async_pool_stats,
+        close_async_pool,
+        close_async_replicas,
+        get_async_pool,
+        get_async_replica_router,
+        init_async_pool,
+        init_async_replicas,
+    )
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(_app):
+    """
+    Open the outbound HTTP clients and the database connection pool, start the
+    SMS dispatcher, the order batcher and the order feed and load the token
+    signing keys on startup, drain and stop them on shutdown.
+    """
+    open_http_clients()
+    if ORDER_FEED_ENABLED:
+        start_order_feed(asyncio.get_running_loop())
+    if SMS_DELIVERY == "queue":
+        get_dispatcher()
+    if AUTH_ENABLED:
+        start_verifier()
+    if ORDER_BATCHING:
+        get_order_batcher()
+    if DB_MODE == "async":
+        await init_async_pool()
+        await init_async_replicas()
+        yield
+        await close_async_replicas()
+        await close_async_pool()
+    else:
+        init_pool()
+        init_replicas()
+        yield
+        close_replicas()
+        close_pool()
+    stop_order_feed()
+    stop_order_batcher()
+    stop_dispatcher()
+    stop_verifier()
+    await close_http_clients()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=TimedJSONResponse)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Allow CORS
@@ -35,16 +168,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip or brotli compression of large responses, inside the metrics
+# middleware so compression time counts towards the request
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Request timings and phase breakdowns, served at /metrics
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Synchronous customer and order routes, see async_api for the async versions
+router = APIRouter()
+
 
 # Auth0 Configuration
-AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
-AUTH0_CLIENT_ID = os.getenv("AUTH0_CLIENT_ID")
-AUTH0_CLIENT_SECRET = os.getenv("AUTH0_CLIENT_SECRET")
-AUTH0_API_AUDIENCE = os.getenv("AUTH0_API_AUDIENCE")
+AUTH0_DOMAIN = env.str("AUTH0_DOMAIN")
+AUTH0_CLIENT_ID = env.str("AUTH0_CLIENT_ID")
+AUTH0_CLIENT_SECRET = env.str("AUTH0_CLIENT_SECRET")
 AUTH0_CALLBACK_URL = "http://127.0.0.1:8000/callback"
 
-auth0 = Auth0(domain=AUTH0_DOMAIN, api_audience=AUTH0_API_AUDIENCE)
-
 # Auth0 Login Route
 @app.get("/login")
 async def login():
@@ -111,22 +253,23 @@ async def callback(request: Request):
         "redirect_uri": AUTH0_CALLBACK_URL,
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(token_url, headers=headers, data=data)
-            response.raise_for_status()  # Raise an HTTPError if the status is 4xx or 5xx
-            token_data = response.json()
-        except httpx.HTTPStatusError as e:
-            # Handle HTTP errors, e.g., if the status is 400 or 500
-            return JSONResponse(
-                status_code=e.response.status_code,
-                content={"message": f"Token exchange failed: {e.response.text}"}
-            )
-        except httpx.RequestError as e:
-            return JSONResponse(
-                status_code=500,
-                content={"message": f"Request error: {str(e)}"}
-            )
+    # Shared pooled client, the connection to Auth0 is reused across logins
+    client = get_async_http_client()
+    try:
+        response = await client.post(token_url, headers=headers, data=data)
+        response.raise_for_status()  # Raise an HTTPError if the status is 4xx or 5xx
+        token_data = response.json()
+    except httpx.HTTPStatusError as e:
+        # Handle HTTP errors, e.g., if the status is 400 or 500
+        return JSONResponse(
+            status_code=e.response.status_code,
+            content={"message": f"Token exchange failed: {e.response.text}"}
+        )
+    except httpx.RequestError as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Request error: {str(e)}"}
+        )
 
     # Check if access_token is in the response
     if "access_token" not in token_data:
@@ -143,12 +286,11 @@ async def callback(request: Request):
     return RedirectResponse(url=redirect_to)
 
 
-@app.post("/customers/", status_code=201)
-def create_customer(customer: CustomerCreate):
+@router.post("/customers/", status_code=201, dependencies=[WRITE_CUSTOMERS])
+def create_customer(customer: CustomerCreate, conn=Depends(get_db)):
     """
     Endpoint to add a new customer.
     """
-    conn = get_db_connection()
     cur = conn.cursor()
 
     try:
@@ -165,46 +307,90 @@ def create_customer(customer: CustomerCreate):
         if not result:
             raise HTTPException(status_code=409, detail="Customer code already exists.")
         conn.commit()
+        get_customer_cache().invalidate(customer.telephone, customer.customer_code)
         return {"customer_id": result["customer_id"], "message": "Customer created successfully"}
     finally:
         cur.close()
-        conn.close()
 
 # Endpoint to add a new order
-@app.post("/orders/", status_code=201)
-def create_order(order: OrderCreate):
+@router.post("/orders/", status_code=201, dependencies=[WRITE_ORDERS])
+def create_order(
+    order: OrderCreate,
+    conn=Depends(get_db),
+    idempotency_key: Optional[str] = Header(
+        None, alias=IDEMPOTENCY_HEADER, max_length=IDEMPOTENCY_KEY_MAX_LENGTH
+    ),
+):
     """
     Endpoint to add a new order.
+
+    A retry carrying the Idempotency-Key of an earlier request gets that
+    request's response back instead of creating another order. With
+    ORDER_BATCHING enabled, orders without a key are inserted by the group
+    commit batcher; keyed orders need the key in their own transaction.
     """
-    conn = get_db_connection()
     cur = conn.cursor()
 
     try:
-        cur.execute(
-            """
-            INSERT INTO orders (telephone, item, amount, order_time)
-            VALUES (%s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP))
-            RETURNING order_id;
-            """,
-            (order.telephone, order.item, order.amount, order.order_time),
-        )
-        result = cur.fetchone()
+        if idempotency_key:
+            body_hash = request_hash(order)
+            stored = claim_key(cur, idempotency_key, body_hash)
+            if stored is not None:
+                conn.rollback()
+                return replay_response(stored, body_hash)
+
+        # Cheap existence check through the customer cache before the INSERT,
+        # the foreign key still guards against concurrent deletes
+        customer = read_customer(get_customer_cache(), cur, "telephone", order.telephone)
+        if customer is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Telephone number does not exist. Please provide a valid Telephone number."
+            )
+        job = SMSJob.from_order(order)
+        if ORDER_BATCHING and not idempotency_key:
+            # Inserted and committed together with concurrent orders
+            conn.rollback()
+            order_id = get_order_batcher().insert(customer["customer_id"], order, job)
+        else:
+            cur.execute(
+                """
+                INSERT INTO orders (customer_id, telephone, item, amount, order_time)
+                VALUES (%s, %s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP))
+                RETURNING order_id;
+                """,
+                (customer["customer_id"], order.telephone, order.item, order.amount, order.order_time),
+            )
+            order_id = cur.fetchone()["order_id"]
+            if SMS_DELIVERY == "outbox":
+                # Committed atomically with the order, the outbox relay sends it
+                write_notification(cur, order_id, job)
+        response = {
+            "order_id": order_id,
+            "message": "Order created successfully and notification queued"
+        }
+        if idempotency_key:
+            cur.execute(SAVE_RESPONSE_SQL, save_response_params(idempotency_key, 201, response))
         conn.commit()
 
-        # Send the SMS using SendSMS class
-        sms_service = SendSMS()
-        sms_service.sending_order(order.telephone, order.item, order.amount, order.order_time)
+        if SMS_DELIVERY == "queue":
+            # Queue the SMS, the dispatcher workers send it in the background
+            get_dispatcher().enqueue(job)
 
-        return {
-            "order_id": result["order_id"],
-            "message": "Order created successfully and message sent successfully"
-        }
+        return response
     except psycopg2.Error as exc:
         if exc.pgcode == errorcodes.FOREIGN_KEY_VIOLATION:
             raise HTTPException(
                 status_code=400,
                 detail="Telephone number does not exist. Please provide a valid Telephone number."
             ) from exc
+    except UnknownCustomerError as exc:
+        raise HTTPException(
+            status_code=400,
+            detail="Telephone number does not exist. Please provide a valid Telephone number."
+        ) from exc
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -213,42 +399,315 @@ def create_order(order: OrderCreate):
 
     finally:
         cur.close()
-        conn.close()
 
-# Endpoint to list all customers
-@app.get("/customers/", status_code=200)
-def list_customers():
+# Endpoint to upload many customers at once
+@router.post("/customers/bulk", status_code=200, dependencies=[WRITE_CUSTOMERS])
+def bulk_create_customers(payload=Depends(read_bulk_payload), conn=Depends(get_db)):
+    """
+    Endpoint to add customers from a JSON array, NDJSON or CSV upload.
+
+    Returns:
+        dict: The number of rows received and inserted, the new customer ids
+        by upload index, and the errors of the rejected rows.
+    """
+    report = load_customers(conn, payload)
+    cache = get_customer_cache()
+    for index in (row["index"] for row in report["created"]):
+        row = payload.rows[index]
+        cache.invalidate(row.get("telephone"), row.get("customer_code"))
+    return report
+
+# Endpoint to upload many orders at once
+@router.post("/orders/bulk", status_code=200, dependencies=[WRITE_ORDERS])
+def bulk_create_orders(payload=Depends(read_bulk_payload), conn=Depends(get_db)):
+    """
+    Endpoint to add orders from a JSON array, NDJSON or CSV upload.
+
+    Notifications for the inserted orders are queued in one batch, or
+    written to the outbox in the loading transaction.
+
+    Returns:
+        dict: The number of rows received and inserted, the new order ids
+        by upload index, and the errors of the rejected rows.
+    """
+    report, jobs = load_orders(conn, payload, write_outbox=SMS_DELIVERY == "outbox")
+    if SMS_DELIVERY == "queue" and jobs:
+        get_dispatcher().enqueue_many(jobs)
+    return report
+
+# Endpoint to list customers one page at a time
+@router.get("/customers/", status_code=200, response_model=CustomerPage, dependencies=[READ_CUSTOMERS])
+def list_customers(request: Request, params: CustomerListQuery = Depends(), conn=Depends(get_read_db)):
+    """
+    Endpoint to list customers using keyset pagination. Pages carry an ETag
+    of the customers table's watermark and are answered with 304 or from
+    the listing cache while the table is unchanged.
+
+    Returns:
+        dict: The page of customers under "items" and the token for the
+        following page under "next_page_token" (None on the last page).
+    """
+    try:
+        query, args = customer_page_query(params)
+    except PageTokenError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    cur = conn.cursor()
+    try:
+        watermark = read_watermark(cur, "customers")
+        response = listing_from_cache(request, watermark, params)
+        if response is None:
+            cur.execute(query, args)
+            page = TypedJSONResponse(customer_page(cur.fetchall(), params.limit), CustomerPage)
+            response = cache_listing(watermark, params, page)
+        return response
+    finally:
+        cur.close()
+
+# Endpoint to list orders one page at a time
+@router.get("/orders/", status_code=200, response_model=OrderPage, dependencies=[READ_ORDERS])
+def list_orders(request: Request, params: OrderListQuery = Depends(), conn=Depends(get_read_db)):
+    """
+    Endpoint to list orders using keyset pagination, optionally filtered by
+    telephone, order time range, amount range and item prefix. Pages carry
+    an ETag of the orders table's watermark and are answered with 304 or
+    from the listing cache while the table is unchanged.
+
+    Returns:
+        dict: The page of orders under "items" and the token for the
+        following page under "next_page_token" (None on the last page).
+    """
+    try:
+        query, args = order_page_query(params)
+    except PageTokenError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    cur = conn.cursor()
+    try:
+        watermark = read_watermark(cur, "orders")
+        response = listing_from_cache(request, watermark, params)
+        if response is None:
+            cur.execute(query, args)
+            page = TypedJSONResponse(order_page(cur.fetchall(), params), OrderPage)
+            response = cache_listing(watermark, params, page)
+        return response
+    finally:
+        cur.close()
+
+
+# Endpoint to read one customer by telephone number
+@router.get("/customers/telephone/{telephone}", status_code=200, dependencies=[READ_CUSTOMERS])
+def get_customer_by_telephone(telephone: str, conn=Depends(get_db)):
+    """
+    Endpoint to read a customer by telephone number through the customer cache.
+
+    Returns:
+        dict: The customer.
+    """
+    return _read_customer_or_404(conn, "telephone", telephone)
+
+# Endpoint to read one customer by customer code
+@router.get("/customers/code/{customer_code}", status_code=200, dependencies=[READ_CUSTOMERS])
+def get_customer_by_code(customer_code: str, conn=Depends(get_db)):
+    """
+    Endpoint to read a customer by customer code through the customer cache.
+
+    Returns:
+        dict: The customer.
+    """
+    return _read_customer_or_404(conn, "customer_code", customer_code)
+
+def _read_customer_or_404(conn, by, value):
+    cur = conn.cursor()
+    try:
+        customer = read_customer(get_customer_cache(), cur, by, value)
+    finally:
+        cur.close()
+    if customer is None:
+        raise HTTPException(status_code=404, detail="Customer not found.")
+    return customer
+
+# Endpoint to list order statistics per customer
+@router.get("/stats/customers", status_code=200, dependencies=[READ_ORDERS])
+def list_customer_stats(params: CustomerListQuery = Depends(), conn=Depends(get_read_db)):
     """
-    Endpoint to list all customers.
-    
+    Endpoint to list the order count, total amount and last order time of
+    each customer, read from the customer_order_stats rollup.
+
     Returns:
-        list: A list of dictionaries representing the customers.
+        dict: The page of customer statistics under "items" and the token for
+        the following page under "next_page_token" (None on the last page).
     """
-    conn = get_db_connection()
+    try:
+        query, args = customer_stats_page_query(params)
+    except PageTokenError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
     cur = conn.cursor()
     try:
-        cur.execute("SELECT * FROM customers;")
-        customers = cur.fetchall()
-        return customers
+        cur.execute(query, args)
+        return customer_page(cur.fetchall(), params.limit)
     finally:
         cur.close()
-        conn.close()
 
-# Endpoint to list all orders
-@app.get("/orders/", status_code=200)
-def list_orders():
+# Endpoint to read the order statistics of one customer
+@router.get("/stats/customers/{customer_id}", status_code=200, dependencies=[READ_ORDERS])
+def get_customer_stats(customer_id: int, conn=Depends(get_read_db)):
     """
-    Endpoint to list all orders.
-    
+    Endpoint to read the order count, total amount and last order time of one customer.
+
+    Returns:
+        dict: The customer's statistics.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(CUSTOMER_STATS_SQL, (customer_id,))
+        stats = cur.fetchone()
+    finally:
+        cur.close()
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Customer not found.")
+    return stats
+
+# Endpoint to summarise revenue per day
+@router.get("/stats/daily-revenue", status_code=200, dependencies=[READ_ORDERS])
+def get_daily_revenue(params: DailyRevenueQuery = Depends(), conn=Depends(get_read_db)):
+    """
+    Endpoint to read the order count and revenue of each day in a range,
+    from the daily_revenue rollup.
+
     Returns:
-        list: A list of dictionaries representing the orders.
+        dict: The range, one item per day with orders, and the range totals.
     """
-    conn = get_db_connection()
+    from_date, to_date = daily_revenue_range(params)
+    if from_date >= to_date:
+        raise HTTPException(status_code=400, detail="from_date must be before to_date.")
     cur = conn.cursor()
     try:
-        cur.execute("SELECT * FROM orders;")
-        orders = cur.fetchall()
-        return orders
+        cur.execute(DAILY_REVENUE_SQL, (from_date, to_date))
+        return daily_revenue_page(cur.fetchall(), from_date, to_date)
     finally:
         cur.close()
-        conn.close()
+
+# Endpoint to stream every customer
+@router.get("/customers/export", status_code=200, dependencies=[READ_CUSTOMERS])
+def export_customers(export: ExportQuery = Depends()):
+    """
+    Endpoint to stream all customers as NDJSON or CSV.
+
+    Returns:
+        StreamingResponse: The customers, read in batches so memory stays flat.
+    """
+    return export_response(customer_export_query(), CUSTOMER_COLUMNS, export, "customers")
+
+# Endpoint to stream every order matching the filters
+@router.get("/orders/export", status_code=200, dependencies=[READ_ORDERS])
+def export_orders(params: OrderExportQuery = Depends()):
+    """
+    Endpoint to stream orders as NDJSON or CSV, with the same filters as GET /orders/.
+
+    Returns:
+        StreamingResponse: The orders, read in batches so memory stays flat.
+    """
+    return export_response(order_export_query(params), ORDER_COLUMNS, params, "orders")
+
+# Live feed of new orders
+@app.get("/orders/stream", status_code=200, dependencies=[READ_ORDERS])
+async def stream_orders():
+    """
+    Endpoint streaming new orders as server-sent events.
+
+    Each "orders" event carries a JSON array of the orders committed since
+    the previous one. A "reset" event means orders were missed, because the
+    client read too slowly or the feed reconnected, and the listing should be
+    reloaded. Comments are sent every ORDER_FEED_HEARTBEAT_INTERVAL seconds
+    while idle.
+
+    Returns:
+        StreamingResponse: The text/event-stream, open until the client leaves.
+    """
+    feed = get_order_feed()
+    if feed is None:
+        raise HTTPException(status_code=503, detail="The order feed is not running.")
+    try:
+        subscriber = feed.subscribe()
+    except FeedFull as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "30"}) from exc
+    # X-Accel-Buffering stops nginx from holding events back
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(feed.stream(subscriber), media_type=EVENT_STREAM, headers=headers)
+
+# Liveness and readiness probe
+@app.get("/health", status_code=200)
+def health():
+    """
+    Endpoint answering once the application has started, for load balancers
+    and the startup benchmark. It does not touch the database.
+    """
+    return {"status": "ok"}
+
+
+# Endpoint to inspect the database connection pool
+@app.get("/pool/stats", status_code=200)
+async def pool_stats():
+    """
+    Endpoint to report database connection pool metrics.
+
+    Returns:
+        dict: Checked-out, idle, waiting, created and recycled connection counts.
+    """
+    if DB_MODE == "async":
+        return async_pool_stats(await get_async_pool())
+    return get_pool().stats()
+
+
+# Endpoint to inspect the read replicas
+@app.get("/replicas/stats", status_code=200)
+async def replica_stats():
+    """
+    Endpoint to report how read-only queries are routed to the replicas.
+
+    Returns:
+        dict: The balancing strategy and, per replica, whether it is up, its
+        connections in use, its last measured lag and its last error.
+    """
+    if DB_MODE == "async":
+        return (await get_async_replica_router()).stats()
+    return get_replica_router().stats()
+
+
+# Endpoint to inspect the customer cache
+@app.get("/cache/stats", status_code=200)
+def cache_stats():
+    """
+    Endpoint to report customer cache metrics.
+
+    Returns:
+        dict: Hit, miss, eviction and expiration counts and the cache size.
+    """
+    return get_customer_cache().stats()
+
+
+# Endpoint scraped by Prometheus
+@app.get("/metrics", status_code=200)
+async def metrics():
+    """
+    Endpoint to report request, phase and SMS timings together with the pool,
+    cache and dispatcher statistics, in the Prometheus text format.
+    """
+    if DB_MODE == "async":
+        pool = async_pool_stats(await get_async_pool())
+    else:
+        pool = get_pool().stats()
+    gauges = stats_gauges("db_pool", pool) + stats_gauges("customer_cache", get_customer_cache().stats())
+    gauges += stats_gauges("listing_cache", get_listing_cache().stats())
+    sms_stats = dispatcher_stats()
+    if sms_stats is not None:
+        gauges += stats_gauges("sms_dispatcher", sms_stats)
+    batch_stats = order_batcher_stats()
+    if batch_stats is not None:
+        gauges += stats_gauges("order_batcher", batch_stats)
+    feed_stats = order_feed_stats()
+    if feed_stats is not None:
+        gauges += stats_gauges("order_feed", feed_stats)
+    return PlainTextResponse(REGISTRY.render(gauges), media_type=CONTENT_TYPE)
+
+
+app.include_router(async_api.router if DB_MODE == "async" else router)
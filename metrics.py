@@ -0,0 +1,319 @@
+"""
+Module collecting request timings and serving them in the Prometheus text format.
+
+MetricsMiddleware times every HTTP request and counts it by method, route
+template and status. While a request runs, the time spent in each phase
+(waiting for a pooled connection, executing queries, fetching rows,
+rendering the JSON response, handing the SMS to the dispatcher) is added up
+by the phase() context manager and recorded per route when the request ends.
+Requests slower than SLOW_REQUEST_THRESHOLD_MS are printed with their
+phase breakdown. GET /metrics renders everything collected here.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fastapi.responses import JSONResponse
+from settings import env
+
+METRICS_ENABLED = env.bool("METRICS_ENABLED", True)
+# Requests taking longer than this are printed with their phases, 0 disables
+SLOW_REQUEST_THRESHOLD_MS = env.float("SLOW_REQUEST_THRESHOLD_MS", 0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds, the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# Phase durations of the request being handled, None outside a request
+_request_phases = ContextVar("request_phases", default=None)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Counter:
+    """
+    Thread-safe counter with labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """
+        Add amount to the counter for the given label values.
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """
+        Return the current count for the given label values.
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        """
+        Return the (name, labels, value) lines of the exposition.
+        """
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in values]
+
+
+class Histogram:
+    """
+    Thread-safe histogram with labels and cumulative buckets.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}  # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Record one observation for the given label values.
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        """
+        Return the number of observations for the given label values.
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._values.get(key)
+            return series[2] if series else 0
+
+    def samples(self):
+        """
+        Return the (name, labels, value) lines of the exposition.
+        """
+        with self._lock:
+            values = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._values.items())
+        lines = []
+        for key, (bucket_counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append((f"{self.name}_bucket", labels, cumulative))
+            labels = _format_labels(self.labelnames, key)
+            lines.append((f"{self.name}_sum", labels, total))
+            lines.append((f"{self.name}_count", labels, count))
+        return lines
+
+
+class Registry:
+    """
+    Holds the application's metrics and renders them for scraping.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        """
+        Create and register a Counter.
+        """
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Create and register a Histogram.
+        """
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, gauges=()):
+        """
+        Render every registered metric in the Prometheus text format.
+
+        Parameters:
+        - gauges (list): Extra (name, help, value) gauges read at scrape
+          time, such as the pool and cache statistics.
+
+        Returns:
+            str: The exposition text.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        for name, documentation, value in gauges:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests handled.", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending its response.",
+    ("method", "route"),
+)
+HTTP_REQUEST_PHASE_DURATION = REGISTRY.histogram(
+    "http_request_phase_duration_seconds", "Time a request spent in each phase.",
+    ("route", "phase"),
+)
+SLOW_REQUESTS = REGISTRY.counter(
+    "http_slow_requests_total", "Requests slower than SLOW_REQUEST_THRESHOLD_MS.", ("method", "route")
+)
+SMS_SEND_DURATION = REGISTRY.histogram(
+    "sms_send_duration_seconds", "Time of each SMS gateway call made by the dispatcher.", ("outcome",)
+)
+
+
+def add_phase_time(name, seconds):
+    """
+    Add seconds to the named phase of the current request, if there is one.
+    """
+    phases = _request_phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name):
+    """
+    Context manager adding the time spent in its block to the named phase
+    of the current request. Outside a request it only runs the block.
+    """
+    if _request_phases.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase_time(name, time.perf_counter() - started)
+
+
+def stats_gauges(prefix, stats):
+    """
+    Turn a stats() dict into (name, help, value) gauges for Registry.render.
+
+    Parameters:
+    - prefix (str): Prefix of the gauge names, e.g. db_pool.
+    - stats (dict): Statistics as returned by the pool, cache or dispatcher.
+
+    Returns:
+        list: One gauge per numeric statistic.
+    """
+    return [
+        (f"{prefix}_{key}", f"{prefix} {key} from its stats().", value)
+        for key, value in sorted(stats.items())
+        if isinstance(value, (int, float))
+    ]
+
+
+class TimedJSONResponse(JSONResponse):
+    """
+    JSONResponse recording the time spent rendering the body as the
+    serialize phase of the request.
+    """
+
+    def render(self, content):
+        with phase("serialize"):
+            return super().render(content)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing requests and recording their phase durations.
+
+    Requests are labelled with the matched route template (/customers/code/{customer_code})
+    rather than the raw path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app, slow_threshold_ms=SLOW_REQUEST_THRESHOLD_MS):
+        self.app = app
+        self.slow_threshold_ms = slow_threshold_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        phases = {}
+        token = _request_phases.set(phases)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_phases.reset(token)
+            self._record(scope, status, time.perf_counter() - started, phases)
+
+    def _record(self, scope, status, elapsed, phases):
+        method = scope["method"]
+        # The router stores the matched route in the scope
+        route = getattr(scope.get("route"), "path", "unmatched")
+        HTTP_REQUESTS.inc(method=method, route=route, status=status)
+        HTTP_REQUEST_DURATION.observe(elapsed, method=method, route=route)
+        for name, seconds in phases.items():
+            HTTP_REQUEST_PHASE_DURATION.observe(seconds, route=route, phase=name)
+
+        if self.slow_threshold_ms and elapsed * 1000 >= self.slow_threshold_ms:
+            SLOW_REQUESTS.inc(method=method, route=route)
+            breakdown = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in phases.items())
+            print(
+                f"Slow request: {method} {scope['path']} -> {status} in {elapsed * 1000:.1f}ms"
+                f" ({breakdown or 'no phases recorded'})"
+            )
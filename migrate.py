@@ -0,0 +1,329 @@
+"""
+Module applying the versioned schema migrations in the migrations directory.
+
+Migrations are SQL files named <version>_<name>.sql and applied in version
+order. Each applied migration is recorded in the schema_version table with a
+checksum of its file, so a migration runs once and edits to applied files are
+detected. Runs hold a PostgreSQL advisory lock, so only one deploy migrates at
+a time and the others wait for it.
+
+A migration runs in a single transaction unless its first line is
+"-- migrate:no-transaction". Those run statement by statement in autocommit
+mode, which is required for CREATE INDEX CONCURRENTLY and for backfills that
+commit in batches. Their statements must be safe to re-run (IF NOT EXISTS and
+friends), since a failure part way through leaves the earlier ones applied.
+"""
+
+import hashlib
+import os
+import re
+import time
+from dataclasses import dataclass
+import psycopg2
+from db import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+from settings import env
+
+MIGRATIONS_DIR = env.str(
+    "MIGRATIONS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+)
+# DDL gives up instead of queueing behind long transactions and blocking
+# every query that arrives after it
+MIGRATION_LOCK_TIMEOUT = env.str("MIGRATION_LOCK_TIMEOUT", "5s")
+
+# Arbitrary constant shared by every process running migrations
+ADVISORY_LOCK_KEY = 4012202411
+
+NO_TRANSACTION_MARKER = "-- migrate:no-transaction"
+
+MIGRATION_FILE_RE = re.compile(r"^(\d+)_(\w+)\.sql$")
+CONCURRENT_INDEX_RE = re.compile(
+    r"^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)",
+    re.IGNORECASE,
+)
+
+CREATE_SCHEMA_VERSION_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        duration_ms INTEGER NOT NULL
+    );
+"""
+
+SELECT_APPLIED_SQL = """
+    SELECT version, checksum FROM schema_version ORDER BY version;
+"""
+
+RECORD_APPLIED_SQL = """
+    INSERT INTO schema_version (version, name, checksum, duration_ms)
+    VALUES (%s, %s, %s, %s);
+"""
+
+INVALID_INDEX_SQL = """
+    SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE c.relname = %s AND NOT i.indisvalid;
+"""
+
+
+class MigrationError(Exception):
+    """
+    Raised when the migrations on disk do not match the database.
+    """
+
+
+@dataclass
+class Migration:
+    """
+    One migration file.
+    """
+
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def transactional(self):
+        """
+        Whether the migration runs inside a single transaction.
+        """
+        return not self.sql.lstrip().lower().startswith(NO_TRANSACTION_MARKER)
+
+    @property
+    def checksum(self):
+        """
+        SHA-256 of the migration's SQL.
+        """
+        return hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """
+    Read the migration files in a directory.
+
+    Parameters:
+    - directory (str): The directory holding <version>_<name>.sql files.
+
+    Returns:
+        list: Migration objects ordered by version.
+    """
+    migrations = {}
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE_RE.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Duplicate migration version {version}: {filename}")
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            migrations[version] = Migration(version, match.group(2), f.read())
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def split_statements(sql):
+    """
+    Split SQL text into statements on semicolons outside quotes, comments
+    and dollar-quoted bodies.
+
+    Parameters:
+    - sql (str): One or more SQL statements.
+
+    Returns:
+        list: The statements, without their terminating semicolons.
+    """
+    statements = []
+    start = i = 0
+    length = len(sql)
+    while i < length:
+        char = sql[i]
+        if char == "-" and sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = length if end == -1 else end + 1
+        elif char == "/" and sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = length if end == -1 else end + 2
+        elif char in ("'", '"'):
+            end = i + 1
+            while end < length:
+                if sql[end] == char:
+                    if sql.startswith(char * 2, end):
+                        end += 2
+                        continue
+                    break
+                end += 1
+            i = end + 1
+        elif char == "$":
+            match = re.match(r"\$(?:[A-Za-z_]\w*)?\$", sql[i:])
+            if match:
+                tag = match.group(0)
+                end = sql.find(tag, i + len(tag))
+                i = length if end == -1 else end + len(tag)
+            else:
+                i += 1
+        elif char == ";":
+            statements.append(sql[start:i])
+            i += 1
+            start = i
+        else:
+            i += 1
+    statements.append(sql[start:])
+    return [code for code in map(_strip_leading_comments, statements) if code]
+
+
+def _strip_leading_comments(statement):
+    lines = statement.strip().splitlines()
+    while lines and (not lines[0].strip() or lines[0].lstrip().startswith("--")):
+        lines.pop(0)
+    return "\n".join(lines).strip()
+
+
+def connect_database():
+    """
+    Open a plain connection to the customer_order_db database.
+    """
+    return psycopg2.connect(
+        dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
+    )
+
+
+class Migrator:
+    """
+    Applies pending migrations to the database under an advisory lock.
+    """
+
+    def __init__(
+        self,
+        connect=connect_database,
+        directory=MIGRATIONS_DIR,
+        lock_timeout=MIGRATION_LOCK_TIMEOUT,
+    ):
+        self._connect = connect
+        self.directory = directory
+        self.lock_timeout = lock_timeout
+
+    def status(self):
+        """
+        Report which migrations have been applied.
+
+        Returns:
+            list: (version, name, applied) tuples in version order.
+        """
+        conn = self._connect()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                applied = self._applied(cur)
+        finally:
+            conn.close()
+        return [(m.version, m.name, m.version in applied) for m in load_migrations(self.directory)]
+
+    def migrate(self, target=None, dry_run=False):
+        """
+        Apply the pending migrations up to and including target.
+
+        Parameters:
+        - target (int): The last version to apply, all of them if None.
+        - dry_run (bool): Print the pending migrations without applying them.
+
+        Returns:
+            list: The migrations applied, or that would be applied.
+        """
+        conn = self._connect()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                if dry_run:
+                    pending = self._pending(cur, target)
+                    for migration in pending:
+                        self._print_plan(migration)
+                    return pending
+
+                self._lock(cur)
+                try:
+                    cur.execute(CREATE_SCHEMA_VERSION_SQL)
+                    cur.execute("SET lock_timeout = %s;", (self.lock_timeout,))
+                    # Read under the lock, another deploy may have just migrated
+                    pending = self._pending(cur, target)
+                    for migration in pending:
+                        self._apply(conn, cur, migration)
+                finally:
+                    cur.execute("SELECT pg_advisory_unlock(%s);", (ADVISORY_LOCK_KEY,))
+            return pending
+        finally:
+            conn.close()
+
+    def _pending(self, cur, target):
+        applied = self._applied(cur)
+        pending = []
+        for migration in load_migrations(self.directory):
+            if migration.version in applied:
+                if applied[migration.version] != migration.checksum:
+                    raise MigrationError(
+                        f"Migration {migration.version}_{migration.name} has changed "
+                        "since it was applied, add a new migration instead."
+                    )
+            elif target is None or migration.version <= target:
+                pending.append(migration)
+        return pending
+
+    @staticmethod
+    def _applied(cur):
+        cur.execute("SELECT to_regclass('schema_version') IS NOT NULL;")
+        if not cur.fetchone()[0]:
+            return {}
+        cur.execute(SELECT_APPLIED_SQL)
+        return {row[0]: row[1].strip() for row in cur.fetchall()}
+
+    @staticmethod
+    def _lock(cur):
+        cur.execute("SELECT pg_try_advisory_lock(%s);", (ADVISORY_LOCK_KEY,))
+        if not cur.fetchone()[0]:
+            print("Waiting for another migration run to finish...")
+            cur.execute("SELECT pg_advisory_lock(%s);", (ADVISORY_LOCK_KEY,))
+
+    @staticmethod
+    def _print_plan(migration):
+        mode = "transaction" if migration.transactional else "no transaction"
+        print(f"-- {migration.version}_{migration.name} ({mode})")
+        for statement in split_statements(migration.sql):
+            print(statement + ";")
+        print()
+
+    def _apply(self, conn, cur, migration):
+        print(f"Applying migration {migration.version}_{migration.name}...")
+        started = time.perf_counter()
+        if migration.transactional:
+            conn.autocommit = False
+            try:
+                cur.execute(migration.sql)
+                self._record(cur, migration, started)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.autocommit = True
+        else:
+            for statement in split_statements(migration.sql):
+                self._drop_invalid_index(cur, statement)
+                cur.execute(statement)
+            self._record(cur, migration, started)
+
+    @staticmethod
+    def _drop_invalid_index(cur, statement):
+        # A failed CREATE INDEX CONCURRENTLY leaves an invalid index behind,
+        # which IF NOT EXISTS would then keep
+        match = CONCURRENT_INDEX_RE.match(statement)
+        if not match:
+            return
+        cur.execute(INVALID_INDEX_SQL, (match.group(1),))
+        if cur.fetchone():
+            cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{match.group(1)}";')
+
+    @staticmethod
+    def _record(cur, migration, started):
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        cur.execute(
+            RECORD_APPLIED_SQL,
+            (migration.version, migration.name, migration.checksum, duration_ms),
+        )
@@ -0,0 +1,44 @@
+-- Customers, orders and the notification outbox as first deployed.
+-- IF NOT EXISTS lets databases created by the old create_tables adopt
+-- migrations without losing data.
+
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id SERIAL PRIMARY KEY,
+    customer_code VARCHAR(50) UNIQUE NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    telephone VARCHAR(15) UNIQUE NOT NULL,
+    location VARCHAR(100)
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    order_id SERIAL PRIMARY KEY,
+    telephone VARCHAR(15) REFERENCES customers(telephone) ON DELETE CASCADE,
+    item VARCHAR(255) NOT NULL,
+    amount NUMERIC(10, 2) NOT NULL CHECK (amount >= 0),
+    order_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Indexes backing the keyset-paginated, filtered order listings.
+-- Each one serves a filter followed by the pagination key.
+CREATE INDEX IF NOT EXISTS orders_telephone_order_id_idx
+    ON orders (telephone, order_id);
+CREATE INDEX IF NOT EXISTS orders_order_time_order_id_idx
+    ON orders (order_time, order_id);
+CREATE INDEX IF NOT EXISTS orders_item_prefix_idx
+    ON orders (item text_pattern_ops);
+
+-- Notification outbox, rows are written in the same transaction as their order
+CREATE TABLE IF NOT EXISTS outbox (
+    outbox_id BIGSERIAL PRIMARY KEY,
+    order_id INTEGER NOT NULL,
+    telephone VARCHAR(15) NOT NULL,
+    payload JSONB NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    available_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS outbox_pending_idx
+    ON outbox (available_at, outbox_id) WHERE status = 'pending';
@@ -0,0 +1,33 @@
+-- migrate:no-transaction
+-- Prepare the existing orders table to become the first partition of a
+-- table range-partitioned on order_time (0004), without long locks:
+-- order_time becomes NOT NULL, a CHECK constraint proves every row lies
+-- below the partition bound, so attaching skips its full-table scan, and
+-- the unique index the partitioned primary key needs is built concurrently.
+-- The bound leaves at least a month of headroom, run 0004 in the same deploy.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'orders_legacy_bound' AND conrelid = 'orders'::regclass
+    ) AND (SELECT relkind FROM pg_class WHERE oid = 'orders'::regclass) = 'r' THEN
+        UPDATE orders SET order_time = CURRENT_TIMESTAMP WHERE order_time IS NULL;
+        EXECUTE format(
+            'ALTER TABLE orders ADD CONSTRAINT orders_legacy_bound
+                CHECK (order_time IS NOT NULL AND order_time < %L::timestamp) NOT VALID',
+            date_trunc('month', CURRENT_TIMESTAMP) + INTERVAL '2 months'
+        );
+    END IF;
+END $$;
+
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'orders'::regclass) = 'r' THEN
+        ALTER TABLE orders VALIDATE CONSTRAINT orders_legacy_bound;
+        ALTER TABLE orders ALTER COLUMN order_time SET NOT NULL;
+    END IF;
+END $$;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS orders_legacy_order_id_order_time_key
+    ON orders (order_id, order_time);
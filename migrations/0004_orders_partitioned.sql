@@ -0,0 +1,73 @@
+-- Swap orders for a table range-partitioned by month on order_time.
+-- The existing table is renamed to orders_legacy and attached as the
+-- partition for everything below the bound proven by 0003, so no rows are
+-- copied and, thanks to the validated CHECK constraint and prebuilt indexes,
+-- nothing is scanned while the lock is held. New months get their own
+-- partitions, created ahead of time by partitions.py; rows outside every
+-- partition land in orders_default.
+
+ALTER TABLE orders RENAME TO orders_legacy;
+ALTER TABLE orders_legacy
+    ADD CONSTRAINT orders_legacy_order_id_order_time_key
+    UNIQUE USING INDEX orders_legacy_order_id_order_time_key;
+ALTER INDEX orders_pkey RENAME TO orders_legacy_pkey;
+ALTER INDEX orders_customer_id_order_time_idx RENAME TO orders_legacy_customer_id_order_time_idx;
+ALTER INDEX orders_order_time_brin_idx RENAME TO orders_legacy_order_time_brin_idx;
+ALTER INDEX orders_telephone_order_id_idx RENAME TO orders_legacy_telephone_order_id_idx;
+ALTER INDEX orders_order_time_order_id_idx RENAME TO orders_legacy_order_time_order_id_idx;
+ALTER INDEX orders_item_prefix_idx RENAME TO orders_legacy_item_prefix_idx;
+
+-- The primary key must contain the partition key, order_id alone stays
+-- unique through the shared sequence
+CREATE TABLE orders (
+    order_id INTEGER NOT NULL DEFAULT nextval('orders_order_id_seq'),
+    customer_id INTEGER NOT NULL REFERENCES customers(customer_id) ON DELETE CASCADE,
+    telephone VARCHAR(15),
+    item VARCHAR(255) NOT NULL,
+    amount NUMERIC(10, 2) NOT NULL CONSTRAINT orders_amount_check CHECK (amount >= 0),
+    order_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (order_id, order_time)
+) PARTITION BY RANGE (order_time);
+ALTER SEQUENCE orders_order_id_seq OWNED BY orders.order_id;
+
+-- Created on the parent, so every partition gets them; attaching
+-- orders_legacy adopts its matching indexes instead of building new ones
+CREATE INDEX orders_customer_id_order_time_idx ON orders (customer_id, order_time);
+CREATE INDEX orders_order_time_brin_idx ON orders USING BRIN (order_time);
+CREATE INDEX orders_telephone_order_id_idx ON orders (telephone, order_id);
+CREATE INDEX orders_order_time_order_id_idx ON orders (order_time, order_id);
+CREATE INDEX orders_item_prefix_idx ON orders (item text_pattern_ops);
+
+DO $$
+DECLARE
+    bound TIMESTAMP;
+    month_start TIMESTAMP;
+BEGIN
+    SELECT substring(pg_get_constraintdef(oid) FROM '''([^'']+)''')::timestamp
+    INTO bound
+    FROM pg_constraint
+    WHERE conname = 'orders_legacy_bound' AND conrelid = 'orders_legacy'::regclass;
+
+    EXECUTE format(
+        'ALTER TABLE orders ATTACH PARTITION orders_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+        bound
+    );
+
+    -- Two months of partitions past the legacy bound, partitions.py keeps
+    -- creating them from there
+    month_start := bound;
+    FOR i IN 1..2 LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF orders FOR VALUES FROM (%L) TO (%L)',
+            'orders_p' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            month_start + INTERVAL '1 month'
+        );
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+END $$;
+
+CREATE TABLE orders_default PARTITION OF orders DEFAULT;
+
+-- Implied by the partition bound from here on
+ALTER TABLE orders_legacy DROP CONSTRAINT orders_legacy_bound;
@@ -0,0 +1,103 @@
+-- Rollups of orders per customer and per day, kept current by statement-level
+-- triggers on orders, so they change in the same transaction as the orders
+-- themselves whether those come from create_order, bulk uploads or scripts.
+--
+-- Every order of a day would update the same daily_revenue row and queue on
+-- its lock, so each day is split into 16 rows picked by the writing backend;
+-- readers sum them.
+--
+-- Writes to orders wait while this migration backfills the rollups.
+
+CREATE TABLE IF NOT EXISTS customer_order_stats (
+    customer_id INTEGER PRIMARY KEY REFERENCES customers(customer_id) ON DELETE CASCADE,
+    order_count BIGINT NOT NULL DEFAULT 0,
+    total_amount NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    last_order_time TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS daily_revenue (
+    day DATE NOT NULL,
+    shard SMALLINT NOT NULL,
+    order_count BIGINT NOT NULL DEFAULT 0,
+    revenue NUMERIC(16, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, shard)
+);
+
+-- Shared by the INSERT, UPDATE and DELETE triggers. An UPDATE is applied as
+-- the removal of its old rows followed by the insertion of its new ones.
+CREATE OR REPLACE FUNCTION orders_rollup() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE customer_order_stats s SET
+            order_count = s.order_count - o.order_count,
+            total_amount = s.total_amount - o.total_amount,
+            last_order_time = (
+                SELECT max(order_time) FROM orders WHERE orders.customer_id = s.customer_id
+            )
+        FROM (
+            SELECT customer_id, count(*) AS order_count, sum(amount) AS total_amount
+            FROM old_orders GROUP BY customer_id
+        ) o
+        WHERE s.customer_id = o.customer_id;
+
+        INSERT INTO daily_revenue AS d (day, shard, order_count, revenue)
+        SELECT order_time::date, pg_backend_pid() % 16, -count(*), -sum(amount)
+        FROM old_orders
+        GROUP BY order_time::date
+        ORDER BY order_time::date
+        ON CONFLICT (day, shard) DO UPDATE SET
+            order_count = d.order_count + EXCLUDED.order_count,
+            revenue = d.revenue + EXCLUDED.revenue;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        -- Sorted, so concurrent multi-customer statements lock rows in the same order
+        INSERT INTO customer_order_stats AS s (customer_id, order_count, total_amount, last_order_time)
+        SELECT customer_id, count(*), sum(amount), max(order_time)
+        FROM new_orders
+        GROUP BY customer_id
+        ORDER BY customer_id
+        ON CONFLICT (customer_id) DO UPDATE SET
+            order_count = s.order_count + EXCLUDED.order_count,
+            total_amount = s.total_amount + EXCLUDED.total_amount,
+            last_order_time = GREATEST(s.last_order_time, EXCLUDED.last_order_time);
+
+        INSERT INTO daily_revenue AS d (day, shard, order_count, revenue)
+        SELECT order_time::date, pg_backend_pid() % 16, count(*), sum(amount)
+        FROM new_orders
+        GROUP BY order_time::date
+        ORDER BY order_time::date
+        ON CONFLICT (day, shard) DO UPDATE SET
+            order_count = d.order_count + EXCLUDED.order_count,
+            revenue = d.revenue + EXCLUDED.revenue;
+    END IF;
+    RETURN NULL;
+END $$;
+
+-- Triggers first: they lock orders against writes for the rest of the
+-- transaction, so the backfill below sees every committed order and misses none
+CREATE TRIGGER orders_rollup_insert
+    AFTER INSERT ON orders
+    REFERENCING NEW TABLE AS new_orders
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_rollup();
+
+CREATE TRIGGER orders_rollup_update
+    AFTER UPDATE ON orders
+    REFERENCING OLD TABLE AS old_orders NEW TABLE AS new_orders
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_rollup();
+
+CREATE TRIGGER orders_rollup_delete
+    AFTER DELETE ON orders
+    REFERENCING OLD TABLE AS old_orders
+    FOR EACH STATEMENT EXECUTE FUNCTION orders_rollup();
+
+INSERT INTO customer_order_stats (customer_id, order_count, total_amount, last_order_time)
+SELECT customer_id, count(*), sum(amount), max(order_time)
+FROM orders
+GROUP BY customer_id;
+
+INSERT INTO daily_revenue (day, shard, order_count, revenue)
+SELECT order_time::date, 0, count(*), sum(amount)
+FROM orders
+GROUP BY order_time::date;
@@ -0,0 +1,25 @@
+-- Idempotency keys of POST /orders/. A key is recorded in the same
+-- transaction as the order it created, together with a hash of the request
+-- body and the response returned, so a retried request replays the response
+-- instead of creating the order again.
+--
+-- Rows are short-lived: keys past expires_at are reused in place by the next
+-- request with the same key and deleted in batches by python idempotency.py.
+-- The response is stored by an UPDATE right after the order is inserted;
+-- free space left on each page lets it be a HOT update that skips the
+-- indexes. Autovacuum is tuned to keep up with the churn.
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    idempotency_key VARCHAR(255) PRIMARY KEY,
+    request_hash CHAR(64) NOT NULL,
+    status_code SMALLINT,
+    response JSONB,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL
+) WITH (
+    fillfactor = 70,
+    autovacuum_vacuum_scale_factor = 0.02,
+    autovacuum_analyze_scale_factor = 0.02
+);
+
+CREATE INDEX IF NOT EXISTS idempotency_keys_expires_at_idx ON idempotency_keys (expires_at);
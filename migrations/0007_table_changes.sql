@@ -0,0 +1,36 @@
+-- Change counters of the customers and orders tables, the watermarks behind
+-- the ETags of GET /customers/ and GET /orders/. Every statement writing to
+-- either table bumps its counter from a statement-level trigger, in the same
+-- transaction, so the counter and the rows become visible together and
+-- writes from bulk uploads, cascades or scripts are counted too.
+--
+-- As with daily_revenue, each table's counter is split into 16 rows picked
+-- by the writing backend so concurrent writers do not queue on one row lock;
+-- readers sum them.
+
+CREATE TABLE IF NOT EXISTS table_changes (
+    table_name VARCHAR(63) NOT NULL,
+    shard SMALLINT NOT NULL,
+    changes BIGINT NOT NULL DEFAULT 0,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (table_name, shard)
+);
+
+CREATE OR REPLACE FUNCTION count_table_change() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO table_changes AS c (table_name, shard, changes, changed_at)
+    VALUES (TG_TABLE_NAME, pg_backend_pid() % 16, 1, clock_timestamp())
+    ON CONFLICT (table_name, shard) DO UPDATE SET
+        changes = c.changes + 1,
+        changed_at = EXCLUDED.changed_at;
+    RETURN NULL;
+END $$;
+
+CREATE TRIGGER customers_count_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON customers
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_change();
+
+CREATE TRIGGER orders_count_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON orders
+    FOR EACH STATEMENT EXECUTE FUNCTION count_table_change();
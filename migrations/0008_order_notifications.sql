@@ -0,0 +1,48 @@
+-- Notifications of new orders for the live order feed (GET /orders/stream).
+-- A statement-level trigger sends the inserted orders on the new_orders
+-- channel, so orders from create_order, group commit and bulk uploads are
+-- all announced. PostgreSQL delivers notifications at commit, and not at all
+-- on rollback.
+--
+-- A payload is limited to 8000 bytes, so the rows are sent in chunks of 16,
+-- each a JSON array of orders ordered by order_id; an order with the longest
+-- item takes about 400 bytes.
+--
+-- Committing a transaction that notified takes a cluster-wide lock. If that
+-- ever limits order throughput, turn the notifications off without dropping
+-- the trigger:
+--     ALTER DATABASE customer_order_db SET orders.notify = 'off';
+
+CREATE OR REPLACE FUNCTION notify_new_orders() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    chunk TEXT;
+BEGIN
+    IF current_setting('orders.notify', true) = 'off' THEN
+        RETURN NULL;
+    END IF;
+    FOR chunk IN
+        SELECT json_agg(json_build_object(
+            'order_id', order_id,
+            'customer_id', customer_id,
+            'telephone', telephone,
+            'item', item,
+            'amount', amount,
+            'order_time', order_time
+        ) ORDER BY order_id)::text
+        FROM (
+            SELECT *, (row_number() OVER (ORDER BY order_id) - 1) / 16 AS chunk_number
+            FROM new_orders
+        ) numbered
+        GROUP BY chunk_number
+        ORDER BY chunk_number
+    LOOP
+        PERFORM pg_notify('new_orders', chunk);
+    END LOOP;
+    RETURN NULL;
+END $$;
+
+CREATE TRIGGER orders_notify_insert
+    AFTER INSERT ON orders
+    REFERENCING NEW TABLE AS new_orders
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_new_orders();
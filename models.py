@@ -1,12 +1,18 @@
 """
 Module to define Pydantic models for customer and order input.
 
-It contains two classes: CustomerCreate and OrderCreate.
+It contains the CustomerCreate and OrderCreate input models, the query
+parameter models for listing, exporting and summarising customers and orders,
+and the Customer and Order response models.
 """
 
-from typing import Optional
-from datetime import datetime
+from typing import List, Literal, Optional
+from datetime import date, datetime
 from pydantic import BaseModel, Field
+from typing_extensions import TypedDict
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
 
 class CustomerCreate(BaseModel):
     """
@@ -33,3 +39,89 @@ class OrderCreate(BaseModel):
     item: str
     amount: float
     order_time: Optional[datetime] = None
+
+class CustomerListQuery(BaseModel):
+    """
+    Query parameters for listing customers one page at a time.
+    """
+    limit: int = Field(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+    page_token: Optional[str] = Field(None, description="next_page_token of the previous page")
+    telephone: Optional[str] = None
+
+class OrderFilters(BaseModel):
+    """
+    Query parameters filtering orders.
+    """
+    telephone: Optional[str] = None
+    from_time: Optional[datetime] = Field(None, description="Inclusive lower bound on order_time")
+    to_time: Optional[datetime] = Field(None, description="Exclusive upper bound on order_time")
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    item_prefix: Optional[str] = None
+
+class OrderListQuery(OrderFilters):
+    """
+    Query parameters for listing orders one page at a time.
+    """
+    limit: int = Field(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+    page_token: Optional[str] = Field(None, description="next_page_token of the previous page")
+    sort: Literal["order_id", "order_time"] = "order_id"
+    descending: bool = False
+
+class ExportQuery(BaseModel):
+    """
+    Query parameters selecting the export format.
+    """
+    format: Literal["ndjson", "csv"] = "ndjson"
+    use_copy: bool = Field(True, description="Stream CSV with COPY ... TO STDOUT")
+
+class OrderExportQuery(ExportQuery, OrderFilters):
+    """
+    Query parameters for exporting orders.
+    """
+
+class DailyRevenueQuery(BaseModel):
+    """
+    Query parameters selecting the days of the daily revenue summary.
+    """
+    from_date: Optional[date] = Field(None, description="First day, 30 days before to_date by default")
+    to_date: Optional[date] = Field(None, description="Day after the last one, tomorrow by default")
+
+# Response models are TypedDicts rather than BaseModels: the rows fetched from
+# the database are already dicts, so pydantic serializes them as they are,
+# without building a model instance per row.
+
+class Customer(TypedDict):
+    """
+    A customer as returned by the API.
+    """
+    customer_id: int
+    customer_code: str
+    name: str
+    telephone: str
+    location: Optional[str]
+
+class Order(TypedDict):
+    """
+    An order as returned by the API.
+    """
+    order_id: int
+    customer_id: Optional[int]
+    telephone: str
+    item: str
+    amount: float
+    order_time: Optional[datetime]
+
+class CustomerPage(TypedDict):
+    """
+    One page of customers and the token of the next page.
+    """
+    items: List[Customer]
+    next_page_token: Optional[str]
+
+class OrderPage(TypedDict):
+    """
+    One page of orders and the token of the next page.
+    """
+    items: List[Order]
+    next_page_token: Optional[str]
@@ -0,0 +1,331 @@
+"""
+Module implementing group commit for order inserts.
+
+Without it every create_order runs its own INSERT and COMMIT, so at high
+request rates throughput is bound by the latency of flushing each commit to
+disk. With ORDER_BATCHING enabled, create_order hands the order to the
+OrderBatcher instead. A single flusher thread collects the orders arriving
+within ORDER_BATCH_MAX_DELAY seconds (or until ORDER_BATCH_MAX_SIZE are
+waiting) and writes them as one multi-row INSERT ... RETURNING, with their
+outbox rows, in one transaction. Each waiting request gets its own order_id
+back through a Future.
+
+If the batch fails, for instance because one customer was deleted after its
+order was validated, the transaction is rolled back and the orders are
+inserted one by one in their own transactions, so only the offending order
+fails. Batch sizes and flush latencies are recorded in the
+order_batch_size and order_batch_flush_duration_seconds histograms.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+import psycopg2
+from psycopg2 import errorcodes
+from psycopg2.extras import execute_values
+from db import get_db_connection
+from metrics import REGISTRY, phase
+from outbox import INSERT_OUTBOX_SQL, SMS_DELIVERY, outbox_params
+from settings import env
+
+ORDER_BATCHING = env.bool("ORDER_BATCHING", False)
+ORDER_BATCH_MAX_SIZE = env.int("ORDER_BATCH_MAX_SIZE", 100)
+# Seconds the first order of a batch waits for others to join it
+ORDER_BATCH_MAX_DELAY = env.float("ORDER_BATCH_MAX_DELAY", 0.005)
+# Seconds a request waits for its batch to commit
+ORDER_BATCH_TIMEOUT = env.float("ORDER_BATCH_TIMEOUT", 10)
+
+ORDER_BATCH_SIZE = REGISTRY.histogram(
+    "order_batch_size", "Orders written per group commit.", (),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+ORDER_BATCH_FLUSH_DURATION = REGISTRY.histogram(
+    "order_batch_flush_duration_seconds", "Time to insert and commit one batch of orders.", ("outcome",)
+)
+
+# order_id is drawn from the orders sequence in the CTE, so every row of the
+# batch knows its id and position no matter the order RETURNING yields rows in.
+INSERT_ORDER_BATCH_SQL = """
+    WITH batch AS (
+        SELECT v.row_num, v.customer_id, v.telephone, v.item, v.amount, v.order_time,
+               nextval(pg_get_serial_sequence('orders', 'order_id')) AS order_id
+        FROM (VALUES %s) AS v (row_num, customer_id, telephone, item, amount, order_time)
+    ), inserted AS (
+        INSERT INTO orders (order_id, customer_id, telephone, item, amount, order_time)
+        SELECT order_id, customer_id, telephone, item, amount, COALESCE(order_time, CURRENT_TIMESTAMP)
+        FROM batch
+        ORDER BY row_num
+        RETURNING order_id
+    )
+    SELECT batch.row_num, batch.order_id
+    FROM batch JOIN inserted USING (order_id);
+"""
+
+ORDER_BATCH_TEMPLATE = "(%s::integer, %s::integer, %s::text, %s::text, %s::numeric, %s::timestamp)"
+
+INSERT_ORDER_SQL = """
+    INSERT INTO orders (customer_id, telephone, item, amount, order_time)
+    VALUES (%s, %s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP))
+    RETURNING order_id;
+"""
+
+
+class OrderBatchError(Exception):
+    """
+    Raised to a request whose order could not be inserted.
+    """
+
+
+class UnknownCustomerError(OrderBatchError):
+    """
+    Raised when the order's customer no longer exists.
+    """
+
+
+class OrderBatcher:
+    """
+    Collects concurrent orders and inserts them in group commits.
+
+    All database work happens on the flusher thread over one dedicated
+    connection, opened with connect and reopened after a connection error.
+    """
+
+    def __init__(self, connect=get_db_connection, max_batch_size=ORDER_BATCH_MAX_SIZE,
+                 max_delay=ORDER_BATCH_MAX_DELAY, write_outbox=None):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.write_outbox = SMS_DELIVERY == "outbox" if write_outbox is None else write_outbox
+        self._connect = connect
+        self._conn = None
+        self._cond = threading.Condition()
+        self._pending = []  # (params, job, future)
+        self._deadline = None
+        self._closed = False
+        self._stats = {"orders": 0, "batches": 0, "fallbacks": 0, "errors": 0, "flush_seconds": 0.0}
+        self._flusher = threading.Thread(target=self._run, name="order-batcher", daemon=True)
+        self._flusher.start()
+
+    def submit(self, customer_id, order, job=None):
+        """
+        Queue one order for the next batch.
+
+        Parameters:
+        - customer_id (int): The id of the ordering customer.
+        - order (OrderCreate): The validated order.
+        - job (SMSJob): The notification written to the outbox with the order.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the new order_id, or raises
+            UnknownCustomerError or OrderBatchError.
+        """
+        future = Future()
+        params = (customer_id, order.telephone, order.item, order.amount, order.order_time)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("OrderBatcher is closed.")
+            if not self._pending:
+                self._deadline = time.monotonic() + self.max_delay
+            self._pending.append((params, job, future))
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch_size:
+                self._cond.notify()
+        return future
+
+    def insert(self, customer_id, order, job=None, timeout=ORDER_BATCH_TIMEOUT):
+        """
+        Insert an order through the next batch and wait for its order_id.
+        """
+        with phase("order_batch"):
+            return self.submit(customer_id, order, job).result(timeout)
+
+    async def ainsert(self, customer_id, order, job=None, timeout=ORDER_BATCH_TIMEOUT):
+        """
+        Same as insert, but awaits the batch without blocking the event loop.
+        """
+        with phase("order_batch"):
+            future = asyncio.wrap_future(self.submit(customer_id, order, job))
+            return await asyncio.wait_for(future, timeout)
+
+    def close(self):
+        """
+        Write the pending orders, stop the flusher and close its connection.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._flusher.join()
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except psycopg2.Error:
+                pass
+            self._conn = None
+
+    def stats(self):
+        """
+        Snapshot of the batching counters.
+
+        Returns:
+            dict: Orders flushed, batches committed, batches that fell back to
+            single inserts, failed orders, pending orders, average batch size
+            and average flush time in milliseconds.
+        """
+        with self._cond:
+            stats = dict(self._stats, pending=len(self._pending))
+        flush_seconds = stats.pop("flush_seconds")
+        stats["avg_batch_size"] = stats["orders"] / stats["batches"] if stats["batches"] else 0.0
+        stats["avg_flush_ms"] = flush_seconds * 1000 / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._pending and (
+                        len(self._pending) >= self.max_batch_size or time.monotonic() >= self._deadline
+                    ):
+                        break
+                    self._cond.wait(self._deadline - time.monotonic() if self._pending else None)
+                if self._closed and not self._pending:
+                    return
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+                # Orders left over start the next window now
+                self._deadline = time.monotonic() + self.max_delay
+            self._flush(batch)
+
+    def _flush(self, batch):
+        ORDER_BATCH_SIZE.observe(len(batch))
+        started = time.perf_counter()
+        try:
+            order_ids = self._insert_batch(batch)
+        except psycopg2.Error as e:
+            print(f"Batch of {len(batch)} orders failed, inserting them one by one:", e)
+            self._reset_connection()
+            self._insert_each(batch)
+            elapsed = time.perf_counter() - started
+            ORDER_BATCH_FLUSH_DURATION.observe(elapsed, outcome="fallback")
+            self._count(batch, elapsed, fallback=True)
+            return
+        elapsed = time.perf_counter() - started
+        ORDER_BATCH_FLUSH_DURATION.observe(elapsed, outcome="batch")
+        self._count(batch, elapsed)
+        for (_, _, future), order_id in zip(batch, order_ids):
+            future.set_result(order_id)
+
+    def _insert_batch(self, batch):
+        conn = self._connection()
+        with conn.cursor() as cur:
+            rows = execute_values(
+                cur,
+                INSERT_ORDER_BATCH_SQL,
+                [(index,) + params for index, (params, _, _) in enumerate(batch)],
+                template=ORDER_BATCH_TEMPLATE,
+                page_size=len(batch),
+                fetch=True,
+            )
+            order_ids = [None] * len(batch)
+            for row in rows:
+                order_ids[row["row_num"]] = row["order_id"]
+            if self.write_outbox:
+                outbox_rows = [
+                    outbox_params(order_id, job)
+                    for order_id, (_, job, _) in zip(order_ids, batch) if job is not None
+                ]
+                if outbox_rows:
+                    execute_values(
+                        cur,
+                        "INSERT INTO outbox (order_id, telephone, payload) VALUES %s",
+                        outbox_rows,
+                        template="(%s, %s, %s::jsonb)",
+                    )
+        conn.commit()
+        return order_ids
+
+    def _insert_each(self, batch):
+        for params, job, future in batch:
+            try:
+                conn = self._connection()
+                with conn.cursor() as cur:
+                    cur.execute(INSERT_ORDER_SQL, params)
+                    order_id = cur.fetchone()["order_id"]
+                    if self.write_outbox and job is not None:
+                        cur.execute(INSERT_OUTBOX_SQL, outbox_params(order_id, job))
+                conn.commit()
+            except psycopg2.Error as e:
+                self._reset_connection()
+                with self._cond:
+                    self._stats["errors"] += 1
+                if e.pgcode == errorcodes.FOREIGN_KEY_VIOLATION:
+                    future.set_exception(UnknownCustomerError("Telephone number does not exist."))
+                else:
+                    future.set_exception(OrderBatchError(str(e)))
+            except Exception as e:  # pylint: disable=broad-except
+                self._reset_connection()
+                future.set_exception(OrderBatchError(str(e)))
+            else:
+                future.set_result(order_id)
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = self._connect()
+        return self._conn
+
+    def _reset_connection(self):
+        """
+        Roll back the failed transaction, or drop the connection if that fails too.
+        """
+        if self._conn is None:
+            return
+        try:
+            self._conn.rollback()
+        except psycopg2.Error:
+            try:
+                self._conn.close()
+            except psycopg2.Error:
+                pass
+            self._conn = None
+
+    def _count(self, batch, elapsed, fallback=False):
+        with self._cond:
+            self._stats["orders"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["fallbacks"] += int(fallback)
+            self._stats["flush_seconds"] += elapsed
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_order_batcher():
+    """
+    Return the shared order batcher, starting it on first use.
+    """
+    global _batcher  # pylint: disable=global-statement
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = OrderBatcher()
+        return _batcher
+
+
+def order_batcher_stats():
+    """
+    Return the shared batcher's statistics without starting it.
+
+    Returns:
+        dict: The batcher's stats(), or None if it is not running.
+    """
+    batcher = _batcher
+    return batcher.stats() if batcher is not None else None
+
+
+def stop_order_batcher():
+    """
+    Write the pending orders and stop the shared batcher.
+    """
+    global _batcher  # pylint: disable=global-statement
+    with _batcher_lock:
+        batcher, _batcher = _batcher, None
+    if batcher is not None:
+        batcher.close()
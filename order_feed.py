@@ -0,0 +1,323 @@
+"""
+Module streaming new orders to connected clients as server-sent events.
+
+New orders are announced by PostgreSQL on the new_orders channel when their
+transaction commits (see migrations/0008_order_notifications.sql), whether
+they come from create_order, group commit or bulk uploads. Each worker runs
+a single listener thread holding one LISTEN connection, whatever the number
+of clients. The thread hands every batch of notifications to the event loop,
+which encodes it once and fans the same bytes out to every subscriber.
+
+Each subscriber has a bounded buffer of ORDER_FEED_BUFFER_SIZE events. A
+client reading too slowly to keep up does not hold up the others: when its
+buffer is full, the buffered events are dropped and replaced by a reset
+event telling it to reload the listing. Clients get a reset too after the
+listener reconnects, as notifications sent in between are lost.
+
+Streams wait on their buffer alone. A single timer per feed queues a
+keep-alive comment for the subscribers that got nothing since its last
+tick, rather than each stream arming its own timeout on every event.
+"""
+
+import asyncio
+import json
+import select
+import threading
+import psycopg2
+from db import get_db_connection
+from metrics import REGISTRY
+from settings import env
+
+ORDER_FEED_ENABLED = env.bool("ORDER_FEED_ENABLED", True)
+# Events buffered per client before it is asked to reload instead
+ORDER_FEED_BUFFER_SIZE = env.int("ORDER_FEED_BUFFER_SIZE", 64)
+ORDER_FEED_MAX_SUBSCRIBERS = env.int("ORDER_FEED_MAX_SUBSCRIBERS", 10000)
+# Seconds between keep-alive comments on an idle stream
+ORDER_FEED_HEARTBEAT_INTERVAL = env.float("ORDER_FEED_HEARTBEAT_INTERVAL", 15)
+ORDER_FEED_RECONNECT_DELAY = env.float("ORDER_FEED_RECONNECT_DELAY", 5)
+
+CHANNEL = "new_orders"
+MEDIA_TYPE = "text/event-stream"
+
+# Sent first: how long browsers wait before reconnecting, in milliseconds
+RETRY_EVENT = b"retry: 3000\n\n"
+HEARTBEAT_EVENT = b": keep-alive\n\n"
+RESET_EVENT = b"event: reset\ndata: {}\n\n"
+_CLOSE = object()
+
+ORDER_FEED_EVENTS = REGISTRY.counter(
+    "order_feed_events_total", "Batches of new orders published to the order feed."
+)
+ORDER_FEED_RESETS = REGISTRY.counter(
+    "order_feed_resets_total", "Reset events sent to clients, by reason.", ("reason",)
+)
+
+
+class FeedFull(Exception):
+    """
+    Raised when a worker already serves ORDER_FEED_MAX_SUBSCRIBERS clients.
+    """
+
+
+def decode_notifications(payloads):
+    """
+    Decode notification payloads, each a JSON array of orders sent by the trigger.
+
+    Returns:
+        list: The orders of every payload, in order.
+    """
+    orders = []
+    for payload in payloads:
+        orders.extend(json.loads(payload))
+    return orders
+
+
+def encode_orders(orders):
+    """
+    Encode orders as one "orders" server-sent event.
+
+    Returns:
+        bytes: The event, its data a single JSON array of the orders.
+    """
+    data = json.dumps(orders, separators=(",", ":"))
+    return f"event: orders\ndata: {data}\n\n".encode()
+
+
+class Subscriber:
+    """
+    One connected client and its bounded buffer of encoded events.
+
+    Only used from the event loop.
+    """
+
+    def __init__(self, buffer_size=ORDER_FEED_BUFFER_SIZE):
+        self.queue = asyncio.Queue()
+        self.buffer_size = buffer_size
+        self.resets = 0
+        # Whether an event was buffered since the last heartbeat tick
+        self.active = False
+
+    def put(self, event):
+        """
+        Buffer an event, replacing the whole buffer by a reset event when full.
+        """
+        self.active = True
+        # Resets and the end of the stream always fit
+        if self.queue.qsize() < self.buffer_size or event is RESET_EVENT or event is _CLOSE:
+            self.queue.put_nowait(event)
+            return
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(RESET_EVENT)
+        self.resets += 1
+        ORDER_FEED_RESETS.inc(reason="slow_client")
+
+
+class OrderFeed:
+    """
+    LISTEN thread fanning order notifications out to subscribers.
+
+    Subscribers are added, removed and published to on the event loop only,
+    so the subscriber set needs no lock.
+    """
+
+    def __init__(
+        self,
+        connect=get_db_connection,
+        buffer_size=ORDER_FEED_BUFFER_SIZE,
+        max_subscribers=ORDER_FEED_MAX_SUBSCRIBERS,
+        reconnect_delay=ORDER_FEED_RECONNECT_DELAY,
+        heartbeat_interval=ORDER_FEED_HEARTBEAT_INTERVAL,
+    ):
+        self._connect = connect
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.reconnect_delay = reconnect_delay
+        self.heartbeat_interval = heartbeat_interval
+        self._subscribers = set()
+        self._loop = None
+        self._thread = None
+        self._heartbeat = None
+        self._stop = threading.Event()
+        self._stats = {"events": 0, "orders": 0, "reconnects": 0}
+
+    def start(self, loop):
+        """
+        Start the listener thread, delivering events on loop. Called from the loop.
+        """
+        self._loop = loop
+        self._heartbeat = loop.call_later(self.heartbeat_interval, self._tick)
+        self._thread = threading.Thread(target=self._run, name="order-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Stop the listener thread and end every open stream.
+        """
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        for subscriber in list(self._subscribers):
+            subscriber.put(_CLOSE)
+
+    def subscribe(self):
+        """
+        Register a new client.
+
+        Returns:
+            Subscriber: The client's buffer, to be passed to unsubscribe when done.
+        """
+        if len(self._subscribers) >= self.max_subscribers:
+            raise FeedFull(f"The order feed already has {self.max_subscribers} subscribers.")
+        subscriber = Subscriber(self.buffer_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """
+        Forget a client.
+        """
+        self._subscribers.discard(subscriber)
+
+    def publish(self, event):
+        """
+        Buffer an encoded event for every subscriber. Runs on the event loop.
+        """
+        for subscriber in list(self._subscribers):
+            subscriber.put(event)
+
+    def heartbeat(self):
+        """
+        Queue a keep-alive comment for every subscriber idle since the last call.
+        Runs on the event loop.
+        """
+        for subscriber in list(self._subscribers):
+            if not subscriber.active and subscriber.queue.empty():
+                subscriber.queue.put_nowait(HEARTBEAT_EVENT)
+            subscriber.active = False
+
+    async def stream(self, subscriber):
+        """
+        Yield a subscriber's events and keep-alive comments.
+
+        The subscriber is removed when the client disconnects.
+        """
+        try:
+            yield RETRY_EVENT
+            while True:
+                event = await subscriber.queue.get()
+                if event is _CLOSE:
+                    return
+                yield event
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        """
+        Snapshot of the feed counters.
+
+        Returns:
+            dict: Connected subscribers, events and orders published, and
+            listener reconnects.
+        """
+        return dict(self._stats, subscribers=len(self._subscribers))
+
+    def _tick(self):
+        if self._stop.is_set():
+            return
+        self.heartbeat()
+        self._heartbeat = self._loop.call_later(self.heartbeat_interval, self._tick)
+
+    def _deliver(self, event):
+        try:
+            self._loop.call_soon_threadsafe(self.publish, event)
+        except RuntimeError:
+            # The event loop has closed, the application is shutting down
+            self._stop.set()
+
+    def _run(self):
+        connected_before = False
+        while not self._stop.is_set():
+            try:
+                conn = self._connect()
+            except psycopg2.Error as exc:
+                print(f"Order feed cannot connect, retrying in {self.reconnect_delay:.0f}s: {exc}")
+                self._stop.wait(self.reconnect_delay)
+                continue
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL};")
+                if connected_before:
+                    # Orders committed while disconnected were never announced
+                    self._stats["reconnects"] += 1
+                    ORDER_FEED_RESETS.inc(reason="reconnect")
+                    self._deliver(RESET_EVENT)
+                connected_before = True
+                self._listen(conn)
+            except psycopg2.Error as exc:
+                print(f"Order feed lost its connection, reconnecting: {exc}")
+                self._stop.wait(self.reconnect_delay)
+            finally:
+                conn.close()
+
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            if select.select([conn], [], [], 1.0) == ([], [], []):
+                continue
+            conn.poll()
+            if not conn.notifies:
+                continue
+            orders = decode_notifications(notify.payload for notify in conn.notifies)
+            conn.notifies.clear()
+            self._stats["events"] += 1
+            self._stats["orders"] += len(orders)
+            ORDER_FEED_EVENTS.inc()
+            self._deliver(encode_orders(orders))
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def start_order_feed(loop):
+    """
+    Start the shared order feed, delivering events on loop.
+
+    Returns:
+        OrderFeed: The running feed.
+    """
+    global _feed  # pylint: disable=global-statement
+    with _feed_lock:
+        if _feed is None:
+            _feed = OrderFeed()
+            _feed.start(loop)
+        return _feed
+
+
+def get_order_feed():
+    """
+    Return the shared order feed, or None when it is not running.
+    """
+    return _feed
+
+
+def order_feed_stats():
+    """
+    Return the shared feed's statistics, or None when it is not running.
+    """
+    feed = _feed
+    return feed.stats() if feed is not None else None
+
+
+def stop_order_feed(timeout=5.0):
+    """
+    Stop the shared order feed.
+    """
+    global _feed  # pylint: disable=global-statement
+    with _feed_lock:
+        feed, _feed = _feed, None
+    if feed is not None:
+        feed.stop(timeout)
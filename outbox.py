@@ -0,0 +1,199 @@
+"""
+Module implementing the transactional outbox for order notifications.
+
+When SMS_DELIVERY=outbox, create_order writes the notification to the outbox
+table in the same transaction as the order, so a notification exists if and
+only if the order was committed. The relay in this module runs as a separate
+process (python outbox.py), claims pending rows in batches with
+FOR UPDATE SKIP LOCKED, sends them and marks them sent. Any number of relays
+can run side by side on different nodes without picking the same rows.
+"""
+
+import argparse
+import json
+import time
+from dataclasses import asdict
+from db import get_db_connection
+from send_sms import SendSMS
+from settings import env
+from sms_dispatcher import SMSJob
+
+# "queue" sends from the in-process dispatcher, "outbox" through the outbox relay
+SMS_DELIVERY = env.str("SMS_DELIVERY", "queue").lower()
+
+OUTBOX_BATCH_SIZE = env.int("OUTBOX_BATCH_SIZE", 50)
+OUTBOX_POLL_INTERVAL = env.float("OUTBOX_POLL_INTERVAL", 1)
+OUTBOX_MAX_ATTEMPTS = env.int("OUTBOX_MAX_ATTEMPTS", 5)
+OUTBOX_BACKOFF_BASE = env.float("OUTBOX_BACKOFF_BASE", 2)
+OUTBOX_BACKOFF_MAX = env.float("OUTBOX_BACKOFF_MAX", 300)
+
+INSERT_OUTBOX_SQL = """
+    INSERT INTO outbox (order_id, telephone, payload)
+    VALUES (%s, %s, %s::jsonb);
+"""
+
+CLAIM_OUTBOX_SQL = """
+    SELECT outbox_id, payload, attempts
+    FROM outbox
+    WHERE status = 'pending' AND available_at <= CURRENT_TIMESTAMP
+    ORDER BY outbox_id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED;
+"""
+
+MARK_SENT_SQL = """
+    UPDATE outbox
+    SET status = 'sent', sent_at = CURRENT_TIMESTAMP, attempts = attempts + 1
+    WHERE outbox_id = ANY(%s);
+"""
+
+MARK_FAILED_SQL = """
+    UPDATE outbox
+    SET attempts = attempts + 1,
+        last_error = %s,
+        status = CASE WHEN attempts + 1 >= %s THEN 'failed' ELSE 'pending' END,
+        available_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+    WHERE outbox_id = %s;
+"""
+
+
+def outbox_params(order_id, job):
+    """
+    Build the parameters for INSERT_OUTBOX_SQL.
+
+    Parameters:
+    - order_id (int): The id of the order the notification belongs to.
+    - job (SMSJob): The notification to store.
+
+    Returns:
+        tuple: Parameters matching INSERT_OUTBOX_SQL.
+    """
+    payload = asdict(job)
+    payload.pop("attempts")
+    return (order_id, job.telephone, json.dumps(payload))
+
+
+def write_notification(cur, order_id, job):
+    """
+    Insert an order notification into the outbox using the caller's transaction.
+
+    Parameters:
+    - cur (psycopg2.cursor): Cursor of the transaction that inserted the order.
+    - order_id (int): The id of the new order.
+    - job (SMSJob): The notification to send once the transaction commits.
+    """
+    cur.execute(INSERT_OUTBOX_SQL, outbox_params(order_id, job))
+
+
+class OutboxRelay:
+    """
+    Relay sending pending outbox rows through SendSMS.
+
+    Each batch is claimed, sent and marked inside one transaction. Rows stay
+    locked until the transaction commits, so concurrent relays skip them.
+    """
+
+    def __init__(
+        self,
+        connect=get_db_connection,
+        sms_service=None,
+        batch_size=OUTBOX_BATCH_SIZE,
+        max_attempts=OUTBOX_MAX_ATTEMPTS,
+        backoff_base=OUTBOX_BACKOFF_BASE,
+        backoff_max=OUTBOX_BACKOFF_MAX,
+    ):
+        self._connect = connect
+        self.sms_service = sms_service if sms_service is not None else SendSMS()
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._conn = None
+
+    def relay_batch(self):
+        """
+        Claim, send and mark one batch of pending notifications.
+
+        Returns:
+            int: The number of rows claimed.
+        """
+        conn = self._connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(CLAIM_OUTBOX_SQL, (self.batch_size,))
+                rows = cur.fetchall()
+                sent = []
+                for row in rows:
+                    payload = row["payload"]
+                    if isinstance(payload, str):
+                        payload = json.loads(payload)
+                    job = SMSJob(**payload)
+                    try:
+                        self.sms_service.send_order(
+                            job.telephone, job.item, job.amount, job.order_time
+                        )
+                        sent.append(row["outbox_id"])
+                    except Exception as e:  # pylint: disable=broad-except
+                        delay = min(self.backoff_max, self.backoff_base * 2 ** row["attempts"])
+                        cur.execute(
+                            MARK_FAILED_SQL, (str(e), self.max_attempts, delay, row["outbox_id"])
+                        )
+                if sent:
+                    cur.execute(MARK_SENT_SQL, (sent,))
+            conn.commit()
+            return len(rows)
+        except Exception:
+            self._reset()
+            raise
+
+    def run(self, poll_interval=OUTBOX_POLL_INTERVAL, once=False):
+        """
+        Relay batches until interrupted, sleeping when the outbox is empty.
+
+        Parameters:
+        - poll_interval (float): Seconds to wait after an empty or failed batch.
+        - once (bool): Stop as soon as the outbox has no pending rows.
+        """
+        while True:
+            try:
+                claimed = self.relay_batch()
+            except Exception as e:  # pylint: disable=broad-except
+                print("Error relaying outbox batch:", e)
+                claimed = 0
+            if claimed:
+                continue
+            if once:
+                return
+            time.sleep(poll_interval)
+
+    def close(self):
+        """
+        Close the relay's database connection.
+        """
+        self._reset()
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = self._connect()
+        return self._conn
+
+    def _reset(self):
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.closed:
+            conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Relay order notifications from the outbox.")
+    parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+    parser.add_argument("--poll-interval", type=float, default=OUTBOX_POLL_INTERVAL)
+    parser.add_argument("--once", action="store_true", help="exit when the outbox is empty")
+    args = parser.parse_args()
+
+    relay = OutboxRelay(batch_size=args.batch_size)
+    try:
+        relay.run(poll_interval=args.poll_interval, once=args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        relay.close()
@@ -0,0 +1,193 @@
+"""
+Module implementing keyset pagination for the customer and order listings.
+
+Pages are read with a WHERE clause on the sort key instead of OFFSET, so
+every page is an index range scan no matter how deep the client pages.
+The position of the last row of a page is handed to the client as an
+opaque next_page_token.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+
+class PageTokenError(ValueError):
+    """
+    Raised when a page token is malformed or does not match the query.
+    """
+
+
+def encode_page_token(sort, values):
+    """
+    Encode the sort key of the last row of a page.
+
+    Parameters:
+    - sort (str): The sort the page was read with.
+    - values (list): The sort key values of the last row.
+
+    Returns:
+        str: URL-safe opaque token.
+    """
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps({"s": sort, "v": values}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_page_token(token, sort):
+    """
+    Decode a page token produced by encode_page_token.
+
+    Parameters:
+    - token (str): The token sent by the client.
+    - sort (str): The sort of the current request, must match the token's.
+
+    Returns:
+        list: The sort key values of the last row of the previous page.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        token_sort, values = data["s"], data["v"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as exc:
+        raise PageTokenError("Invalid page token.") from exc
+    if token_sort != sort or not isinstance(values, list):
+        raise PageTokenError("Page token does not match the requested sort order.")
+    if sort == "order_time":
+        try:
+            values[0] = datetime.fromisoformat(values[0])
+        except (TypeError, ValueError) as exc:
+            raise PageTokenError("Invalid page token.") from exc
+    return values
+
+
+def escape_like(value):
+    """
+    Escape LIKE wildcards so value is matched literally.
+    """
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def customer_page_query(params):
+    """
+    Build the SELECT for one page of customers ordered by customer_id.
+
+    Parameters:
+    - params (CustomerListQuery): The request's query parameters.
+
+    Returns:
+        tuple: SQL string and its parameters. One row more than the limit is
+        selected to detect whether a next page exists.
+    """
+    conditions, args = [], []
+    if params.telephone:
+        conditions.append("telephone = %s")
+        args.append(params.telephone)
+    if params.page_token:
+        (last_id,) = decode_page_token(params.page_token, "customer_id")
+        conditions.append("customer_id > %s")
+        args.append(last_id)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    args.append(params.limit + 1)
+    return f"SELECT * FROM customers{where} ORDER BY customer_id LIMIT %s;", args
+
+
+def order_filter_conditions(params):
+    """
+    Translate OrderFilters into SQL conditions.
+
+    Parameters:
+    - params (OrderFilters): The request's filter parameters.
+
+    Returns:
+        tuple: List of SQL conditions and the list of their parameters.
+    """
+    conditions, args = [], []
+    if params.telephone:
+        conditions.append("telephone = %s")
+        args.append(params.telephone)
+    if params.from_time is not None:
+        conditions.append("order_time >= %s")
+        args.append(params.from_time)
+    if params.to_time is not None:
+        conditions.append("order_time < %s")
+        args.append(params.to_time)
+    if params.min_amount is not None:
+        conditions.append("amount >= %s")
+        args.append(params.min_amount)
+    if params.max_amount is not None:
+        conditions.append("amount <= %s")
+        args.append(params.max_amount)
+    if params.item_prefix:
+        conditions.append("item LIKE %s")
+        args.append(escape_like(params.item_prefix) + "%")
+    return conditions, args
+
+
+def order_page_query(params):
+    """
+    Build the SELECT for one page of orders.
+
+    Orders are sorted by order_id, or by (order_time, order_id) so that rows
+    sharing an order_time are still totally ordered.
+
+    Parameters:
+    - params (OrderListQuery): The request's query parameters.
+
+    Returns:
+        tuple: SQL string and its parameters, selecting one row more than the limit.
+    """
+    conditions, args = order_filter_conditions(params)
+
+    key = "(order_time, order_id)" if params.sort == "order_time" else "order_id"
+    direction = "DESC" if params.descending else "ASC"
+    if params.page_token:
+        values = decode_page_token(params.page_token, params.sort)
+        comparison = "<" if params.descending else ">"
+        if params.sort == "order_time":
+            conditions.append(f"{key} {comparison} (%s, %s)")
+            args.extend(values[:2])
+        else:
+            conditions.append(f"{key} {comparison} %s")
+            args.append(values[0])
+
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    if params.sort == "order_time":
+        order_by = f"order_time {direction}, order_id {direction}"
+    else:
+        order_by = f"order_id {direction}"
+    args.append(params.limit + 1)
+    return f"SELECT * FROM orders{where} ORDER BY {order_by} LIMIT %s;", args
+
+
+def customer_page(rows, limit):
+    """
+    Trim the fetched customers to one page and compute the next page token.
+
+    Returns:
+        dict: The page items and next_page_token, None on the last page.
+    """
+    items = rows[:limit]
+    token = None
+    if len(rows) > limit:
+        token = encode_page_token("customer_id", [items[-1]["customer_id"]])
+    return {"items": items, "next_page_token": token}
+
+
+def order_page(rows, params):
+    """
+    Trim the fetched orders to one page and compute the next page token.
+
+    Returns:
+        dict: The page items and next_page_token, None on the last page.
+    """
+    items = rows[:params.limit]
+    token = None
+    if len(rows) > params.limit:
+        last = items[-1]
+        if params.sort == "order_time":
+            token = encode_page_token("order_time", [last["order_time"], last["order_id"]])
+        else:
+            token = encode_page_token("order_id", [last["order_id"]])
+    return {"items": items, "next_page_token": token}
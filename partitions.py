@@ -0,0 +1,186 @@
+"""
+Module maintaining the monthly partitions of the orders table.
+
+orders is range-partitioned on order_time (see migrations/0004). This job
+creates partitions for the coming months before any order needs them, and
+detaches partitions that have aged past the retention period, moving them to
+an archive schema or dropping them. It runs as a separate process
+(python partitions.py), typically once a day; running it more often or from
+several nodes is harmless, each step checks the current partitions first.
+"""
+
+import argparse
+import re
+import time
+from datetime import datetime
+from migrate import connect_database
+from settings import env
+
+# Months of partitions kept ready past the current one
+PARTITION_MONTHS_AHEAD = env.int("PARTITION_MONTHS_AHEAD", 3)
+# Partitions entirely older than this many months are detached, 0 keeps all
+PARTITION_RETENTION_MONTHS = env.int("PARTITION_RETENTION_MONTHS", 0)
+# Schema detached partitions are moved to, empty to drop them instead
+PARTITION_ARCHIVE_SCHEMA = env.str("PARTITION_ARCHIVE_SCHEMA", "archive")
+PARTITION_MAINTENANCE_INTERVAL = env.float("PARTITION_MAINTENANCE_INTERVAL", 86400)
+# Detaching briefly locks orders, give up rather than queue behind long queries
+PARTITION_LOCK_TIMEOUT = env.str("PARTITION_LOCK_TIMEOUT", "5s")
+
+LIST_PARTITIONS_SQL = """
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'orders'::regclass;
+"""
+
+RANGE_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def month_start(value):
+    """
+    Return midnight on the first day of the month containing value.
+    """
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    """
+    Return the first day of the month months after the month of value.
+    """
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(start):
+    """
+    Name of the monthly partition starting at start, e.g. orders_p2024_11.
+    """
+    return f"orders_p{start:%Y_%m}"
+
+
+def _parse_bound(value):
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def list_partitions(cur):
+    """
+    List the range partitions of orders.
+
+    Returns:
+        list: (name, lower, upper) tuples sorted by upper bound. Unbounded
+        ends (MINVALUE/MAXVALUE) are None, the default partition is left out.
+    """
+    cur.execute(LIST_PARTITIONS_SQL)
+    partitions = []
+    for name, bound in cur.fetchall():
+        match = RANGE_BOUND_RE.search(bound)
+        if match:
+            partitions.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+    return sorted(partitions, key=lambda p: (p[2] is None, p[2] or datetime.min))
+
+
+def ensure_partitions(cur, now=None, months_ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Create the monthly partitions missing between the newest partition and
+    the end of the month months_ahead months from now.
+
+    Parameters:
+    - cur: Cursor on a connection in autocommit mode.
+    - now (datetime): The current time, for tests.
+    - months_ahead (int): Months to cover past the current one.
+
+    Returns:
+        list: The names of the partitions created.
+    """
+    now = now or datetime.now()
+    until = add_months(month_start(now), months_ahead + 1)
+    partitions = list_partitions(cur)
+    bounded = [upper for _, _, upper in partitions if upper is not None]
+    start = max(bounded) if bounded else month_start(now)
+    created = []
+    while start < until:
+        end = add_months(start, 1)
+        name = partition_name(start)
+        cur.execute(
+            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF orders FOR VALUES FROM (%s) TO (%s);',
+            (start, end),
+        )
+        created.append(name)
+        start = end
+    return created
+
+
+def archive_partitions(
+    cur,
+    now=None,
+    retention_months=PARTITION_RETENTION_MONTHS,
+    archive_schema=PARTITION_ARCHIVE_SCHEMA,
+):
+    """
+    Detach the partitions whose rows are all older than the retention period.
+
+    Parameters:
+    - cur: Cursor on a connection in autocommit mode.
+    - now (datetime): The current time, for tests.
+    - retention_months (int): Full months to keep before the current one, 0 keeps all.
+    - archive_schema (str): Schema detached partitions move to, dropped if empty.
+
+    Returns:
+        list: The names of the partitions detached.
+    """
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(month_start(now or datetime.now()), -retention_months)
+    expired = [name for name, _, upper in list_partitions(cur) if upper is not None and upper <= cutoff]
+    if expired and archive_schema:
+        cur.execute(f'CREATE SCHEMA IF NOT EXISTS "{archive_schema}";')
+    for name in expired:
+        # DETACH ... CONCURRENTLY is not allowed alongside a default
+        # partition, the plain form only needs the lock for a moment
+        cur.execute(f'ALTER TABLE orders DETACH PARTITION "{name}";')
+        if archive_schema:
+            cur.execute(f'ALTER TABLE "{name}" SET SCHEMA "{archive_schema}";')
+        else:
+            cur.execute(f'DROP TABLE "{name}";')
+    return expired
+
+
+def maintain_partitions(connect=connect_database, now=None):
+    """
+    Run one maintenance pass: create upcoming partitions, then archive old ones.
+
+    Returns:
+        tuple: Lists of the partitions created and detached.
+    """
+    conn = connect()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("SET lock_timeout = %s;", (PARTITION_LOCK_TIMEOUT,))
+            created = ensure_partitions(cur, now)
+            detached = archive_partitions(cur, now)
+    finally:
+        conn.close()
+    return created, detached
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and archive orders partitions.")
+    parser.add_argument("--interval", type=float, default=PARTITION_MAINTENANCE_INTERVAL)
+    parser.add_argument("--once", action="store_true", help="run one pass and exit")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            new, old = maintain_partitions()
+            print(f"Partitions created: {new or 'none'}, detached: {old or 'none'}")
+        except Exception as e:  # pylint: disable=broad-except
+            print("Error maintaining partitions:", e)
+        if args.once:
+            break
+        try:
+            time.sleep(args.interval)
+        except KeyboardInterrupt:
+            break
@@ -0,0 +1,41 @@
+"""
+Module with the typed JSON response used by the list endpoints.
+
+FastAPI's default path runs jsonable_encoder over every row, converting the
+Decimal amounts and datetime order times in Python, before json.dumps
+encodes the result. TypedJSONResponse hands the rows to pydantic's
+serializer together with their declared type (see the response models in
+models.py) instead, which converts and encodes them in one pass in native
+code. The JSON produced is the same.
+"""
+
+from functools import lru_cache
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from metrics import phase
+
+
+@lru_cache(maxsize=None)
+def type_adapter(schema):
+    """
+    Return the cached pydantic TypeAdapter for a response type.
+    """
+    return TypeAdapter(schema)
+
+
+class TypedJSONResponse(JSONResponse):
+    """
+    JSONResponse serializing its content as the given response type.
+
+    Keys missing from the type are left out and values are converted to the
+    declared types, e.g. Decimal amounts to JSON numbers. Render time is
+    recorded as the serialize phase of the request.
+    """
+
+    def __init__(self, content, schema, status_code=200, headers=None):
+        self.adapter = type_adapter(schema)
+        super().__init__(content, status_code=status_code, headers=headers)
+
+    def render(self, content):
+        with phase("serialize"):
+            return self.adapter.dump_json(content)
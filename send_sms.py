@@ -2,31 +2,163 @@
 Python class to send an SMS to a customer with their order details.
 """
 
-import os
-import africastalking
-from dotenv import load_dotenv
-
-# Load environment variables from the .env file
-load_dotenv()
+import random
+import threading
+import time
+from concurrent.futures import Future
+from http_client import get_http_client
+from settings import env
 
 # Retrieve credentials from environment variables
-AT_USERNAME = os.getenv('AT_USERNAME')
-AT_API_KEY = os.getenv('AT_API_KEY')
+AT_USERNAME = env.str('AT_USERNAME')
+AT_API_KEY = env.str('AT_API_KEY')
+
+# "africastalking" sends through the gateway, "fake" records messages locally
+SMS_BACKEND = env.str('SMS_BACKEND', 'africastalking').lower()
+# Seconds each call to the fake backend takes, to stand in for gateway latency
+SMS_FAKE_LATENCY = env.float("SMS_FAKE_LATENCY", 0)
+
+# Coalescing window for BatchingSender
+SMS_BATCH_MAX_SIZE = env.int("SMS_BATCH_MAX_SIZE", 100)
+SMS_BATCH_MAX_DELAY = env.float("SMS_BATCH_MAX_DELAY", 0.05)
 
-# Initialize Africa's Talking
-africastalking.initialize(
-    username=AT_USERNAME,
-    api_key=AT_API_KEY
+# Gateway status codes meaning the message was accepted (Processed, Sent, Queued)
+SUCCESS_STATUS_CODES = {100, 101, 102}
+
+# Africa's Talking messaging endpoint, the sandbox one for the sandbox account
+AT_SMS_URL = env.str('AT_SMS_URL') or (
+    "https://api.sandbox.africastalking.com/version1/messaging" if AT_USERNAME == "sandbox"
+    else "https://api.africastalking.com/version1/messaging"
 )
 
-sms = africastalking.SMS
+# Set your shortCode or senderId (if applicable)
+SENDER_ID = "KBenedict"
+
+
+def format_order_message(order_item, order_amount, order_time):
+    """
+    Format the order confirmation message sent to customers.
+
+    Parameters:
+    - order_item (str): The item ordered by the customer.
+    - order_amount (float): The price of the ordered item.
+    - order_time (str): The time when the order was placed.
+
+    Returns:
+        str: The SMS message body.
+    """
+    return (
+        f"Dear Customer, your order has been received!\n"
+        f"Item: {order_item}\n"
+        f"Amount: ${order_amount:.2f}\n"
+        f"Time: {order_time}\n"
+        f"Thank you for your purchase!"
+    )
+
+
+class FakeSMSBackend:
+    """
+    Offline stand-in for africastalking.SMS that records every send.
+
+    Used by tests and throughput experiments. A latency in seconds can be
+    simulated per call, and a failure_rate between 0 and 1 makes that
+    fraction of calls raise ConnectionError. Numbers listed in
+    rejected_numbers are reported with a failed per-recipient status.
+    """
+    def __init__(self, latency=0.0, failure_rate=0.0, rejected_numbers=()):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rejected_numbers = set(rejected_numbers)
+        self.sent = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def send(self, message, recipients, sender_id=None):
+        """
+        Record the message and return a response shaped like the gateway's.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            if self.failure_rate and random.random() < self.failure_rate:
+                raise ConnectionError("Simulated SMS gateway failure")
+            self.sent.append((message, list(recipients), sender_id))
+        statuses = [
+            {"number": number, "status": "Success", "statusCode": 101,
+             "messageId": f"fake-{self.calls}-{index}", "cost": "KES 0.0000"}
+            if number not in self.rejected_numbers else
+            {"number": number, "status": "InvalidPhoneNumber", "statusCode": 403,
+             "messageId": "None", "cost": "0"}
+            for index, number in enumerate(recipients)
+        ]
+        accepted = len(recipients) - len(self.rejected_numbers.intersection(recipients))
+        return {
+            "SMSMessageData": {
+                "Message": f"Sent to {accepted}/{len(recipients)} Total Cost: KES 0",
+                "Recipients": statuses,
+            }
+        }
+
+
+class GatewaySMSBackend:
+    """
+    Africa's Talking SMS client sending through the shared HTTP client.
+
+    Takes the place of africastalking.SMS, whose SDK opens a new connection
+    for every message; send has the same arguments and returns the same
+    response. Gateway errors raise httpx.HTTPError.
+    """
+    def __init__(self, username=AT_USERNAME, api_key=AT_API_KEY, url=AT_SMS_URL, client=None):
+        self.username = username
+        self.api_key = api_key
+        self.url = url
+        self._client = client
+
+    def send(self, message, recipients, sender_id=None):
+        """
+        Send one message to one or more recipients in a single gateway call.
+        """
+        data = {
+            "username": self.username,
+            "to": ",".join(recipients),
+            "message": message,
+            "bulkSMSMode": 1,
+        }
+        if sender_id is not None:
+            data["from"] = sender_id
+        client = self._client or get_http_client()
+        response = client.post(
+            self.url, data=data, headers={"Accept": "application/json", "apiKey": self.api_key}
+        )
+        response.raise_for_status()
+        return response.json()
+
 
 class SendSMS:
     """
     Class containing methods to send SMS messages.
     """
-    def __init__(self):
-        self.sms = sms
+    def __init__(self, backend=None):
+        if backend is None:
+            backend = FakeSMSBackend(SMS_FAKE_LATENCY) if SMS_BACKEND == "fake" else GatewaySMSBackend()
+        self.sms = backend
+
+    def send_order(self, customer_telephone, order_item, order_amount, order_time):
+        """
+        Send an SMS to the customer with their order details, raising on failure.
+
+        Parameters:
+        - customer_telephone (str): The customer's telephone number.
+        - order_item (str): The item ordered by the customer.
+        - order_amount (float): The price of the ordered item.
+        - order_time (str): The time when the order was placed.
+
+        Returns:
+            dict: The gateway response.
+        """
+        message = format_order_message(order_item, order_amount, order_time)
+        return self.sms.send(message, [customer_telephone], SENDER_ID)
 
     def sending_order(self, customer_telephone, order_item, order_amount, order_time):
         """
@@ -38,28 +170,159 @@ class SendSMS:
         - order_amount (float): The price of the ordered item.
         - order_time (str): The time when the order was placed.
         """
-        # Format the message with order details
-        message = (
-            f"Dear Customer, your order has been received!\n"
-            f"Item: {order_item}\n"
-            f"Amount: ${order_amount:.2f}\n"
-            f"Time: {order_time}\n"
-            f"Thank you for your purchase!"
-        )
-
-        # Set the recipient number
-        recipients = [customer_telephone]
-
-        # Set your shortCode or senderId (if applicable)
-        sender = "KBenedict"
-
         try:
             # Sending the message
-            response = self.sms.send(message, recipients, sender)
+            response = self.send_order(customer_telephone, order_item, order_amount, order_time)
             print("Message sent successfully:", response)
         except Exception as e:
             print(f"Failed to send message: {e}")
 
+class BatchingSender:
+    """
+    Coalesces messages with identical bodies into multi-recipient sends.
+
+    Messages are grouped by (message, sender) and a group is sent as one
+    gateway call when it reaches max_batch_size recipients or when
+    max_delay seconds have passed since its first message. Each submit
+    returns a Future resolving to that recipient's status entry from the
+    gateway response. The gateway has no per-recipient templating, so
+    only identical bodies can share a call.
+    """
+    def __init__(self, backend=None, max_batch_size=SMS_BATCH_MAX_SIZE,
+                 max_delay=SMS_BATCH_MAX_DELAY, sender_id=SENDER_ID):
+        self.sms = SendSMS(backend).sms
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.sender_id = sender_id
+
+        self._cond = threading.Condition()
+        self._groups = {}  # (message, sender) -> {"deadline": float, "items": [(number, future)]}
+        self._closed = False
+        self._stats = {"messages": 0, "batches": 0, "delivered": 0, "rejected": 0, "errors": 0}
+        self._started = time.monotonic()
+        self._flusher = threading.Thread(target=self._run, name="sms-batcher", daemon=True)
+        self._flusher.start()
+
+    def submit(self, message, recipient, sender_id=None):
+        """
+        Queue one message for one recipient.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the recipient's status dict,
+            or raises the gateway error if the batch could not be sent.
+        """
+        future = Future()
+        key = (message, sender_id or self.sender_id)
+        ready = None
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchingSender is closed.")
+            self._stats["messages"] += 1
+            group = self._groups.get(key)
+            if group is None:
+                group = {"deadline": time.monotonic() + self.max_delay, "items": []}
+                self._groups[key] = group
+                self._cond.notify()
+            group["items"].append((recipient, future))
+            if len(group["items"]) >= self.max_batch_size:
+                ready = self._groups.pop(key)["items"]
+        if ready:
+            self._send(key, ready)
+        return future
+
+    def send_order(self, customer_telephone, order_item, order_amount, order_time):
+        """
+        Send an order SMS through the batch and wait for its status.
+
+        Has the same signature as SendSMS.send_order so SMSDispatcher can use
+        either. Raises RuntimeError if the gateway rejected the recipient.
+        """
+        message = format_order_message(order_item, order_amount, order_time)
+        status = self.submit(message, customer_telephone).result()
+        if status.get("statusCode") not in SUCCESS_STATUS_CODES:
+            raise RuntimeError(f"SMS to {customer_telephone} rejected: {status.get('status')}")
+        return status
+
+    def flush(self):
+        """
+        Send every pending group immediately.
+        """
+        with self._cond:
+            groups, self._groups = self._groups, {}
+        for key, group in groups.items():
+            self._send(key, group["items"])
+
+    def close(self):
+        """
+        Flush pending messages and stop the flusher thread.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._flusher.join()
+        self.flush()
+
+    def stats(self):
+        """
+        Snapshot of the throughput counters.
+
+        Returns:
+            dict: Messages submitted, gateway calls made, delivered and rejected
+            recipients, failed calls, average batch size and messages per second.
+        """
+        with self._cond:
+            stats = dict(self._stats)
+        elapsed = time.monotonic() - self._started
+        stats["avg_batch_size"] = stats["messages"] / stats["batches"] if stats["batches"] else 0.0
+        stats["messages_per_second"] = stats["delivered"] / elapsed if elapsed > 0 else 0.0
+        return stats
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    now = time.monotonic()
+                    due = [key for key, group in self._groups.items() if group["deadline"] <= now]
+                    if due:
+                        break
+                    deadlines = [group["deadline"] for group in self._groups.values()]
+                    self._cond.wait(min(deadlines) - now if deadlines else None)
+                if self._closed:
+                    return
+                batches = [(key, self._groups.pop(key)["items"]) for key in due]
+            for key, items in batches:
+                self._send(key, items)
+
+    def _send(self, key, items):
+        message, sender_id = key
+        recipients = list(dict.fromkeys(number for number, _ in items))
+        try:
+            response = self.sms.send(message, recipients, sender_id)
+        except Exception as e:  # pylint: disable=broad-except
+            with self._cond:
+                self._stats["batches"] += 1
+                self._stats["errors"] += 1
+            for _, future in items:
+                future.set_exception(e)
+            return
+        statuses = {
+            entry.get("number"): entry
+            for entry in (response or {}).get("SMSMessageData", {}).get("Recipients", [])
+        }
+        delivered = rejected = 0
+        for number, future in items:
+            status = statuses.get(number, {"number": number, "status": "Unknown", "statusCode": None})
+            if status.get("statusCode") in SUCCESS_STATUS_CODES:
+                delivered += 1
+            else:
+                rejected += 1
+            future.set_result(status)
+        with self._cond:
+            self._stats["batches"] += 1
+            self._stats["delivered"] += delivered
+            self._stats["rejected"] += rejected
+
+
 # Example Usage
 if __name__ == "__main__":
     sms_service = SendSMS()
@@ -0,0 +1,91 @@
+"""
+Production entry point running the API in several worker processes.
+
+Usage:
+    python3 server.py [--workers N] [--host HOST] [--port PORT]
+
+Uvicorn's supervisor starts SERVER_WORKERS processes (the number of CPUs by
+default) listening on the same socket. The supervisor does not import the
+application: each worker imports main itself and opens its own connection
+pool, SMS dispatcher and HTTP clients in the lifespan hook, so no connection
+or thread is shared across processes. Each worker holds up to
+DB_POOL_MAX_SIZE database connections, so PostgreSQL must allow
+workers x DB_POOL_MAX_SIZE of them.
+
+Use `uvicorn main:app --reload` for development instead.
+"""
+
+import argparse
+import os
+import uvicorn
+from db import DB_POOL_MAX_SIZE
+from settings import env
+
+SERVER_HOST = env.str("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = env.int("SERVER_PORT", 8000)
+SERVER_WORKERS = env.int("SERVER_WORKERS", os.cpu_count() or 1)
+SERVER_LOG_LEVEL = env.str("SERVER_LOG_LEVEL", "info").lower()
+# Pending connections the kernel queues while every worker is busy
+SERVER_BACKLOG = env.int("SERVER_BACKLOG", 2048)
+# Seconds an idle keep-alive connection stays open
+SERVER_KEEPALIVE_TIMEOUT = env.int("SERVER_KEEPALIVE_TIMEOUT", 5)
+# Seconds in-flight requests get to finish on shutdown
+SERVER_GRACEFUL_TIMEOUT = env.int("SERVER_GRACEFUL_TIMEOUT", 30)
+# Comma-separated proxy addresses trusted to set X-Forwarded-For and X-Forwarded-Proto
+FORWARDED_ALLOW_IPS = env.str("FORWARDED_ALLOW_IPS", "127.0.0.1")
+# Off by default, /metrics counts requests per route
+SERVER_ACCESS_LOG = env.bool("SERVER_ACCESS_LOG", False)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def uvicorn_options(workers=SERVER_WORKERS, host=SERVER_HOST, port=SERVER_PORT):
+    """
+    Build the keyword arguments of uvicorn.run.
+
+    Parameters:
+    - workers (int): Number of worker processes.
+    - host (str): Address to bind.
+    - port (int): Port to bind.
+
+    Returns:
+        dict: Options for uvicorn.run("main:app", ...).
+    """
+    return {
+        "host": host,
+        "port": port,
+        "workers": workers,
+        "log_level": SERVER_LOG_LEVEL,
+        "backlog": SERVER_BACKLOG,
+        "timeout_keep_alive": SERVER_KEEPALIVE_TIMEOUT,
+        "timeout_graceful_shutdown": SERVER_GRACEFUL_TIMEOUT,
+        "proxy_headers": True,
+        "forwarded_allow_ips": FORWARDED_ALLOW_IPS,
+        "access_log": SERVER_ACCESS_LOG,
+    }
+
+
+def main():
+    """
+    Parse the command line and run the server until it is stopped.
+    """
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes.")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    print(
+        f"Starting {args.workers} workers on {args.host}:{args.port}, "
+        f"using up to {args.workers * DB_POOL_MAX_SIZE} database connections"
+    )
+    # The API serves static files relative to the working directory
+    os.chdir(ROOT)
+    # An import string, so the supervisor itself never imports the application
+    uvicorn.run("main:app", **uvicorn_options(args.workers, args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
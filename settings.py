@@ -0,0 +1,57 @@
+"""
+Module loading the service configuration.
+
+The .env file is read into the process environment once, the first time
+this module is imported, and every other module reads its settings through
+the shared `env` object instead of calling load_dotenv() itself. Settings
+stay module-level constants next to the code that uses them, e.g.
+
+    SMS_WORKERS = env.int("SMS_WORKERS", 4)
+
+Values set in the real environment take precedence over the .env file.
+"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRUE_VALUES = ("1", "true", "yes")
+
+
+class Environment:
+    """
+    Typed reads of the process environment.
+
+    Each method returns the default when the variable is not set.
+    """
+
+    def str(self, name, default=None):
+        """
+        Return the variable as a string.
+        """
+        return os.environ.get(name, default)
+
+    def int(self, name, default=None):
+        """
+        Return the variable as an integer.
+        """
+        value = os.environ.get(name)
+        return default if value is None else int(value)
+
+    def float(self, name, default=None):
+        """
+        Return the variable as a float.
+        """
+        value = os.environ.get(name)
+        return default if value is None else float(value)
+
+    def bool(self, name, default=False):
+        """
+        Return True if the variable is "1", "true" or "yes", in any case.
+        """
+        value = os.environ.get(name)
+        return default if value is None else value.lower() in TRUE_VALUES
+
+
+env = Environment()
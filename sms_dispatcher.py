@@ -0,0 +1,331 @@
+"""
+Module providing an in-process background queue for order SMS notifications.
+
+create_order enqueues a notification and returns immediately; a pool of
+worker threads sends the messages through SendSMS, retrying failed sends
+with exponential backoff. The queue is bounded and applies a backpressure
+policy when full:
+
+- "block": wait up to SMS_QUEUE_BLOCK_TIMEOUT seconds for room, then drop.
+- "drop": drop the notification immediately.
+- "spill": append the notification to a JSON lines file on disk; workers
+  reload spilled notifications once the queue has room again.
+
+With SMS_BATCHING enabled the workers send through send_sms.BatchingSender,
+so notifications with identical bodies share a gateway call.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Optional
+from metrics import SMS_SEND_DURATION, phase
+from send_sms import BatchingSender, SendSMS
+from settings import env
+
+SMS_WORKERS = env.int("SMS_WORKERS", 4)
+SMS_QUEUE_SIZE = env.int("SMS_QUEUE_SIZE", 1000)
+SMS_QUEUE_POLICY = env.str("SMS_QUEUE_POLICY", "block").lower()
+SMS_QUEUE_BLOCK_TIMEOUT = env.float("SMS_QUEUE_BLOCK_TIMEOUT", 1)
+SMS_SPILL_PATH = env.str("SMS_SPILL_PATH", "sms_spill.jsonl")
+SMS_MAX_RETRIES = env.int("SMS_MAX_RETRIES", 3)
+SMS_BACKOFF_BASE = env.float("SMS_BACKOFF_BASE", 0.5)
+SMS_BACKOFF_MAX = env.float("SMS_BACKOFF_MAX", 30)
+# Coalesce identical messages into multi-recipient sends through BatchingSender
+SMS_BATCHING = env.bool("SMS_BATCHING", False)
+
+POLICIES = ("block", "drop", "spill")
+
+
+@dataclass
+class SMSJob:
+    """
+    An order notification waiting to be sent.
+    """
+    telephone: str
+    item: str
+    amount: float
+    order_time: Optional[str] = None
+    attempts: int = 0
+
+    @classmethod
+    def from_order(cls, order):
+        """
+        Build a job from an OrderCreate model.
+        """
+        order_time = order.order_time
+        if isinstance(order_time, datetime):
+            order_time = order_time.isoformat()
+        return cls(order.telephone, order.item, order.amount, order_time)
+
+
+class SMSDispatcher:
+    """
+    Bounded queue of SMS jobs drained by a pool of worker threads.
+    """
+
+    def __init__(
+        self,
+        sms_service=None,
+        workers=SMS_WORKERS,
+        max_queue_size=SMS_QUEUE_SIZE,
+        policy=SMS_QUEUE_POLICY,
+        block_timeout=SMS_QUEUE_BLOCK_TIMEOUT,
+        spill_path=SMS_SPILL_PATH,
+        max_retries=SMS_MAX_RETRIES,
+        backoff_base=SMS_BACKOFF_BASE,
+        backoff_max=SMS_BACKOFF_MAX,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown SMS queue policy {policy!r}, expected one of {POLICIES}.")
+        self.sms_service = sms_service if sms_service is not None else SendSMS()
+        self.workers = workers
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.spill_path = spill_path
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._threads = []
+        self._stopping = threading.Event()
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0, "sent": 0, "failed": 0, "retried": 0, "dropped": 0, "spilled": 0,
+        }
+
+    @property
+    def running(self):
+        """
+        Whether the worker threads have been started and not stopped.
+        """
+        return bool(self._threads) and not self._stopping.is_set()
+
+    def start(self):
+        """
+        Start the worker threads.
+        """
+        if self._threads:
+            return
+        self._stopping.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"sms-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def enqueue(self, job):
+        """
+        Queue a notification without waiting for it to be sent.
+
+        Parameters:
+        - job (SMSJob): The notification to send.
+
+        Returns:
+            bool: True if the job was queued or spilled, False if it was dropped.
+        """
+        with phase("sms_dispatch"):
+            return self._enqueue(job)
+
+    def _enqueue(self, job):
+        try:
+            if self.policy == "block":
+                self._queue.put(job, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(job)
+        except queue.Full:
+            if self.policy == "spill":
+                self._spill([job])
+                return True
+            self._count("dropped")
+            print(f"SMS queue full, dropping notification for {job.telephone}")
+            return False
+        self._count("enqueued")
+        return True
+
+    def enqueue_many(self, jobs):
+        """
+        Queue a batch of notifications, e.g. for a bulk order upload.
+
+        With the spill policy, everything that does not fit in the queue is
+        spilled in a single write rather than one write per job.
+
+        Parameters:
+        - jobs (list): SMSJob instances to send.
+
+        Returns:
+            int: The number of jobs queued or spilled.
+        """
+        with phase("sms_dispatch"):
+            return self._enqueue_many(jobs)
+
+    def _enqueue_many(self, jobs):
+        overflow = []
+        accepted = 0
+        for job in jobs:
+            if self.policy == "spill":
+                try:
+                    self._queue.put_nowait(job)
+                except queue.Full:
+                    overflow.append(job)
+                    continue
+                self._count("enqueued")
+                accepted += 1
+            elif self._enqueue(job):
+                accepted += 1
+        if overflow:
+            self._spill(overflow)
+            accepted += len(overflow)
+        return accepted
+
+    def stop(self, timeout=10.0):
+        """
+        Stop accepting work and drain the queue for up to timeout seconds.
+
+        Jobs still queued when the timeout expires are spilled to disk when
+        the policy is "spill", and dropped otherwise.
+        """
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftovers:
+            if self.policy == "spill":
+                self._spill(leftovers)
+            else:
+                self._count("dropped", len(leftovers))
+
+    def stats(self):
+        """
+        Snapshot of the dispatcher counters.
+
+        Returns:
+            dict: Queue depth and enqueued, sent, failed, retried, dropped and spilled counts.
+        """
+        with self._stats_lock:
+            return dict(self._stats, queued=self._queue.qsize(), workers=len(self._threads))
+
+    def _work(self):
+        while True:
+            try:
+                job = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self.policy == "spill" and self._reload_spill():
+                    continue
+                if self._stopping.is_set():
+                    return
+                continue
+            try:
+                self._deliver(job)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, job):
+        while True:
+            started = time.perf_counter()
+            try:
+                self.sms_service.send_order(job.telephone, job.item, job.amount, job.order_time)
+                SMS_SEND_DURATION.observe(time.perf_counter() - started, outcome="sent")
+                self._count("sent")
+                return
+            except Exception as e:  # pylint: disable=broad-except
+                SMS_SEND_DURATION.observe(time.perf_counter() - started, outcome="error")
+                job.attempts += 1
+                if job.attempts > self.max_retries:
+                    self._count("failed")
+                    print(f"Failed to send message to {job.telephone} after {job.attempts} attempts: {e}")
+                    return
+                self._count("retried")
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (job.attempts - 1))
+                # Waiting on the stop event lets shutdown cut the backoff short
+                self._stopping.wait(delay)
+
+    def _spill(self, jobs):
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as spill_file:
+                for job in jobs:
+                    spill_file.write(json.dumps(asdict(job)) + "\n")
+        self._count("spilled", len(jobs))
+
+    def _reload_spill(self):
+        """
+        Move spilled jobs back onto the queue while there is room.
+
+        Returns:
+            bool: True if any job was reloaded.
+        """
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return False
+            with open(self.spill_path, encoding="utf-8") as spill_file:
+                lines = [line for line in spill_file if line.strip()]
+            reloaded = 0
+            for line in lines:
+                try:
+                    self._queue.put_nowait(SMSJob(**json.loads(line)))
+                except queue.Full:
+                    break
+                reloaded += 1
+            remaining = lines[reloaded:]
+            if remaining:
+                with open(self.spill_path, "w", encoding="utf-8") as spill_file:
+                    spill_file.writelines(remaining)
+            else:
+                os.remove(self.spill_path)
+        return reloaded > 0
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """
+    Return the shared SMS dispatcher, starting it on first use.
+    """
+    global _dispatcher  # pylint: disable=global-statement
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = SMSDispatcher(BatchingSender() if SMS_BATCHING else None)
+        if not _dispatcher.running:
+            _dispatcher.start()
+        return _dispatcher
+
+
+def dispatcher_stats():
+    """
+    Return the shared dispatcher's statistics without starting it.
+
+    Returns:
+        dict: The dispatcher's stats(), or None if it is not running.
+    """
+    dispatcher = _dispatcher
+    return dispatcher.stats() if dispatcher is not None else None
+
+
+def stop_dispatcher(timeout=10.0):
+    """
+    Drain and stop the shared SMS dispatcher.
+    """
+    global _dispatcher  # pylint: disable=global-statement
+    with _dispatcher_lock:
+        dispatcher, _dispatcher = _dispatcher, None
+    if dispatcher is not None:
+        dispatcher.stop(timeout)
+        if isinstance(dispatcher.sms_service, BatchingSender):
+            dispatcher.sms_service.close()
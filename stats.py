@@ -0,0 +1,91 @@
+"""
+Module building the queries behind the order statistics endpoints.
+
+The statistics are read from the customer_order_stats and daily_revenue
+rollups (migrations/0005), which triggers on orders keep current in the same
+transaction as every order write. A dashboard therefore reads one row per
+customer or per day instead of aggregating the orders table.
+"""
+
+from datetime import date, timedelta
+from pagination import decode_page_token
+
+# Days returned by the daily revenue endpoint when no range is given
+DEFAULT_REVENUE_DAYS = 30
+
+CUSTOMER_STATS_SELECT = """
+    SELECT c.customer_id, c.customer_code, c.name, c.telephone,
+           COALESCE(s.order_count, 0) AS order_count,
+           COALESCE(s.total_amount, 0) AS total_amount,
+           s.last_order_time
+    FROM customers c
+    LEFT JOIN customer_order_stats s ON s.customer_id = c.customer_id
+"""
+
+CUSTOMER_STATS_SQL = CUSTOMER_STATS_SELECT + " WHERE c.customer_id = %s;"
+
+# daily_revenue holds several rows per day to spread write contention
+DAILY_REVENUE_SQL = """
+    SELECT day, sum(order_count) AS order_count, sum(revenue) AS revenue
+    FROM daily_revenue
+    WHERE day >= %s AND day < %s
+    GROUP BY day
+    HAVING sum(order_count) <> 0
+    ORDER BY day;
+"""
+
+
+def customer_stats_page_query(params):
+    """
+    Build the SELECT for one page of per-customer statistics ordered by customer_id.
+
+    Parameters:
+    - params (CustomerListQuery): The request's query parameters.
+
+    Returns:
+        tuple: SQL string and its parameters, selecting one row more than the
+        limit so customer_page can tell whether a next page exists.
+    """
+    conditions, args = [], []
+    if params.telephone:
+        conditions.append("c.telephone = %s")
+        args.append(params.telephone)
+    if params.page_token:
+        (last_id,) = decode_page_token(params.page_token, "customer_id")
+        conditions.append("c.customer_id > %s")
+        args.append(last_id)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    args.append(params.limit + 1)
+    return f"{CUSTOMER_STATS_SELECT.rstrip()}{where} ORDER BY c.customer_id LIMIT %s;", args
+
+
+def daily_revenue_range(params, today=None):
+    """
+    Resolve the requested day range, defaulting to the last DEFAULT_REVENUE_DAYS days.
+
+    Parameters:
+    - params (DailyRevenueQuery): The request's query parameters.
+    - today (date): The current day, for tests.
+
+    Returns:
+        tuple: The first day and the day after the last one.
+    """
+    to_date = params.to_date or (today or date.today()) + timedelta(days=1)
+    from_date = params.from_date or to_date - timedelta(days=DEFAULT_REVENUE_DAYS)
+    return from_date, to_date
+
+
+def daily_revenue_page(rows, from_date, to_date):
+    """
+    Shape the daily revenue rows with totals for the whole range.
+
+    Returns:
+        dict: The range, the per-day items and the range totals.
+    """
+    return {
+        "from_date": from_date,
+        "to_date": to_date,
+        "items": rows,
+        "order_count": sum(row["order_count"] for row in rows),
+        "revenue": sum(row["revenue"] for row in rows),
+    }
@@ -0,0 +1,227 @@
+"""
+Test file to test the async customer and order routes with pytest.
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import psycopg
+from async_api import router
+from cache import get_customer_cache
+from async_db import get_async_db, get_async_read_db
+from idempotency import request_hash
+from listing_cache import get_listing_cache
+from models import OrderCreate
+from sms_dispatcher import SMSJob
+
+# Serve only the async routes, independently of DB_MODE
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clear_customer_cache():
+    """
+    Function to clear the customer and listing caches around each test.
+    """
+    get_customer_cache().local.clear()
+    get_listing_cache().local.clear()
+    yield
+    get_customer_cache().local.clear()
+    get_listing_cache().local.clear()
+
+
+@pytest.fixture(scope="function")
+def mock_async_connection():
+    """
+    Function to override the get_async_db and get_async_read_db dependencies with a mock async connection.
+    """
+    mock_cursor = MagicMock()
+    mock_cursor.execute = AsyncMock()
+    mock_cursor.fetchone = AsyncMock()
+    mock_cursor.fetchall = AsyncMock()
+    mock_cursor.__aenter__.return_value = mock_cursor
+
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_conn.commit = AsyncMock()
+
+    async def override():
+        yield mock_conn
+
+    app.dependency_overrides[get_async_db] = override
+    app.dependency_overrides[get_async_read_db] = override
+    yield mock_cursor, mock_conn
+    app.dependency_overrides.pop(get_async_db, None)
+    app.dependency_overrides.pop(get_async_read_db, None)
+
+
+def test_create_customer(mock_async_connection):
+    """
+    Function to test the async create customer endpoint.
+    """
+    mock_cursor, mock_conn = mock_async_connection
+    mock_cursor.fetchone.return_value = {"customer_id": 1}
+
+    response = client.post("/customers/", json={
+        "customer_code": "CUST001",
+        "name": "John Doe",
+        "telephone": "1234567890",
+        "location": "New York"
+    })
+
+    assert response.status_code == 201
+    assert response.json() == {"customer_id": 1, "message": "Customer created successfully"}
+    assert "INSERT INTO customers" in mock_cursor.execute.call_args[0][0]
+    mock_conn.commit.assert_awaited_once()
+
+
+def test_create_customer_conflict(mock_async_connection):
+    """
+    Function to test that a duplicate customer code returns 409 without committing.
+    """
+    mock_cursor, mock_conn = mock_async_connection
+    mock_cursor.fetchone.return_value = None
+
+    response = client.post("/customers/", json={
+        "customer_code": "CUST001",
+        "name": "John Doe",
+        "telephone": "1234567890"
+    })
+
+    assert response.status_code == 409
+    mock_conn.commit.assert_not_awaited()
+
+
+@patch('async_api.get_dispatcher')
+def test_create_order(mock_get_dispatcher, mock_async_connection):
+    """
+    Function to test the async create order endpoint.
+    """
+    mock_cursor, _ = mock_async_connection
+    mock_cursor.fetchone.side_effect = [
+        {"customer_id": 1, "customer_code": "CUST001", "telephone": "1234567890"},
+        {"order_id": 1},
+    ]
+
+    response = client.post("/orders/", json={
+        "telephone": "1234567890",
+        "item": "Pizza",
+        "amount": 20.0,
+        "order_time": None
+    })
+
+    assert response.status_code == 201
+    assert response.json()["order_id"] == 1
+    mock_get_dispatcher.return_value.enqueue.assert_called_once_with(
+        SMSJob("1234567890", "Pizza", 20.0, None)
+    )
+
+
+@patch('async_api.get_order_batcher')
+@patch('async_api.get_dispatcher')
+def test_create_order_batched(mock_get_dispatcher, mock_get_order_batcher, mock_async_connection):
+    """
+    Function to test that with ORDER_BATCHING the batcher inserts the order.
+    """
+    mock_cursor, mock_conn = mock_async_connection
+    mock_conn.rollback = AsyncMock()
+    mock_cursor.fetchone.side_effect = [
+        {"customer_id": 1, "customer_code": "CUST001", "telephone": "1234567890"},
+    ]
+    mock_get_order_batcher.return_value.ainsert = AsyncMock(return_value=42)
+
+    with patch('async_api.ORDER_BATCHING', True):
+        response = client.post("/orders/", json={"telephone": "1234567890", "item": "Pizza", "amount": 20.0})
+
+    assert response.status_code == 201
+    assert response.json()["order_id"] == 42
+    mock_get_order_batcher.return_value.ainsert.assert_awaited_once()
+    mock_get_dispatcher.return_value.enqueue.assert_called_once()
+
+
+@patch('async_api.get_dispatcher')
+def test_create_order_idempotent_replay(mock_get_dispatcher, mock_async_connection):
+    """
+    Function to test that a retry with the same Idempotency-Key replays the stored response.
+    """
+    mock_cursor, mock_conn = mock_async_connection
+    mock_conn.rollback = AsyncMock()
+    body = {"telephone": "1234567890", "item": "Pizza", "amount": 20.0}
+    mock_cursor.fetchone.side_effect = [
+        None,
+        {"request_hash": request_hash(OrderCreate(**body)), "status_code": 201, "response": {"order_id": 7}},
+    ]
+
+    response = client.post("/orders/", json=body, headers={"Idempotency-Key": "k1"})
+
+    assert response.status_code == 201
+    assert response.json() == {"order_id": 7}
+    mock_conn.commit.assert_not_awaited()
+    mock_get_dispatcher.return_value.enqueue.assert_not_called()
+
+
+@patch('async_api.get_dispatcher')
+def test_create_order_unknown_telephone(mock_get_dispatcher, mock_async_connection):
+    """
+    Function to test that an unknown telephone number returns 400 and sends no SMS.
+    """
+    mock_cursor, _ = mock_async_connection
+    mock_cursor.fetchone.return_value = None
+
+    response = client.post("/orders/", json={
+        "telephone": "1234567890",
+        "item": "Pizza",
+        "amount": 20.0
+    })
+
+    assert response.status_code == 400
+    mock_get_dispatcher.return_value.enqueue.assert_not_called()
+
+
+@patch('async_api.get_dispatcher')
+def test_create_order_foreign_key_race(mock_get_dispatcher, mock_async_connection):
+    """
+    Function to test that a customer deleted after the lookup still yields 400.
+    """
+    mock_cursor, _ = mock_async_connection
+    get_customer_cache().store({"customer_id": 1, "customer_code": "CUST001", "telephone": "1234567890"})
+    mock_cursor.execute.side_effect = psycopg.errors.ForeignKeyViolation()
+
+    response = client.post("/orders/", json={
+        "telephone": "1234567890",
+        "item": "Pizza",
+        "amount": 20.0
+    })
+
+    assert response.status_code == 400
+    mock_get_dispatcher.return_value.enqueue.assert_not_called()
+
+
+def test_list_orders(mock_async_connection):
+    """
+    Function to test the async list orders endpoint.
+    """
+    mock_cursor, _ = mock_async_connection
+    mock_cursor.fetchone.return_value = {"changes": 3, "changed_at": None}
+    mock_cursor.fetchall.return_value = [
+        {"order_id": 1, "telephone": "1234567890", "item": "Pizza", "amount": 20.0}
+    ]
+
+    response = client.get("/orders/")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "items": [{"order_id": 1, "telephone": "1234567890", "item": "Pizza", "amount": 20.0}],
+        "next_page_token": None,
+    }
+    assert response.headers["etag"] == 'W/"orders-3"'
+    mock_cursor.execute.assert_awaited_with(
+        "SELECT * FROM orders ORDER BY order_id ASC LIMIT %s;", [51]
+    )
+
+    # The same page is now answered without reading rows
+    assert client.get("/orders/", headers={"If-None-Match": 'W/"orders-3"'}).status_code == 304
+    assert mock_cursor.fetchall.await_count == 1
@@ -0,0 +1,215 @@
+"""
+Module to test access token verification against a local stub issuer.
+"""
+
+import time
+import unittest
+from unittest.mock import patch
+from authlib.jose import jwt
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from auth import (
+    AuthError,
+    JWKSCache,
+    TokenVerifier,
+    fetch_jwks,
+    require_scopes,
+    token_scopes,
+)
+from benchmarks.stubs import STUB_AUDIENCE, OIDCStub
+
+
+class TestTokenVerifier(unittest.TestCase):
+    """
+    Class containing test cases for TokenVerifier and JWKSCache.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.stub = OIDCStub().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.stop()
+
+    def setUp(self):
+        self.fetches = 0
+
+        def counting_fetch(url):
+            self.fetches += 1
+            return fetch_jwks(url)
+
+        self.jwks = JWKSCache(self.stub.jwks_url, fetch=counting_fetch, min_refresh_interval=60)
+        self.jwks.refresh()
+        self.verifier = TokenVerifier(self.jwks, self.stub.issuer, STUB_AUDIENCE, leeway=0)
+
+    def test_verify_valid_token(self):
+        """
+        A token signed by the issuer for the audience is accepted.
+        """
+        claims = self.verifier.verify(self.stub.issue_token("client-1", "read:orders"))
+        self.assertEqual(claims["sub"], "client-1")
+        self.assertEqual(token_scopes(claims), {"read:orders"})
+
+    def test_claims_are_cached(self):
+        """
+        A token seen before is served from the claims cache without decoding it again.
+        """
+        token = self.stub.issue_token()
+        first = self.verifier.verify(token)
+        with patch.object(self.verifier, "_jwt") as mock_jwt:
+            second = self.verifier.verify(token)
+        mock_jwt.decode.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_rejects_expired_token(self):
+        """
+        Expired tokens are rejected and never cached.
+        """
+        token = self.stub.issue_token(lifetime=-10)
+        with self.assertRaises(AuthError):
+            self.verifier.verify(token)
+        self.assertEqual(self.verifier.claims_cache.stats()["size"], 0)
+
+    def test_rejects_wrong_audience_and_issuer(self):
+        """
+        Tokens for another audience or from another issuer are rejected.
+        """
+        token = self.stub.issue_token()
+        for verifier in (
+            TokenVerifier(self.jwks, self.stub.issuer, "another-api"),
+            TokenVerifier(self.jwks, "https://another.issuer/", STUB_AUDIENCE),
+        ):
+            with self.assertRaises(AuthError):
+                verifier.verify(token)
+
+    def test_rejects_symmetric_and_malformed_tokens(self):
+        """
+        HS256 tokens and garbage are rejected.
+        """
+        now = int(time.time())
+        claims = {"iss": self.stub.issuer, "aud": STUB_AUDIENCE, "exp": now + 60}
+        hs256 = jwt.encode({"alg": "HS256", "kid": self.stub.kid}, claims, "secret").decode()
+        for token in (hs256, "not-a-token"):
+            with self.assertRaises(AuthError):
+                self.verifier.verify(token)
+
+    def test_unknown_kid_refreshes_keys(self):
+        """
+        A token signed with a newly rotated key triggers one key set refresh.
+        """
+        self.jwks.min_refresh_interval = 0
+        self.stub.rotate_key("rotated")
+        try:
+            token = self.stub.issue_token()
+            self.assertEqual(self.verifier.verify(token)["aud"], STUB_AUDIENCE)
+            self.assertEqual(self.fetches, 2)
+        finally:
+            self.stub.kid = "stub"
+            del self.stub.keys["rotated"]
+
+    def test_unknown_kid_refresh_is_rate_limited(self):
+        """
+        Made-up key ids do not refetch the key set more than once per interval.
+        """
+        self.jwks = JWKSCache(self.stub.jwks_url, fetch=lambda url: self.stub.jwks(), min_refresh_interval=60)
+        self.assertTrue(self.jwks.refresh_for("stub"))
+        self.assertFalse(self.jwks.refresh_for("forged"))
+        self.assertEqual(self.jwks.stats()["refreshes"], 1)
+
+    def test_background_refresh(self):
+        """
+        The key set is refreshed periodically once started, and keeps its keys on errors.
+        """
+        responses = [self.stub.jwks()]
+
+        def fetch(_url):
+            if len(responses) > 2:
+                raise OSError("provider down")
+            responses.append(self.stub.jwks())
+            return responses[-1]
+
+        jwks = JWKSCache("unused", fetch=fetch, refresh_interval=0.01)
+        with patch("builtins.print"):
+            jwks.start()
+            time.sleep(0.1)
+            jwks.stop()
+        stats = jwks.stats()
+        self.assertEqual(stats["refreshes"], 2)
+        self.assertGreater(stats["refresh_errors"], 0)
+        self.assertIsNotNone(jwks.get("stub"))
+
+
+class TestRequireScopes(unittest.TestCase):
+    """
+    Class containing test cases for the require_scopes route dependency.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.stub = OIDCStub().start()
+        jwks = JWKSCache(cls.stub.jwks_url)
+        jwks.refresh()
+        cls.verifier = TokenVerifier(jwks, cls.stub.issuer, STUB_AUDIENCE)
+        app = FastAPI()
+
+        @app.get("/orders/")
+        def list_orders(claims=Depends(require_scopes("read:orders"))):
+            return {"sub": claims["sub"] if claims else None}
+
+        cls.client = TestClient(app)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.stop()
+
+    def request(self, token=None):
+        """
+        Call the protected route with auth enabled.
+        """
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        with patch("auth.AUTH_ENABLED", True), patch("auth.get_verifier", return_value=self.verifier):
+            return self.client.get("/orders/", headers=headers)
+
+    def test_missing_token(self):
+        """
+        Requests without a token get 401.
+        """
+        response = self.request()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.headers["www-authenticate"], "Bearer")
+
+    def test_invalid_token(self):
+        """
+        Requests with an invalid token get 401.
+        """
+        response = self.request("not-a-token")
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('error="invalid_token"', response.headers["www-authenticate"])
+
+    def test_missing_scope(self):
+        """
+        Tokens without the route's scope get 403.
+        """
+        response = self.request(self.stub.issue_token(scope="read:customers"))
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('error="insufficient_scope"', response.headers["www-authenticate"])
+
+    def test_granted_scope(self):
+        """
+        Tokens granting the scope, through scope or permissions, are accepted.
+        """
+        response = self.request(self.stub.issue_token("client-1", scope="read:orders"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"sub": "client-1"})
+        self.assertEqual(token_scopes({"permissions": ["read:orders"]}), {"read:orders"})
+
+    def test_auth_disabled(self):
+        """
+        With AUTH_ENABLED false the route is open.
+        """
+        self.assertEqual(self.client.get("/orders/").json(), {"sub": None})
+
+
+if __name__ == "__main__":
+    unittest.main()
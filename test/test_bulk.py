@@ -0,0 +1,201 @@
+"""
+Test file to test the bulk module and the bulk upload endpoints.
+"""
+
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from bulk import (
+    COPY_ORDERS_STAGING_SQL,
+    MERGE_CUSTOMERS_SQL,
+    MERGE_ORDERS_SQL,
+    REJECT_ORDERS_SQL,
+    load_customers,
+    load_orders,
+    parse_rows,
+    validate_rows,
+)
+from db import get_db
+from main import app
+from models import CustomerCreate, OrderCreate
+
+
+def mock_connection(fetchall_results):
+    """
+    Build a mock connection whose cursor returns fetchall_results in turn.
+    """
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.side_effect = fetchall_results
+    return conn, cursor
+
+
+class TestBulkParsing(unittest.TestCase):
+    """
+    Class containing test methods for parsing and validating uploads.
+    """
+
+    def test_parse_json_array(self):
+        """
+        Function to test that a JSON array is parsed as rows.
+        """
+        payload = parse_rows(b'[{"item": "Pizza"}]', "application/json")
+
+        self.assertEqual(payload.rows, [{"item": "Pizza"}])
+
+    def test_parse_ndjson_reports_bad_lines(self):
+        """
+        Function to test that an unparseable NDJSON line is reported by index.
+        """
+        payload = parse_rows(b'{"item": "Pizza"}\nnot json\n{"item": "Soda"}\n', "application/x-ndjson")
+
+        self.assertEqual(payload.rows, [{"item": "Pizza"}, None, {"item": "Soda"}])
+        self.assertEqual(payload.errors, [{"index": 1, "errors": ["Invalid JSON line."]}])
+
+    def test_parse_csv_empty_cells_are_missing(self):
+        """
+        Function to test that empty CSV cells become None.
+        """
+        payload = parse_rows(b"telephone,item,amount,order_time\n1234567890,Pizza,20.5,\n", "text/csv")
+
+        self.assertEqual(payload.rows, [
+            {"telephone": "1234567890", "item": "Pizza", "amount": "20.5", "order_time": None}
+        ])
+
+    def test_unsupported_content_type(self):
+        """
+        Function to test that other content types are rejected with 415.
+        """
+        with self.assertRaises(HTTPException) as ctx:
+            parse_rows(b"", "application/xml")
+        self.assertEqual(ctx.exception.status_code, 415)
+
+    def test_validate_rows_splits_valid_and_invalid(self):
+        """
+        Function to test that invalid rows are reported and the rest validated.
+        """
+        payload = parse_rows(json.dumps([
+            {"telephone": "1234567890", "item": "Pizza", "amount": 20},
+            {"telephone": "abc", "item": "Pizza", "amount": 20},
+            {"telephone": "1234567890", "item": "Soda", "amount": "2.5"},
+        ]).encode(), "application/json")
+
+        valid, errors = validate_rows(payload, OrderCreate)
+
+        self.assertEqual([index for index, _ in valid], [0, 2])
+        self.assertEqual(valid[1][1].amount, 2.5)
+        self.assertEqual(errors[0]["index"], 1)
+        self.assertTrue(errors[0]["errors"][0].startswith("telephone"))
+
+
+class TestBulkLoading(unittest.TestCase):
+    """
+    Class containing test methods for the staging and merge steps.
+    """
+
+    def test_load_orders(self):
+        """
+        Function to test COPY into staging, rejection and merge of an order upload.
+        """
+        payload = parse_rows(json.dumps([
+            {"telephone": "1234567890", "item": "Pizza", "amount": 20},
+            {"telephone": "1234567899", "item": "Soda", "amount": 2},
+        ]).encode(), "application/json")
+        conn, cursor = mock_connection([
+            [{"row_num": 1, "error": "Telephone number does not exist."}],
+            [{"row_num": 0, "order_id": 41}],
+        ])
+
+        report, jobs = load_orders(conn, payload)
+
+        statements = [call[0][0] for call in cursor.execute.call_args_list]
+        self.assertIn(REJECT_ORDERS_SQL, statements)
+        self.assertIn(MERGE_ORDERS_SQL, statements)
+        copy_sql, staged = cursor.copy_expert.call_args[0]
+        self.assertEqual(copy_sql, COPY_ORDERS_STAGING_SQL)
+        self.assertEqual(staged.getvalue().splitlines(), [
+            "0,1234567890,Pizza,20.0,", "1,1234567899,Soda,2.0,"
+        ])
+        self.assertEqual(report["inserted"], 1)
+        self.assertEqual(report["created"], [{"index": 0, "order_id": 41}])
+        self.assertEqual(report["errors"], [{"index": 1, "errors": ["Telephone number does not exist."]}])
+        self.assertEqual([job.item for job in jobs], ["Pizza"])
+        conn.commit.assert_called_once()
+
+    @patch("bulk.execute_values")
+    def test_load_orders_writes_outbox(self, mock_execute_values):
+        """
+        Function to test that outbox rows are written before the commit.
+        """
+        payload = parse_rows(b'[{"telephone": "1234567890", "item": "Pizza", "amount": 20}]', "application/json")
+        conn, _ = mock_connection([[], [{"row_num": 0, "order_id": 41}]])
+
+        load_orders(conn, payload, write_outbox=True)
+
+        rows = mock_execute_values.call_args[0][2]
+        self.assertEqual(rows[0][:2], (41, "1234567890"))
+
+    def test_load_customers_reports_conflicts(self):
+        """
+        Function to test that duplicates in the upload or table are reported per row.
+        """
+        payload = parse_rows(json.dumps([
+            {"customer_code": "C1", "name": "A", "telephone": "1234567890"},
+            {"customer_code": "C1", "name": "B", "telephone": "1234567891"},
+            {"customer_code": "C2", "name": "C", "telephone": "1234567892"},
+        ]).encode(), "application/json")
+        conn, cursor = mock_connection([[], [{"customer_id": 7, "customer_code": "C1"}]])
+
+        report = load_customers(conn, payload)
+
+        cursor.execute.assert_any_call(MERGE_CUSTOMERS_SQL)
+        self.assertEqual(report["created"], [{"index": 0, "customer_id": 7}])
+        self.assertEqual([error["index"] for error in report["errors"]], [1, 2])
+
+    def test_nothing_valid_skips_database(self):
+        """
+        Function to test that an upload without valid rows does not touch the database.
+        """
+        conn = MagicMock()
+
+        report = load_customers(conn, parse_rows(b'[{"name": "A"}]', "application/json"))
+
+        conn.cursor.assert_not_called()
+        self.assertEqual(report["inserted"], 0)
+        self.assertEqual(len(report["errors"]), 1)
+
+
+class TestBulkEndpoints(unittest.TestCase):
+    """
+    Class containing test methods for the bulk upload endpoints.
+    """
+
+    def setUp(self):
+        self.conn, _ = mock_connection([[], [{"row_num": 0, "order_id": 41}]])
+        app.dependency_overrides[get_db] = lambda: self.conn
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.dependency_overrides.pop(get_db, None)
+
+    @patch("main.get_dispatcher")
+    def test_bulk_orders_csv_enqueues_in_bulk(self, mock_get_dispatcher):
+        """
+        Function to test that a CSV upload queues its notifications in one call.
+        """
+        response = self.client.post(
+            "/orders/bulk",
+            content=b"telephone,item,amount\n1234567890,Pizza,20\n",
+            headers={"Content-Type": "text/csv"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], [{"index": 0, "order_id": 41}])
+        jobs = mock_get_dispatcher.return_value.enqueue_many.call_args[0][0]
+        self.assertEqual([job.telephone for job in jobs], ["1234567890"])
+
+
+if __name__ == "__main__":
+    unittest.main()
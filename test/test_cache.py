@@ -0,0 +1,135 @@
+"""
+Test file to test the cache module.
+"""
+
+import unittest
+from unittest.mock import MagicMock
+from cache import CustomerCache, InMemorySharedCache, TTLCache, read_customer
+
+CUSTOMER = {"customer_id": 1, "customer_code": "CUST001", "name": "John Doe",
+            "telephone": "+254700000000", "location": "Nairobi"}
+
+
+class FakeClock:
+    """
+    Manually advanced clock for expiry tests.
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+    """
+    Class containing test methods for the TTLCache class.
+    """
+
+    def test_hit_and_miss_counters(self):
+        """
+        Function to test that lookups are counted as hits or misses.
+        """
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", 1)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_least_recently_used_is_evicted(self):
+        """
+        Function to test LRU eviction once maxsize is exceeded.
+        """
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_entries_expire(self):
+        """
+        Function to test that entries are dropped after their TTL.
+        """
+        clock = FakeClock()
+        cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+        cache.set("a", 1)
+        clock.now = 6
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_entry_ttl_override(self):
+        """
+        Function to test that an entry can be given its own TTL.
+        """
+        clock = FakeClock()
+        cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+        cache.set("short", 1, ttl=1)
+        cache.set("long", 2, ttl=60)
+        clock.now = 10
+
+        self.assertIsNone(cache.get("short"))
+        self.assertEqual(cache.get("long"), 2)
+
+
+class TestCustomerCache(unittest.TestCase):
+    """
+    Class containing test methods for the CustomerCache class.
+    """
+
+    def test_store_indexes_both_keys(self):
+        """
+        Function to test that a customer is found by telephone and by code.
+        """
+        cache = CustomerCache()
+        cache.store(CUSTOMER)
+
+        self.assertEqual(cache.get_by_telephone("+254700000000"), CUSTOMER)
+        self.assertEqual(cache.get_by_code("CUST001"), CUSTOMER)
+
+    def test_invalidate_clears_both_tiers(self):
+        """
+        Function to test invalidation of the local and shared tiers.
+        """
+        shared = InMemorySharedCache()
+        cache = CustomerCache(shared=shared)
+        cache.store(CUSTOMER)
+        cache.invalidate("+254700000000", "CUST001")
+
+        self.assertIsNone(cache.get_by_telephone("+254700000000"))
+        self.assertIsNone(shared.get(CustomerCache.code_key("CUST001")))
+
+    def test_shared_tier_fills_local(self):
+        """
+        Function to test that another worker's entry is read from the shared tier.
+        """
+        shared = InMemorySharedCache()
+        CustomerCache(shared=shared).store(CUSTOMER)
+        other_worker = CustomerCache(shared=shared)
+
+        self.assertEqual(other_worker.get_by_code("CUST001"), CUSTOMER)
+        self.assertEqual(other_worker.stats()["shared_hits"], 1)
+        self.assertEqual(other_worker.local.get(CustomerCache.code_key("CUST001")), CUSTOMER)
+
+    def test_read_customer_queries_only_on_miss(self):
+        """
+        Function to test the read-through lookup and that absent customers are not cached.
+        """
+        cache = CustomerCache()
+        cur = MagicMock()
+        cur.fetchone.side_effect = [None, CUSTOMER]
+
+        self.assertIsNone(read_customer(cache, cur, "telephone", "+254700000000"))
+        self.assertEqual(read_customer(cache, cur, "telephone", "+254700000000"), CUSTOMER)
+        self.assertEqual(read_customer(cache, cur, "telephone", "+254700000000"), CUSTOMER)
+        self.assertEqual(cur.execute.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Module to test the response compression middleware.
+"""
+
+import gzip
+import unittest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+import compression
+from compression import CompressionMiddleware, choose_encoding, parse_accept_encoding
+
+BODY = "order,amount\n" * 200
+
+
+def build_app():
+    """
+    Build a small application wrapped in CompressionMiddleware.
+    """
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse(BODY)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("ok")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([BODY, BODY]), media_type="text/csv")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter(["data: 1\n\n" * 200]), media_type="text/event-stream")
+
+    @app.get("/encoded")
+    def encoded():
+        return PlainTextResponse(gzip.compress(BODY.encode()), headers={"Content-Encoding": "gzip"})
+
+    return app
+
+
+class TestChooseEncoding(unittest.TestCase):
+    """
+    Test the Accept-Encoding negotiation.
+    """
+
+    def test_parse_quality_values(self):
+        self.assertEqual(
+            parse_accept_encoding("gzip, br;q=0.5, identity;q=bad"),
+            {"gzip": 1.0, "br": 0.5, "identity": 0.0},
+        )
+
+    def test_prefers_brotli_when_available(self):
+        self.assertEqual(choose_encoding("gzip, deflate, br", brotli_available=True), "br")
+        self.assertEqual(choose_encoding("gzip, deflate, br", brotli_available=False), "gzip")
+
+    def test_honours_quality_values(self):
+        self.assertEqual(choose_encoding("br;q=0.2, gzip;q=0.8", brotli_available=True), "gzip")
+        self.assertIsNone(choose_encoding("gzip;q=0", brotli_available=False))
+
+    def test_wildcard_and_missing_header(self):
+        self.assertEqual(choose_encoding("*", brotli_available=False), "gzip")
+        self.assertIsNone(choose_encoding("", brotli_available=True))
+        self.assertIsNone(choose_encoding("identity", brotli_available=True))
+
+
+class TestCompressionMiddleware(unittest.TestCase):
+    """
+    Test which responses the middleware compresses and how.
+    """
+
+    def setUp(self):
+        self.client = TestClient(build_app())
+        patcher = patch.object(compression, "brotli", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_large_response_is_gzipped(self):
+        response = self.client.get("/large", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertLess(int(response.headers["content-length"]), len(BODY))
+        self.assertEqual(response.text, BODY)
+
+    def test_small_response_is_not_compressed(self):
+        response = self.client.get("/small", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.text, "ok")
+
+    def test_client_without_gzip_gets_identity(self):
+        response = self.client.get("/large", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.text, BODY)
+
+    def test_streaming_response_is_compressed_incrementally(self):
+        with self.client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+            raw = b"".join(response.iter_raw())
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertNotIn("content-length", response.headers)
+        self.assertEqual(gzip.decompress(raw).decode(), BODY * 2)
+
+    def test_event_stream_is_not_compressed(self):
+        response = self.client.get("/events", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", response.headers)
+
+    def test_already_encoded_response_is_left_alone(self):
+        with self.client.stream("GET", "/encoded", headers={"Accept-Encoding": "gzip"}) as response:
+            raw = b"".join(response.iter_raw())
+        self.assertEqual(gzip.decompress(raw).decode(), BODY)
+
+
+if __name__ == "__main__":
+    unittest.main()
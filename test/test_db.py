@@ -5,8 +5,10 @@ Module to test the database connection module.
 import unittest
 from unittest.mock import patch, MagicMock
 import os
+import threading
+import time
 import psycopg2
-from db import get_db_connection
+from db import ConnectionPool, PoolClosed, PoolTimeout, TimedDictCursor, get_db_connection
 
 class TestDatabaseConnection(unittest.TestCase):
     """
@@ -34,11 +36,109 @@ class TestDatabaseConnection(unittest.TestCase):
             password=os.getenv("DB_PASSWORD"),
             host=os.getenv("DB_HOST"),
             port=os.getenv("DB_PORT"),
-            cursor_factory=psycopg2.extras.RealDictCursor
+            cursor_factory=TimedDictCursor
         )
 
         # Assert that the function returns the mock connection object
         self.assertEqual(connection, mock_conn)
 
+
+class TestConnectionPool(unittest.TestCase):
+    """
+    Class containing test cases for the ConnectionPool class.
+    """
+
+    def make_pool(self, **kwargs):
+        """
+        Build a pool whose connect function returns fresh mock connections.
+        """
+        def connect():
+            conn = MagicMock()
+            conn.closed = 0
+            conn.get_transaction_status.return_value = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+            return conn
+        kwargs.setdefault("health_check_interval", 60)
+        return ConnectionPool(connect=connect, **kwargs)
+
+    def test_connection_is_reused(self):
+        """
+        Function to test that a returned connection is handed out again.
+        """
+        pool = self.make_pool(min_size=0, max_size=2)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            self.assertIs(first, second)
+        stats = pool.stats()
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["checked_out"], 0)
+        self.assertEqual(stats["idle"], 1)
+
+    def test_open_creates_min_size(self):
+        """
+        Function to test that open pre-creates min_size connections.
+        """
+        pool = self.make_pool(min_size=3, max_size=5)
+        pool.open()
+        self.assertEqual(pool.stats()["idle"], 3)
+        self.assertEqual(pool.stats()["created"], 3)
+
+    def test_checkout_times_out_when_exhausted(self):
+        """
+        Function to test that checkout fails once max_size connections are in use.
+        """
+        pool = self.make_pool(min_size=0, max_size=1)
+        pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(timeout=0.01)
+
+    def test_broken_connection_is_recycled(self):
+        """
+        Function to test that a connection failing its health check is replaced.
+        """
+        pool = self.make_pool(min_size=0, max_size=1, health_check_interval=0)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.cursor.return_value.__enter__.return_value.execute.side_effect = psycopg2.OperationalError
+        replacement = pool.getconn()
+        self.assertIsNot(conn, replacement)
+        conn.close.assert_called_once()
+        self.assertEqual(pool.stats()["recycled"], 1)
+
+    def test_idle_connections_expire(self):
+        """
+        Function to test that connections idle past idle_timeout are closed.
+        """
+        pool = self.make_pool(min_size=0, max_size=1, idle_timeout=0.001)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        time.sleep(0.01)
+        self.assertIsNot(pool.getconn(), conn)
+        conn.close.assert_called_once()
+
+    def test_open_transaction_is_rolled_back_on_return(self):
+        """
+        Function to test that an uncommitted transaction is rolled back on return.
+        """
+        pool = self.make_pool(min_size=0, max_size=1)
+        conn = pool.getconn()
+        conn.get_transaction_status.return_value = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        pool.putconn(conn)
+        conn.rollback.assert_called_once()
+
+    def test_close_drains_pool(self):
+        """
+        Function to test that close waits for checked-out connections and closes them.
+        """
+        pool = self.make_pool(min_size=0, max_size=2)
+        conn = pool.getconn()
+        releaser = threading.Timer(0.05, pool.putconn, args=(conn,))
+        releaser.start()
+        pool.close(timeout=1)
+        conn.close.assert_called_once()
+        self.assertEqual(pool.stats()["size"], 0)
+        with self.assertRaises(PoolClosed):
+            pool.getconn()
+
 if __name__ == "__main__":
     unittest.main()
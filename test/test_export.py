@@ -0,0 +1,161 @@
+"""
+Test file to test the export module and the export endpoints.
+"""
+
+import json
+import unittest
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from export import (
+    ORDER_COLUMNS,
+    csv_chunks,
+    iter_copy_csv,
+    iter_rows,
+    ndjson_chunks,
+    order_export_query,
+)
+from main import app
+from models import OrderExportQuery
+
+ORDERS = [
+    {"order_id": 1, "customer_id": 1, "telephone": "+254700000000", "item": "Pizza",
+     "amount": Decimal("20.50"), "order_time": datetime(2024, 11, 16, 12, 0)},
+    {"order_id": 2, "customer_id": 2, "telephone": "+254700000001", "item": "Soda, large",
+     "amount": Decimal("2.00"), "order_time": datetime(2024, 11, 16, 12, 5)},
+]
+
+
+def mock_pool(conn):
+    """
+    Build a pool stand-in whose connection() context yields conn.
+    """
+    pool = MagicMock()
+
+    @contextmanager
+    def connection():
+        yield conn
+
+    pool.connection.side_effect = connection
+    return pool
+
+
+class TestExport(unittest.TestCase):
+    """
+    Class containing test methods for the streaming export helpers.
+    """
+
+    def test_ndjson_chunks(self):
+        """
+        Function to test that rows become one JSON document per line.
+        """
+        body = "".join(ndjson_chunks(ORDERS, batch=1))
+
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(lines[0]["amount"], 20.5)
+        self.assertEqual(lines[1]["order_time"], "2024-11-16T12:05:00")
+
+    def test_csv_chunks(self):
+        """
+        Function to test CSV encoding with a header and quoting.
+        """
+        body = "".join(csv_chunks(ORDERS, ORDER_COLUMNS))
+
+        self.assertEqual(body.splitlines()[0], "order_id,customer_id,telephone,item,amount,order_time")
+        self.assertIn('"Soda, large"', body)
+
+    def test_order_export_query_filters(self):
+        """
+        Function to test that the export applies the listing filters without a limit.
+        """
+        query, args = order_export_query(OrderExportQuery(telephone="+254700000000"))
+
+        self.assertEqual(
+            query,
+            "SELECT order_id, customer_id, telephone, item, amount, order_time FROM orders "
+            "WHERE telephone = %s ORDER BY order_id",
+        )
+        self.assertEqual(args, ["+254700000000"])
+
+    @patch("export.read_connection")
+    def test_iter_rows_uses_named_cursor(self, mock_read_connection):
+        """
+        Function to test that rows are read through a server-side cursor.
+        """
+        conn = MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.__iter__.return_value = iter(ORDERS)
+        mock_read_connection.side_effect = mock_pool(conn).connection
+
+        rows = list(iter_rows("SELECT 1", [], itersize=500))
+
+        self.assertEqual(rows, ORDERS)
+        self.assertTrue(conn.cursor.call_args.kwargs["name"].startswith("export_"))
+        self.assertEqual(cursor.itersize, 500)
+
+    @patch("export.read_connection")
+    def test_iter_copy_csv_streams_copy_output(self, mock_read_connection):
+        """
+        Function to test that COPY output written by psycopg2 is yielded.
+        """
+        conn = MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.mogrify.return_value = b"SELECT 1"
+
+        def copy_expert(sql, writer):
+            self.assertEqual(sql, "COPY (SELECT 1) TO STDOUT WITH (FORMAT csv, HEADER)")
+            writer.write(b"order_id\n")
+            writer.write(b"1\n")
+
+        cursor.copy_expert.side_effect = copy_expert
+        mock_read_connection.side_effect = mock_pool(conn).connection
+
+        body = b"".join(iter_copy_csv("SELECT 1", []))
+
+        self.assertEqual(body, b"order_id\n1\n")
+        conn.commit.assert_called_once()
+        conn.close.assert_not_called()
+
+    @patch("export.read_connection")
+    def test_iter_copy_csv_cancel_discards_connection(self, mock_read_connection):
+        """
+        Function to test that abandoning a COPY export closes its connection.
+        """
+        conn = MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.mogrify.return_value = b"SELECT 1"
+
+        def copy_expert(_sql, writer):
+            while True:
+                writer.write(b"x" * 70000)
+
+        cursor.copy_expert.side_effect = copy_expert
+        mock_read_connection.side_effect = mock_pool(conn).connection
+
+        stream = iter_copy_csv("SELECT 1", [])
+        next(stream)
+        stream.close()
+
+        conn.close.assert_called_once()
+
+    @patch("export.read_connection")
+    def test_export_orders_endpoint(self, mock_read_connection):
+        """
+        Function to test the NDJSON order export endpoint.
+        """
+        conn = MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.__iter__.return_value = iter(ORDERS)
+        mock_read_connection.side_effect = mock_pool(conn).connection
+
+        response = TestClient(app).get("/orders/export", params={"format": "ndjson"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        self.assertEqual(len(response.text.splitlines()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
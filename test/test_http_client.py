@@ -0,0 +1,90 @@
+"""
+Module to test the shared outbound HTTP clients.
+"""
+
+import asyncio
+import unittest
+import httpx
+import http_client
+from http_client import (
+    HTTP_CLIENT_REQUEST_DURATION,
+    close_http_clients,
+    create_async_http_client,
+    create_http_client,
+    get_async_http_client,
+    get_http_client,
+    open_http_clients,
+)
+
+
+def handler(request):
+    """
+    Mock transport handler answering 200, or failing for fail.test.
+    """
+    if request.url.host == "fail.test":
+        raise httpx.ConnectError("connection refused", request=request)
+    return httpx.Response(200, json={"path": request.url.path})
+
+
+class TestHTTPClient(unittest.TestCase):
+    """
+    Class containing test cases for the http_client module.
+    """
+
+    def tearDown(self):
+        asyncio.run(close_http_clients())
+
+    def test_requests_are_timed_by_host(self):
+        """
+        Each request is recorded under its host and status, failures as error.
+        """
+        before = HTTP_CLIENT_REQUEST_DURATION.count(host="ok.test", status="200")
+        client = create_http_client(httpx.MockTransport(handler))
+
+        self.assertEqual(client.get("https://ok.test/a").json(), {"path": "/a"})
+        with self.assertRaises(httpx.ConnectError):
+            client.get("https://fail.test/")
+
+        self.assertEqual(HTTP_CLIENT_REQUEST_DURATION.count(host="ok.test", status="200"), before + 1)
+        self.assertGreaterEqual(HTTP_CLIENT_REQUEST_DURATION.count(host="fail.test", status="error"), 1)
+
+    def test_async_requests_are_timed(self):
+        """
+        The async client records its requests the same way.
+        """
+        before = HTTP_CLIENT_REQUEST_DURATION.count(host="async.test", status="200")
+
+        async def call():
+            async with create_async_http_client(httpx.MockTransport(handler)) as client:
+                return (await client.get("https://async.test/b")).json()
+
+        self.assertEqual(asyncio.run(call()), {"path": "/b"})
+        self.assertEqual(HTTP_CLIENT_REQUEST_DURATION.count(host="async.test", status="200"), before + 1)
+
+    def test_configured_timeouts(self):
+        """
+        Clients apply the configured timeouts.
+        """
+        client = create_http_client(httpx.MockTransport(handler))
+        self.assertEqual(client.timeout.connect, http_client.HTTP_CONNECT_TIMEOUT)
+        self.assertEqual(client.timeout.read, http_client.HTTP_READ_TIMEOUT)
+        self.assertEqual(client.timeout.pool, http_client.HTTP_POOL_TIMEOUT)
+
+    def test_shared_clients_are_reused_until_closed(self):
+        """
+        The shared clients are created once and replaced after close.
+        """
+        open_http_clients()
+        client, async_client = get_http_client(), get_async_http_client()
+        self.assertIs(get_http_client(), client)
+        self.assertIs(get_async_http_client(), async_client)
+
+        asyncio.run(close_http_clients())
+
+        self.assertTrue(client.is_closed)
+        self.assertTrue(async_client.is_closed)
+        self.assertIsNot(get_http_client(), client)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Module to test the idempotency key helpers.
+"""
+
+import json
+import unittest
+from unittest.mock import MagicMock
+from fastapi import HTTPException
+from idempotency import (
+    PURGE_EXPIRED_SQL,
+    claim_key,
+    purge_expired,
+    replay_response,
+    request_hash,
+    save_response_params,
+)
+from models import OrderCreate
+
+
+class TestIdempotency(unittest.TestCase):
+    """
+    Class containing test cases for the idempotency module.
+    """
+
+    def test_request_hash_ignores_field_order(self):
+        """
+        Equal bodies hash the same, different bodies differently.
+        """
+        first = OrderCreate(telephone="1234567890", item="Pizza", amount=10)
+        same = OrderCreate(amount=10, item="Pizza", telephone="1234567890")
+        other = OrderCreate(telephone="1234567890", item="Pizza", amount=11)
+        self.assertEqual(request_hash(first), request_hash(same))
+        self.assertNotEqual(request_hash(first), request_hash(other))
+
+    def test_claim_new_key(self):
+        """
+        A newly recorded key lets the request run.
+        """
+        cur = MagicMock()
+        cur.fetchone.return_value = {"idempotency_key": "k1"}
+        self.assertIsNone(claim_key(cur, "k1", "h", ttl=60))
+        self.assertEqual(cur.execute.call_args[0][1], ("k1", "h", 60))
+
+    def test_claim_existing_key(self):
+        """
+        A live key returns its stored row.
+        """
+        cur = MagicMock()
+        stored = {"request_hash": "h", "status_code": 201, "response": {"order_id": 1}}
+        cur.fetchone.side_effect = [None, stored]
+        self.assertEqual(claim_key(cur, "k1", "h"), stored)
+
+    def test_replay_response(self):
+        """
+        The stored status and body are returned and marked as replayed.
+        """
+        response = replay_response(
+            {"request_hash": "h" + " " * 63, "status_code": 201, "response": {"order_id": 1}}, "h"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.body), {"order_id": 1})
+        self.assertEqual(response.headers["Idempotent-Replayed"], "true")
+
+    def test_replay_rejects_other_body(self):
+        """
+        A key reused with another body is rejected with 422.
+        """
+        with self.assertRaises(HTTPException) as ctx:
+            replay_response({"request_hash": "a", "status_code": 201, "response": {}}, "b")
+        self.assertEqual(ctx.exception.status_code, 422)
+
+    def test_save_response_params(self):
+        """
+        The response is stored as JSON.
+        """
+        self.assertEqual(
+            save_response_params("k1", 201, {"order_id": 1}), (201, '{"order_id": 1}', "k1")
+        )
+
+    def test_purge_expired_in_batches(self):
+        """
+        Expired keys are deleted batch by batch until a batch comes back short.
+        """
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+        rowcounts = iter([100, 100, 30])
+
+        def execute(sql, params):
+            self.assertEqual(sql, PURGE_EXPIRED_SQL)
+            self.assertEqual(params, (100,))
+            cur.rowcount = next(rowcounts)
+
+        cur.execute.side_effect = execute
+
+        self.assertEqual(purge_expired(lambda: conn, batch_size=100), 230)
+        self.assertTrue(conn.autocommit)
+        conn.close.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Module to test the listing watermarks, ETag matching and rendered page cache.
+"""
+
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from listing_cache import ListingCache, Watermark, etag_matches, read_watermark
+from models import OrderListQuery
+
+
+class TestWatermark(unittest.TestCase):
+    """
+    Test the validator headers built from a watermark.
+    """
+
+    def test_headers(self):
+        watermark = Watermark("orders", 42, datetime(2024, 11, 16, 15, 0, tzinfo=timezone(timedelta(hours=3))))
+        self.assertEqual(watermark.headers(), {
+            "ETag": 'W/"orders-42"',
+            "Cache-Control": "private, no-cache",
+            "Last-Modified": "Sat, 16 Nov 2024 12:00:00 GMT",
+        })
+
+    def test_headers_without_changes(self):
+        self.assertNotIn("Last-Modified", Watermark("customers", 0).headers())
+
+    def test_read_watermark(self):
+        cur = MagicMock()
+        cur.fetchone.return_value = {"changes": 5, "changed_at": None}
+        self.assertEqual(read_watermark(cur, "customers"), Watermark("customers", 5, None))
+        self.assertEqual(cur.execute.call_args.args[1], ("customers",))
+
+
+class TestEtagMatches(unittest.TestCase):
+    """
+    Test the If-None-Match comparison.
+    """
+
+    def test_weak_comparison(self):
+        self.assertTrue(etag_matches('W/"orders-1"', 'W/"orders-1"'))
+        self.assertTrue(etag_matches('"orders-1"', 'W/"orders-1"'))
+        self.assertFalse(etag_matches('W/"orders-2"', 'W/"orders-1"'))
+
+    def test_lists_and_wildcard(self):
+        self.assertTrue(etag_matches('"a", W/"orders-1"', 'W/"orders-1"'))
+        self.assertTrue(etag_matches("*", 'W/"orders-1"'))
+        self.assertFalse(etag_matches(None, 'W/"orders-1"'))
+        self.assertFalse(etag_matches("", 'W/"orders-1"'))
+
+
+class TestListingCache(unittest.TestCase):
+    """
+    Test that pages are cached per watermark and query parameters.
+    """
+
+    def test_pages_are_keyed_by_watermark_and_params(self):
+        cache = ListingCache(maxsize=10, ttl=60)
+        watermark = Watermark("orders", 1)
+        params = OrderListQuery(limit=10)
+        cache.store(watermark, params, b"page")
+
+        self.assertEqual(cache.get(watermark, OrderListQuery(limit=10)), b"page")
+        self.assertIsNone(cache.get(watermark, OrderListQuery(limit=20)))
+        self.assertIsNone(cache.get(Watermark("orders", 2), params))
+        self.assertIsNone(cache.get(Watermark("customers", 1), params))
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_size_is_bounded(self):
+        cache = ListingCache(maxsize=2, ttl=60)
+        for changes in range(3):
+            cache.store(Watermark("orders", changes), OrderListQuery(), b"page")
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertIsNone(cache.get(Watermark("orders", 0), OrderListQuery()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,32 +2,62 @@
 Test file to test the main FastAPI application with pytest.
 """
 
-from unittest.mock import patch, MagicMock
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import patch, AsyncMock, MagicMock
+import httpx
 import pytest
 from fastapi.testclient import TestClient
+from cache import get_customer_cache
+from db import get_db
+from idempotency import request_hash
+from listing_cache import get_listing_cache
 from main import app
+from models import OrderCreate
+from order_batcher import UnknownCustomerError
+from replicas import get_read_db
+from sms_dispatcher import SMSJob
 
 # Create a test client
 client = TestClient(app)
 
-# Mock get_db_connection globally in this module
+WATERMARK = {"changes": 7, "changed_at": datetime(2024, 11, 16, 12, tzinfo=timezone.utc)}
+
+CUSTOMER = {"customer_id": 1, "customer_code": "CUST001", "name": "John Doe", "telephone": "1234567890", "location": "New York"}
+
+# Start every test with empty customer and listing caches
+@pytest.fixture(autouse=True)
+def clear_customer_cache():
+    """
+    Function to clear the customer and listing caches around each test.
+    """
+    get_customer_cache().local.clear()
+    get_listing_cache().local.clear()
+    yield
+    get_customer_cache().local.clear()
+    get_listing_cache().local.clear()
+
+# Override the pooled connection dependency for every test in this module
 @pytest.fixture(scope="function")
 def mock_db_connection():
     """
-    Function to mock the get_db_connection function.
+    Function to override the get_db and get_read_db dependencies with a mock connection.
     """
-    with patch('main.get_db_connection') as mock_conn:
-        # Set up the mock connection and cursor
-        mock_conn_instance = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn_instance.cursor.return_value = mock_cursor
-        mock_conn.return_value = mock_conn_instance
+    # Set up the mock connection and cursor
+    mock_conn_instance = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn_instance.cursor.return_value = mock_cursor
+    app.dependency_overrides[get_db] = lambda: mock_conn_instance
+    app.dependency_overrides[get_read_db] = lambda: mock_conn_instance
+
+    yield mock_cursor, mock_conn_instance
 
-        yield mock_cursor, mock_conn_instance
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_read_db, None)
 
-        # Ensure resources are closed
-        mock_cursor.close.assert_called_once()
-        mock_conn_instance.close.assert_called_once()
+    # Ensure every cursor opened is closed and the pooled connection is not
+    assert mock_cursor.close.call_count == mock_conn_instance.cursor.call_count
+    mock_conn_instance.close.assert_not_called()
 
 # Test customer creation endpoint
 def test_create_customer(mock_db_connection):
@@ -59,19 +89,15 @@ def test_create_customer(mock_db_connection):
     assert "INSERT INTO customers" in mock_cursor.execute.call_args[0][0]
 
 # Test order creation endpoint
-@patch('main.SendSMS')
-def test_create_order(mock_send_sms, mock_db_connection):
+@patch('main.get_dispatcher')
+def test_create_order(mock_get_dispatcher, mock_db_connection):
     """
     Function to test the create order endpoint.
     """
     mock_cursor, _ = mock_db_connection
 
-    # Mock SMS service
-    mock_sms_instance = mock_send_sms.return_value
-    mock_sms_instance.sending_order.return_value = None
-
-    # Mock the cursor's fetchone method to simulate returning an order ID
-    mock_cursor.fetchone.return_value = {"order_id": 1}
+    # Mock the cursor's fetchone method to simulate the customer lookup, then the order ID
+    mock_cursor.fetchone.side_effect = [CUSTOMER, {"order_id": 1}]
 
     # Define test input data
     test_data = {
@@ -86,14 +112,213 @@ def test_create_order(mock_send_sms, mock_db_connection):
 
     # Check the response status and data
     assert response.status_code == 201
-    assert response.json() == {"order_id": 1, "message": "Order created successfully and message sent successfully"}
+    assert response.json() == {"order_id": 1, "message": "Order created successfully and notification queued"}
 
-    # Verify the SQL query execution
-    mock_cursor.execute.assert_called_once()
+    # Verify the customer was looked up before the SQL insert
+    assert mock_cursor.execute.call_count == 2
+    assert "FROM customers" in mock_cursor.execute.call_args_list[0][0][0]
     assert "INSERT INTO orders" in mock_cursor.execute.call_args[0][0]
 
-    # Verify SMS was sent
-    mock_sms_instance.sending_order.assert_called_once_with("1234567890", "Pizza", 20.0, None)
+    # Verify the SMS was queued rather than sent inline
+    mock_get_dispatcher.return_value.enqueue.assert_called_once_with(
+        SMSJob("1234567890", "Pizza", 20.0, None)
+    )
+
+# Test order creation with the transactional outbox
+@patch('main.SMS_DELIVERY', 'outbox')
+@patch('main.get_dispatcher')
+def test_create_order_outbox(mock_get_dispatcher, mock_db_connection):
+    """
+    Function to test that the outbox row is written before the single commit.
+    """
+    mock_cursor, mock_conn = mock_db_connection
+    get_customer_cache().store(CUSTOMER)
+    mock_cursor.fetchone.return_value = {"order_id": 1}
+
+    response = client.post("/orders/", json={"telephone": "1234567890", "item": "Pizza", "amount": 20.0})
+
+    assert response.status_code == 201
+    statements = [call[0][0] for call in mock_cursor.execute.call_args_list]
+    assert "INSERT INTO orders" in statements[0]
+    assert "INSERT INTO outbox" in statements[1]
+    mock_conn.commit.assert_called_once()
+    mock_get_dispatcher.assert_not_called()
+
+# Test that orders go through the group commit batcher when enabled
+@patch('main.get_order_batcher')
+@patch('main.get_dispatcher')
+def test_create_order_batched(mock_get_dispatcher, mock_get_order_batcher, mock_db_connection):
+    """
+    Function to test that with ORDER_BATCHING the batcher inserts the order.
+    """
+    mock_cursor, _ = mock_db_connection
+    get_customer_cache().store(CUSTOMER)
+    mock_get_order_batcher.return_value.insert.return_value = 42
+
+    with patch('main.ORDER_BATCHING', True):
+        response = client.post("/orders/", json={"telephone": "1234567890", "item": "Pizza", "amount": 20.0})
+
+    assert response.status_code == 201
+    assert response.json()["order_id"] == 42
+    mock_cursor.execute.assert_not_called()
+    customer_id, order, job = mock_get_order_batcher.return_value.insert.call_args[0]
+    assert customer_id == CUSTOMER["customer_id"] and order.item == "Pizza"
+    mock_get_dispatcher.return_value.enqueue.assert_called_once_with(job)
+
+# Test that a batched order for a deleted customer is rejected
+@patch('main.get_order_batcher')
+@patch('main.get_dispatcher')
+def test_create_order_batched_unknown_customer(mock_get_dispatcher, mock_get_order_batcher, mock_db_connection):
+    """
+    Function to test that the batcher's UnknownCustomerError becomes a 400.
+    """
+    get_customer_cache().store(CUSTOMER)
+    mock_get_order_batcher.return_value.insert.side_effect = UnknownCustomerError("gone")
+
+    with patch('main.ORDER_BATCHING', True):
+        response = client.post("/orders/", json={"telephone": "1234567890", "item": "Pizza", "amount": 20.0})
+
+    assert response.status_code == 400
+    mock_get_dispatcher.return_value.enqueue.assert_not_called()
+
+# Test the health endpoint
+def test_health():
+    """
+    Function to test that /health answers without a database connection.
+    """
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+# Test that an idempotency key is recorded with the order's response
+@patch('main.get_dispatcher')
+def test_create_order_records_idempotency_key(mock_get_dispatcher, mock_db_connection):
+    """
+    Function to test that the key is claimed and its response saved before the commit.
+    """
+    mock_cursor, mock_conn = mock_db_connection
+    get_customer_cache().store(CUSTOMER)
+    mock_cursor.fetchone.side_effect = [{"idempotency_key": "k1"}, {"order_id": 1}]
+
+    response = client.post(
+        "/orders/", json={"telephone": "1234567890", "item": "Pizza", "amount": 20.0},
+        headers={"Idempotency-Key": "k1"},
+    )
+
+    assert response.status_code == 201
+    statements = [call[0][0] for call in mock_cursor.execute.call_args_list]
+    assert "INSERT INTO idempotency_keys" in statements[0]
+    assert "INSERT INTO orders" in statements[1]
+    assert "UPDATE idempotency_keys" in statements[2]
+    assert mock_cursor.execute.call_args[0][1][0] == 201
+    mock_conn.commit.assert_called_once()
+    mock_get_dispatcher.return_value.enqueue.assert_called_once()
+
+# Test that a retried request replays the stored response
+@patch('main.get_dispatcher')
+def test_create_order_idempotent_replay(mock_get_dispatcher, mock_db_connection):
+    """
+    Function to test that a retry returns the stored response without a new order or SMS.
+    """
+    mock_cursor, mock_conn = mock_db_connection
+    body = {"telephone": "1234567890", "item": "Pizza", "amount": 20.0}
+    stored = {"order_id": 1, "message": "Order created successfully and notification queued"}
+    mock_cursor.fetchone.side_effect = [
+        None,
+        {"request_hash": request_hash(OrderCreate(**body)), "status_code": 201, "response": stored},
+    ]
+
+    response = client.post("/orders/", json=body, headers={"Idempotency-Key": "k1"})
+
+    assert response.status_code == 201
+    assert response.json() == stored
+    assert response.headers["idempotent-replayed"] == "true"
+    assert not any("INSERT INTO orders" in call[0][0] for call in mock_cursor.execute.call_args_list)
+    mock_conn.commit.assert_not_called()
+    mock_get_dispatcher.return_value.enqueue.assert_not_called()
+
+# Test that a key reused with another body is rejected
+@patch('main.get_dispatcher')
+def test_create_order_idempotency_key_reused(mock_get_dispatcher, mock_db_connection):
+    """
+    Function to test that reusing a key with a different body returns 422.
+    """
+    mock_cursor, _ = mock_db_connection
+    mock_cursor.fetchone.side_effect = [
+        None, {"request_hash": "0" * 64, "status_code": 201, "response": {"order_id": 1}},
+    ]
+
+    response = client.post(
+        "/orders/", json={"telephone": "1234567890", "item": "Pizza", "amount": 20.0},
+        headers={"Idempotency-Key": "k1"},
+    )
+
+    assert response.status_code == 422
+    mock_get_dispatcher.return_value.enqueue.assert_not_called()
+
+# Test that cached customers skip the lookup query
+@patch('main.get_dispatcher')
+def test_create_order_uses_customer_cache(mock_get_dispatcher, mock_db_connection):
+    """
+    Function to test that a second order for the same customer reads the cache.
+    """
+    mock_cursor, _ = mock_db_connection
+    mock_cursor.fetchone.side_effect = [CUSTOMER, {"order_id": 1}, {"order_id": 2}]
+    order = {"telephone": "1234567890", "item": "Pizza", "amount": 20.0}
+    hits = get_customer_cache().stats()["hits"]
+
+    assert client.post("/orders/", json=order).status_code == 201
+    assert client.post("/orders/", json=order).status_code == 201
+
+    lookups = [call for call in mock_cursor.execute.call_args_list if "FROM customers" in call[0][0]]
+    assert len(lookups) == 1
+    assert get_customer_cache().stats()["hits"] == hits + 1
+    assert mock_get_dispatcher.return_value.enqueue.call_count == 2
+
+# Test order creation for an unknown customer
+@patch('main.get_dispatcher')
+def test_create_order_unknown_customer(mock_get_dispatcher, mock_db_connection):
+    """
+    Function to test that an unknown telephone is rejected before the insert.
+    """
+    mock_cursor, mock_conn = mock_db_connection
+    mock_cursor.fetchone.return_value = None
+
+    response = client.post("/orders/", json={"telephone": "1234567890", "item": "Pizza", "amount": 20.0})
+
+    assert response.status_code == 400
+    mock_cursor.execute.assert_called_once()
+    mock_conn.commit.assert_not_called()
+    mock_get_dispatcher.return_value.enqueue.assert_not_called()
+
+# Test that creating a customer invalidates its cache entries
+def test_create_customer_invalidates_cache(mock_db_connection):
+    """
+    Function to test that create_customer drops cached entries for the customer.
+    """
+    mock_cursor, _ = mock_db_connection
+    mock_cursor.fetchone.return_value = {"customer_id": 1}
+    get_customer_cache().store(CUSTOMER)
+
+    client.post("/customers/", json={
+        "customer_code": "CUST001", "name": "John Doe", "telephone": "1234567890"
+    })
+
+    assert get_customer_cache().get_by_telephone("1234567890") is None
+    assert get_customer_cache().get_by_code("CUST001") is None
+
+# Test reading a customer by telephone
+def test_get_customer_by_telephone(mock_db_connection):
+    """
+    Function to test the customer lookup endpoint and its 404.
+    """
+    mock_cursor, _ = mock_db_connection
+    mock_cursor.fetchone.side_effect = [CUSTOMER, None]
+
+    assert client.get("/customers/telephone/1234567890").json() == CUSTOMER
+    assert client.get("/customers/code/CUST001").json() == CUSTOMER
+    assert client.get("/customers/code/CUST999").status_code == 404
+    assert mock_cursor.execute.call_count == 2
 
 # Test customer listing endpoint
 def test_list_customers(mock_db_connection):
@@ -101,6 +326,7 @@ def test_list_customers(mock_db_connection):
     Funnction to test the list customers endpoint.
     """
     mock_cursor, _ = mock_db_connection
+    mock_cursor.fetchone.return_value = WATERMARK
 
     # Mock the cursor's fetchall method to simulate returning a list of customers
     mock_cursor.fetchall.return_value = [
@@ -112,12 +338,17 @@ def test_list_customers(mock_db_connection):
 
     # Check the response status and data
     assert response.status_code == 200
-    assert response.json() == [
-        {"customer_id": 1, "name": "John Doe", "telephone": "1234567890", "location": "New York"}
-    ]
+    assert response.json() == {
+        "items": [
+            {"customer_id": 1, "name": "John Doe", "telephone": "1234567890", "location": "New York"}
+        ],
+        "next_page_token": None,
+    }
 
-    # Verify the SQL query execution
-    mock_cursor.execute.assert_called_once_with("SELECT * FROM customers;")
+    # Verify the SQL query execution, one extra row is read to detect a next page
+    mock_cursor.execute.assert_called_with(
+        "SELECT * FROM customers ORDER BY customer_id LIMIT %s;", [51]
+    )
 
 # Test order listing endpoint
 def test_list_orders(mock_db_connection):
@@ -125,10 +356,12 @@ def test_list_orders(mock_db_connection):
     Function to test the list orders endpoint.
     """
     mock_cursor, _ = mock_db_connection
+    mock_cursor.fetchone.return_value = WATERMARK
 
     # Mock the cursor's fetchall method to simulate returning a list of orders
     mock_cursor.fetchall.return_value = [
-        {"order_id": 1, "telephone": "1234567890", "item": "Pizza", "amount": 20.0, "order_time": "2024-11-16T12:00:00"}
+        {"order_id": 1, "telephone": "1234567890", "item": "Pizza", "amount": Decimal("20.00"),
+         "order_time": datetime(2024, 11, 16, 12)}
     ]
 
     # Make a GET request to the list orders endpoint
@@ -136,9 +369,241 @@ def test_list_orders(mock_db_connection):
 
     # Check the response status and data
     assert response.status_code == 200
-    assert response.json() == [
-        {"order_id": 1, "telephone": "1234567890", "item": "Pizza", "amount": 20.0, "order_time": "2024-11-16T12:00:00"}
-    ]
+    assert response.json() == {
+        "items": [
+            {"order_id": 1, "telephone": "1234567890", "item": "Pizza", "amount": 20.0, "order_time": "2024-11-16T12:00:00"}
+        ],
+        "next_page_token": None,
+    }
 
     # Verify the SQL query execution
-    mock_cursor.execute.assert_called_once_with("SELECT * FROM orders;")
+    mock_cursor.execute.assert_called_with(
+        "SELECT * FROM orders ORDER BY order_id ASC LIMIT %s;", [51]
+    )
+
+# Test conditional GET of the order listing
+def test_list_orders_not_modified(mock_db_connection):
+    """
+    Function to test that a matching If-None-Match is answered with 304 without reading rows.
+    """
+    mock_cursor, _ = mock_db_connection
+    mock_cursor.fetchone.return_value = WATERMARK
+    mock_cursor.fetchall.return_value = []
+
+    first = client.get("/orders/")
+    assert first.headers["etag"] == 'W/"orders-7"'
+    assert first.headers["last-modified"] == "Sat, 16 Nov 2024 12:00:00 GMT"
+    assert first.headers["cache-control"] == "private, no-cache"
+    mock_cursor.execute.reset_mock()
+
+    response = client.get("/orders/", headers={"If-None-Match": first.headers["etag"]})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == 'W/"orders-7"'
+    mock_cursor.execute.assert_called_once_with(
+        "SELECT COALESCE(SUM(changes), 0) AS changes, MAX(changed_at) AS changed_at "
+        "FROM table_changes WHERE table_name = %s;", ("orders",)
+    )
+
+# Test the rendered page cache of the customer listing
+def test_list_customers_served_from_cache_until_changed(mock_db_connection):
+    """
+    Function to test that a page is rendered once per watermark and query.
+    """
+    mock_cursor, _ = mock_db_connection
+    mock_cursor.fetchone.return_value = WATERMARK
+    mock_cursor.fetchall.return_value = [CUSTOMER]
+
+    assert client.get("/customers/").json()["items"] == [CUSTOMER]
+    assert client.get("/customers/").json()["items"] == [CUSTOMER]
+    assert mock_cursor.fetchall.call_count == 1
+
+    # Another query is another page
+    client.get("/customers/", params={"limit": 10})
+    assert mock_cursor.fetchall.call_count == 2
+
+    # A write moves the watermark and the page is read again
+    mock_cursor.fetchone.return_value = dict(WATERMARK, changes=8)
+    response = client.get("/customers/", headers={"If-None-Match": 'W/"customers-7"'})
+    assert response.status_code == 200
+    assert response.headers["etag"] == 'W/"customers-8"'
+    assert mock_cursor.fetchall.call_count == 3
+
+# Test compression of large listing pages
+def test_list_orders_compressed(mock_db_connection):
+    """
+    Function to test that a large page is gzip-compressed for clients accepting it.
+    """
+    mock_cursor, _ = mock_db_connection
+    mock_cursor.fetchone.return_value = WATERMARK
+    mock_cursor.fetchall.return_value = [
+        {"order_id": order_id, "customer_id": 1, "telephone": "1234567890", "item": "Pizza",
+         "amount": Decimal("20.00"), "order_time": datetime(2024, 11, 16, 12)}
+        for order_id in range(1, 51)
+    ]
+
+    response = client.get("/orders/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert len(response.json()["items"]) == 50
+
+def test_list_customers_small_page_uncompressed(mock_db_connection):
+    """
+    Function to test that responses under the size threshold are sent uncompressed.
+    """
+    mock_cursor, _ = mock_db_connection
+    mock_cursor.fetchone.return_value = WATERMARK
+    mock_cursor.fetchall.return_value = [CUSTOMER]
+
+    response = client.get("/customers/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.json()["items"] == [CUSTOMER]
+
+# Test paging through orders with filters
+def test_list_orders_next_page(mock_db_connection):
+    """
+    Function to test that a full page returns a token that continues after its last row.
+    """
+    mock_cursor, _ = mock_db_connection
+    mock_cursor.fetchone.return_value = WATERMARK
+    mock_cursor.fetchall.return_value = [
+        {"order_id": order_id, "telephone": "1234567890", "item": "Pizza", "amount": 20.0}
+        for order_id in (1, 2, 3)
+    ]
+
+    response = client.get("/orders/", params={"limit": 2, "telephone": "1234567890"})
+
+    assert response.status_code == 200
+    page = response.json()
+    assert [order["order_id"] for order in page["items"]] == [1, 2]
+    assert page["next_page_token"]
+
+    mock_cursor.fetchall.return_value = []
+    client.get("/orders/", params={
+        "limit": 2, "telephone": "1234567890", "page_token": page["next_page_token"]
+    })
+    mock_cursor.execute.assert_called_with(
+        "SELECT * FROM orders WHERE telephone = %s AND order_id > %s "
+        "ORDER BY order_id ASC LIMIT %s;",
+        ["1234567890", 2, 3],
+    )
+
+# Test listing with an invalid page token
+def test_list_orders_invalid_page_token(mock_db_connection):
+    """
+    Function to test that a malformed page token is rejected with 400.
+    """
+    mock_cursor, _ = mock_db_connection
+
+    response = client.get("/orders/", params={"page_token": "not-a-token"})
+
+    assert response.status_code == 400
+    mock_cursor.execute.assert_not_called()
+
+# Test per-customer statistics endpoints
+def test_customer_stats(mock_db_connection):
+    """
+    Function to test the customer statistics list and single-customer endpoints.
+    """
+    mock_cursor, _ = mock_db_connection
+    stats = {"customer_id": 1, "customer_code": "CUST001", "order_count": 3, "total_amount": 60.0}
+    mock_cursor.fetchall.return_value = [stats]
+    mock_cursor.fetchone.side_effect = [stats, None]
+
+    assert client.get("/stats/customers").json() == {"items": [stats], "next_page_token": None}
+    assert "customer_order_stats" in mock_cursor.execute.call_args[0][0]
+    assert client.get("/stats/customers/1").json() == stats
+    assert client.get("/stats/customers/2").status_code == 404
+
+# Test daily revenue endpoint
+def test_daily_revenue(mock_db_connection):
+    """
+    Function to test that daily revenue reads the rollup for the requested range.
+    """
+    mock_cursor, _ = mock_db_connection
+    mock_cursor.fetchall.return_value = [{"day": "2024-11-01", "order_count": 2, "revenue": 30.0}]
+
+    response = client.get("/stats/daily-revenue", params={"from_date": "2024-11-01", "to_date": "2024-11-08"})
+
+    assert response.status_code == 200
+    assert response.json()["revenue"] == 30.0
+    assert "FROM daily_revenue" in mock_cursor.execute.call_args[0][0]
+    assert client.get("/stats/daily-revenue", params={
+        "from_date": "2024-11-08", "to_date": "2024-11-01"
+    }).status_code == 400
+
+# Test that the customer and order routes require a token when auth is enabled
+@patch('auth.AUTH_ENABLED', True)
+def test_routes_require_token():
+    """
+    Function to test that requests without a bearer token are rejected.
+    """
+    assert client.get("/customers/").status_code == 401
+    assert client.post("/orders/", json={"telephone": "1234567890", "item": "x", "amount": 1}).status_code == 401
+
+# Test the Auth0 callback token exchange through the shared HTTP client
+@patch('main.get_async_http_client')
+def test_callback_exchanges_code(mock_get_client):
+    """
+    Function to test that /callback exchanges the code and redirects with the token.
+    """
+    mock_get_client.return_value.post = AsyncMock(
+        return_value=httpx.Response(200, json={"access_token": "abc"}, request=httpx.Request("POST", "https://x"))
+    )
+
+    response = client.get("/callback?code=xyz", follow_redirects=False)
+
+    assert response.status_code == 307
+    assert response.headers["location"].endswith("#access_token=abc")
+    assert mock_get_client.return_value.post.call_args.kwargs["data"]["code"] == "xyz"
+
+# Test pool metrics endpoint
+@patch('main.get_pool')
+def test_pool_stats(mock_get_pool):
+    """
+    Function to test the pool stats endpoint.
+    """
+    mock_get_pool.return_value.stats.return_value = {"checked_out": 2, "waiting": 0}
+
+    response = client.get("/pool/stats")
+
+    assert response.status_code == 200
+    assert response.json() == {"checked_out": 2, "waiting": 0}
+
+# Test replica routing endpoint
+@patch('main.get_replica_router')
+def test_replica_stats(mock_get_router):
+    """
+    Function to test the replica stats endpoint.
+    """
+    stats = {"balancing": "round_robin", "max_lag": 5, "replicas": [{"name": "replica1:5432", "up": True}]}
+    mock_get_router.return_value.stats.return_value = stats
+
+    response = client.get("/replicas/stats")
+
+    assert response.status_code == 200
+    assert response.json() == stats
+
+# Test the Prometheus metrics endpoint
+@patch('main.get_pool')
+def test_metrics(mock_get_pool, mock_db_connection):
+    """
+    Function to test that /metrics reports request timings and pool statistics.
+    """
+    mock_get_pool.return_value.stats.return_value = {"checked_out": 2, "waiting": 0}
+    mock_cursor, _ = mock_db_connection
+    mock_cursor.fetchone.return_value = None
+
+    client.get("/customers/code/MISSING")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/customers/code/{customer_code}",status="404"}' in body
+    assert 'http_request_phase_duration_seconds_count{route="/customers/code/{customer_code}",phase="serialize"} ' in body
+    assert "db_pool_checked_out 2" in body
@@ -0,0 +1,126 @@
+"""
+Module to test the request metrics and their Prometheus exposition.
+"""
+
+import unittest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from metrics import (
+    Counter,
+    Histogram,
+    MetricsMiddleware,
+    Registry,
+    TimedJSONResponse,
+    add_phase_time,
+    phase,
+    stats_gauges,
+)
+
+
+def build_app(slow_threshold_ms=0):
+    """
+    Build a small application wrapped in MetricsMiddleware.
+    """
+    app = FastAPI(default_response_class=TimedJSONResponse)
+    app.add_middleware(MetricsMiddleware, slow_threshold_ms=slow_threshold_ms)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with phase("db_execute"):
+            pass
+        add_phase_time("db_execute", 0.25)
+        return {"item_id": item_id}
+
+    return app
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Class containing test cases for the metrics module.
+    """
+
+    def test_counter_render(self):
+        """
+        Counters are rendered once per label set with escaped label values.
+        """
+        registry = Registry()
+        counter = registry.counter("requests_total", "Requests.", ("route",))
+        counter.inc(route='/a"b')
+        counter.inc(2, route='/a"b')
+
+        text = registry.render()
+
+        self.assertIn("# TYPE requests_total counter", text)
+        self.assertIn('requests_total{route="/a\\"b"} 3', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """
+        Each bucket counts the observations at or below its bound.
+        """
+        histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        samples = {name + labels: value for name, labels, value in histogram.samples()}
+
+        self.assertEqual(samples['latency_seconds_bucket{le="0.1"}'], 2)
+        self.assertEqual(samples['latency_seconds_bucket{le="1.0"}'], 3)
+        self.assertEqual(samples['latency_seconds_bucket{le="+Inf"}'], 4)
+        self.assertEqual(samples["latency_seconds_count"], 4)
+        self.assertAlmostEqual(samples["latency_seconds_sum"], 3.65)
+
+    def test_phase_outside_request_is_ignored(self):
+        """
+        Phases timed outside a request are not recorded anywhere.
+        """
+        with phase("db_execute"):
+            result = 1
+        add_phase_time("db_execute", 1.0)
+        self.assertEqual(result, 1)
+
+    def test_stats_gauges(self):
+        """
+        Only numeric statistics become gauges.
+        """
+        gauges = stats_gauges("db_pool", {"idle": 3, "mode": "sync"})
+        self.assertEqual([(name, value) for name, _, value in gauges], [("db_pool_idle", 3)])
+        self.assertIn("# TYPE db_pool_idle gauge\ndb_pool_idle 3", Registry().render(gauges))
+
+    def test_middleware_records_route_and_phases(self):
+        """
+        Requests are labelled with their route template and their phases are recorded.
+        """
+        with patch("metrics.HTTP_REQUESTS", Counter("r", "", ("method", "route", "status"))) as requests, \
+                patch("metrics.HTTP_REQUEST_PHASE_DURATION", Histogram("p", "", ("route", "phase"))) as phases:
+            client = TestClient(build_app())
+            self.assertEqual(client.get("/items/7").json(), {"item_id": 7})
+            client.get("/missing")
+
+        self.assertEqual(requests.value(method="GET", route="/items/{item_id}", status=200), 1)
+        self.assertEqual(requests.value(method="GET", route="unmatched", status=404), 1)
+        self.assertEqual(phases.count(route="/items/{item_id}", phase="db_execute"), 1)
+        self.assertEqual(phases.count(route="/items/{item_id}", phase="serialize"), 1)
+
+    @patch("builtins.print")
+    def test_slow_request_log(self, mock_print):
+        """
+        Requests above the threshold are printed with their phase breakdown.
+        """
+        TestClient(build_app(slow_threshold_ms=0.001)).get("/items/1")
+
+        message = mock_print.call_args[0][0]
+        self.assertIn("Slow request: GET /items/1 -> 200", message)
+        self.assertIn("db_execute=250.0ms", message)
+
+    @patch("builtins.print")
+    def test_fast_request_not_logged(self, mock_print):
+        """
+        Requests under the threshold are not printed.
+        """
+        TestClient(build_app(slow_threshold_ms=60000)).get("/items/1")
+        mock_print.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
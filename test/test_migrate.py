@@ -0,0 +1,173 @@
+"""
+Module for testing the migration runner.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from migrate import (
+    ADVISORY_LOCK_KEY,
+    RECORD_APPLIED_SQL,
+    Migration,
+    MigrationError,
+    Migrator,
+    load_migrations,
+    split_statements,
+)
+
+CREATE_TABLE = "CREATE TABLE widgets (id SERIAL PRIMARY KEY);\n"
+CREATE_INDEX = (
+    "-- migrate:no-transaction\n"
+    "-- Build the index online\n"
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS widgets_id_idx ON widgets (id);\n"
+)
+
+
+def mock_connection(applied):
+    """
+    Build a connection whose schema_version holds the given (version, checksum) rows.
+    """
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    # pg_try_advisory_lock, then to_regclass('schema_version'), then no invalid index
+    cursor.fetchone.side_effect = [(True,), (True,), None]
+    cursor.fetchall.return_value = applied
+    return conn, cursor
+
+
+class TestMigrate(unittest.TestCase):
+    """
+    Class containing the test functions for the migrate module.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.write("0001_widgets.sql", CREATE_TABLE)
+        self.write("0002_widgets_index.sql", CREATE_INDEX)
+        self.write("README.md", "not a migration")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, filename, sql):
+        """
+        Function to add a file to the temporary migrations directory.
+        """
+        with open(os.path.join(self.directory, filename), "w", encoding="utf-8") as f:
+            f.write(sql)
+
+    def executed(self, cursor):
+        """
+        Function to list the SQL strings a mock cursor executed.
+        """
+        return [call[0][0] for call in cursor.execute.call_args_list]
+
+    def test_load_migrations_in_version_order(self):
+        """
+        Function to test that only migration files are loaded, ordered by version.
+        """
+        migrations = load_migrations(self.directory)
+
+        self.assertEqual([(m.version, m.name) for m in migrations], [(1, "widgets"), (2, "widgets_index")])
+        self.assertTrue(migrations[0].transactional)
+        self.assertFalse(migrations[1].transactional)
+
+    def test_duplicate_versions_rejected(self):
+        """
+        Function to test that two files with the same version are an error.
+        """
+        self.write("0002_other.sql", CREATE_TABLE)
+
+        with self.assertRaises(MigrationError):
+            load_migrations(self.directory)
+
+    def test_split_statements(self):
+        """
+        Function to test that semicolons in strings, comments and dollar quotes do not split.
+        """
+        sql = (
+            "-- header; comment\n"
+            "INSERT INTO t VALUES ('a;b', 'it''s');\n"
+            "DO $$ BEGIN PERFORM 1; END $$;\n"
+            "/* ; */ SELECT 1"
+        )
+
+        self.assertEqual(split_statements(sql), [
+            "INSERT INTO t VALUES ('a;b', 'it''s')",
+            "DO $$ BEGIN PERFORM 1; END $$",
+            "/* ; */ SELECT 1",
+        ])
+
+    def test_migrate_applies_pending_under_lock(self):
+        """
+        Function to test that only unapplied migrations run and are recorded.
+        """
+        checksum = Migration(1, "widgets", CREATE_TABLE).checksum
+        conn, cursor = mock_connection([(1, checksum)])
+
+        applied = Migrator(lambda: conn, self.directory).migrate()
+
+        self.assertEqual([m.version for m in applied], [2])
+        statements = self.executed(cursor)
+        self.assertEqual(statements[0], "SELECT pg_try_advisory_lock(%s);")
+        self.assertNotIn(CREATE_TABLE, statements)
+        self.assertIn(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS widgets_id_idx ON widgets (id)", statements
+        )
+        cursor.execute.assert_any_call(RECORD_APPLIED_SQL, (2, "widgets_index", applied[0].checksum, unittest.mock.ANY))
+        cursor.execute.assert_called_with("SELECT pg_advisory_unlock(%s);", (ADVISORY_LOCK_KEY,))
+        # The no-transaction migration never left autocommit mode
+        conn.commit.assert_not_called()
+        conn.close.assert_called_once()
+
+    def test_transactional_migration_commits(self):
+        """
+        Function to test that a transactional migration and its record commit together.
+        """
+        conn, cursor = mock_connection([])
+        cursor.fetchone.side_effect = [(True,), (True,)]
+
+        Migrator(lambda: conn, self.directory).migrate(target=1)
+
+        self.assertIn(CREATE_TABLE, self.executed(cursor))
+        conn.commit.assert_called_once()
+        self.assertTrue(conn.autocommit)
+
+    def test_changed_migration_rejected(self):
+        """
+        Function to test that editing an applied migration stops the run and releases the lock.
+        """
+        conn, cursor = mock_connection([(1, "0" * 64)])
+
+        with self.assertRaises(MigrationError):
+            Migrator(lambda: conn, self.directory).migrate()
+
+        cursor.execute.assert_called_with("SELECT pg_advisory_unlock(%s);", (ADVISORY_LOCK_KEY,))
+
+    def test_dry_run_applies_nothing(self):
+        """
+        Function to test that a dry run only reads schema_version.
+        """
+        conn, cursor = mock_connection([])
+        cursor.fetchone.side_effect = [(False,)]
+
+        pending = Migrator(lambda: conn, self.directory).migrate(dry_run=True)
+
+        self.assertEqual([m.version for m in pending], [1, 2])
+        self.assertEqual(self.executed(cursor), ["SELECT to_regclass('schema_version') IS NOT NULL;"])
+
+    def test_repository_migrations_load(self):
+        """
+        Function to test that the shipped migrations parse.
+        """
+        migrations = load_migrations()
+
+        self.assertEqual([m.version for m in migrations], list(range(1, len(migrations) + 1)))
+        for migration in migrations:
+            self.assertTrue(split_statements(migration.sql))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+"""
+Module to test the group commit order batcher.
+"""
+
+import asyncio
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+import psycopg2
+from psycopg2 import errorcodes
+from models import OrderCreate
+from order_batcher import OrderBatchError, OrderBatcher, UnknownCustomerError
+from sms_dispatcher import SMSJob
+
+
+class ForeignKeyViolation(psycopg2.Error):
+    """
+    psycopg2 error carrying the foreign key violation SQLSTATE.
+    """
+    pgcode = errorcodes.FOREIGN_KEY_VIOLATION
+
+
+def make_order(item="Pizza"):
+    """
+    Build a valid order.
+    """
+    return OrderCreate(telephone="1234567890", item=item, amount=20.0)
+
+
+class TestOrderBatcher(unittest.TestCase):
+    """
+    Class containing test cases for OrderBatcher.
+    """
+
+    def setUp(self):
+        self.conn = MagicMock()
+        self.conn.closed = False
+        self.cur = self.conn.cursor.return_value.__enter__.return_value
+        self.batchers = []
+
+    def tearDown(self):
+        for batcher in self.batchers:
+            batcher.close()
+
+    def make_batcher(self, **kwargs):
+        """
+        Create a batcher writing through the mock connection.
+        """
+        batcher = OrderBatcher(connect=lambda: self.conn, **kwargs)
+        self.batchers.append(batcher)
+        return batcher
+
+    @staticmethod
+    def returning(sql_args):
+        """
+        execute_values side effect returning ids in reverse row order.
+        """
+        def execute_values(_cur, _sql, rows, **_kwargs):
+            sql_args.append(rows)
+            return [{"row_num": row[0], "order_id": 100 + row[0]} for row in reversed(rows)]
+        return execute_values
+
+    def test_concurrent_orders_share_one_commit(self):
+        """
+        Orders submitted within max_delay are inserted by one statement and
+        each gets its own order_id.
+        """
+        calls = []
+        batcher = self.make_batcher(max_delay=0.05, write_outbox=False)
+        with patch("order_batcher.execute_values", side_effect=self.returning(calls)):
+            futures = [batcher.submit(7, make_order(f"Item {index}")) for index in range(3)]
+            order_ids = [future.result(1) for future in futures]
+
+        self.assertEqual(order_ids, [100, 101, 102])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][1], (1, 7, "1234567890", "Item 1", 20.0, None))
+        self.conn.commit.assert_called_once()
+        stats = batcher.stats()
+        self.assertEqual(stats["batches"], 1)
+        self.assertEqual(stats["avg_batch_size"], 3.0)
+
+    def test_full_batch_flushes_before_delay(self):
+        """
+        A batch reaching max_batch_size is written without waiting for max_delay.
+        """
+        calls = []
+        batcher = self.make_batcher(max_batch_size=2, max_delay=10, write_outbox=False)
+        with patch("order_batcher.execute_values", side_effect=self.returning(calls)):
+            futures = [batcher.submit(7, make_order()) for _ in range(2)]
+            self.assertEqual([future.result(1) for future in futures], [100, 101])
+
+    def test_outbox_rows_written_in_batch(self):
+        """
+        With the outbox enabled the notifications are inserted in the same transaction.
+        """
+        calls = []
+        batcher = self.make_batcher(max_delay=0.01, write_outbox=True)
+        order = make_order()
+        with patch("order_batcher.execute_values", side_effect=self.returning(calls)):
+            self.assertEqual(batcher.submit(7, order, SMSJob.from_order(order)).result(1), 100)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[1][0][:2], (100, "1234567890"))
+        self.conn.commit.assert_called_once()
+
+    def test_failed_batch_falls_back_to_single_inserts(self):
+        """
+        When the batch fails every order is retried alone, so only the bad one fails.
+        """
+        self.cur.execute.side_effect = [None, ForeignKeyViolation("missing customer"), None]
+        self.cur.fetchone.side_effect = [{"order_id": 1}, {"order_id": 3}]
+        batcher = self.make_batcher(max_delay=0.05, write_outbox=False)
+        with patch("order_batcher.execute_values", side_effect=psycopg2.OperationalError("batch failed")), \
+                patch("builtins.print"):
+            futures = [batcher.submit(7, make_order()) for _ in range(3)]
+            self.assertEqual(futures[0].result(1), 1)
+            with self.assertRaises(UnknownCustomerError):
+                futures[1].result(1)
+            self.assertEqual(futures[2].result(1), 3)
+
+        stats = batcher.stats()
+        self.assertEqual(stats["fallbacks"], 1)
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(self.conn.commit.call_count, 2)
+
+    def test_other_errors_are_reported(self):
+        """
+        Errors other than a missing customer surface as OrderBatchError.
+        """
+        self.cur.execute.side_effect = psycopg2.OperationalError("server closed the connection")
+        batcher = self.make_batcher(max_delay=0.01, write_outbox=False)
+        with patch("order_batcher.execute_values", side_effect=psycopg2.OperationalError("down")), \
+                patch("builtins.print"):
+            with self.assertRaises(OrderBatchError):
+                batcher.insert(7, make_order(), timeout=1)
+
+    def test_ainsert(self):
+        """
+        ainsert awaits the batch from the event loop.
+        """
+        batcher = self.make_batcher(max_delay=0.01, write_outbox=False)
+        with patch("order_batcher.execute_values", side_effect=self.returning([])):
+            self.assertEqual(asyncio.run(batcher.ainsert(7, make_order(), timeout=1)), 100)
+
+    def test_close_flushes_pending_orders(self):
+        """
+        Closing the batcher writes the orders still waiting and rejects new ones.
+        """
+        batcher = OrderBatcher(connect=lambda: self.conn, max_delay=10, write_outbox=False)
+        with patch("order_batcher.execute_values", side_effect=self.returning([])):
+            future = batcher.submit(7, make_order())
+            closer = threading.Thread(target=batcher.close)
+            closer.start()
+            self.assertEqual(future.result(1), 100)
+            closer.join(1)
+        self.conn.close.assert_called_once()
+        with self.assertRaises(RuntimeError):
+            batcher.submit(7, make_order())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+"""
+Module to test the live order feed and its server-sent events endpoint.
+"""
+
+import asyncio
+import json
+import socket
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from main import app
+import order_feed
+from order_feed import (
+    HEARTBEAT_EVENT,
+    RESET_EVENT,
+    RETRY_EVENT,
+    FeedFull,
+    OrderFeed,
+    Subscriber,
+    decode_notifications,
+    encode_orders,
+)
+
+ORDER = {"order_id": 1, "customer_id": 1, "telephone": "+254700000000", "item": "Pizza",
+         "amount": 20.5, "order_time": "2024-11-16T12:00:00"}
+
+
+async def collect(stream, count):
+    """
+    Read count events from an event stream.
+    """
+    events = []
+    async for event in stream:
+        events.append(event)
+        if len(events) == count:
+            break
+    return events
+
+
+class TestEncoding(unittest.TestCase):
+    """
+    Test the decoding of notifications and the encoding of events.
+    """
+
+    def test_notifications_are_merged_into_one_event(self):
+        orders = decode_notifications([json.dumps([ORDER]), json.dumps([dict(ORDER, order_id=2)])])
+        event = encode_orders(orders)
+        self.assertTrue(event.startswith(b"event: orders\ndata: "))
+        self.assertTrue(event.endswith(b"\n\n"))
+        data = json.loads(event.split(b"data: ", 1)[1])
+        self.assertEqual([order["order_id"] for order in data], [1, 2])
+        self.assertEqual(event.count(b"\n"), 3)
+
+
+class TestSubscriber(unittest.TestCase):
+    """
+    Test the bounded buffer of a client.
+    """
+
+    def test_full_buffer_is_replaced_by_a_reset(self):
+        subscriber = Subscriber(buffer_size=2)
+        for number in range(3):
+            subscriber.put(encode_orders([dict(ORDER, order_id=number)]))
+        self.assertEqual(subscriber.queue.qsize(), 1)
+        self.assertIs(subscriber.queue.get_nowait(), RESET_EVENT)
+        self.assertEqual(subscriber.resets, 1)
+
+
+class TestOrderFeed(unittest.TestCase):
+    """
+    Test subscribing, publishing and streaming.
+    """
+
+    def test_publish_reaches_every_subscriber(self):
+        feed = OrderFeed(max_subscribers=10)
+        first, second = feed.subscribe(), feed.subscribe()
+        event = encode_orders([ORDER])
+        feed.publish(event)
+        self.assertIs(first.queue.get_nowait(), event)
+        self.assertIs(second.queue.get_nowait(), event)
+        self.assertEqual(feed.stats()["subscribers"], 2)
+
+    def test_slow_subscriber_does_not_block_others(self):
+        feed = OrderFeed(buffer_size=1)
+        slow, fast = feed.subscribe(), feed.subscribe()
+        for number in range(2):
+            feed.publish(encode_orders([dict(ORDER, order_id=number)]))
+            fast.queue.get_nowait()
+        self.assertIs(slow.queue.get_nowait(), RESET_EVENT)
+
+    def test_subscriber_limit(self):
+        feed = OrderFeed(max_subscribers=1)
+        feed.subscribe()
+        with self.assertRaises(FeedFull):
+            feed.subscribe()
+
+    def test_stream_sends_events_and_heartbeats(self):
+        feed = OrderFeed()
+        event = encode_orders([ORDER])
+
+        async def run():
+            subscriber = feed.subscribe()
+            subscriber.put(event)
+            stream = feed.stream(subscriber)
+            events = await collect(stream, 2)
+            # The first tick follows the event, the second finds the stream idle
+            feed.heartbeat()
+            feed.heartbeat()
+            events += await collect(stream, 1)
+            await stream.aclose()
+            return events
+
+        self.assertEqual(asyncio.run(run()), [RETRY_EVENT, event, HEARTBEAT_EVENT])
+        self.assertEqual(feed.stats()["subscribers"], 0)
+
+    def test_stop_ends_streams(self):
+        feed = OrderFeed()
+
+        async def run():
+            subscriber = feed.subscribe()
+            feed.stop()
+            return [event async for event in feed.stream(subscriber)]
+
+        self.assertEqual(asyncio.run(run()), [RETRY_EVENT])
+
+    def test_listener_delivers_notifications(self):
+        """
+        The listener thread waits on the connection socket and hands the
+        notifications it reads to the event loop.
+        """
+        ours, theirs = socket.socketpair()
+        conn = MagicMock()
+        conn.fileno.side_effect = theirs.fileno
+        conn.notifies = []
+        polled = threading.Event()
+
+        def poll():
+            theirs.recv(16)
+            conn.notifies.extend([
+                MagicMock(payload=json.dumps([ORDER])),
+                MagicMock(payload=json.dumps([dict(ORDER, order_id=2)])),
+            ])
+            polled.set()
+
+        conn.poll.side_effect = poll
+
+        async def run():
+            feed = OrderFeed(connect=lambda: conn)
+            subscriber = feed.subscribe()
+            feed.start(asyncio.get_running_loop())
+            ours.send(b"x")
+            event = await asyncio.wait_for(subscriber.queue.get(), 5)
+            feed.stop()
+            return feed, event
+
+        feed, event = asyncio.run(run())
+        ours.close()
+        theirs.close()
+        self.assertIn(b'"order_id":2', event)
+        self.assertEqual(feed.stats()["orders"], 2)
+        conn.cursor.return_value.__enter__.return_value.execute.assert_called_once_with("LISTEN new_orders;")
+        conn.close.assert_called_once()
+
+
+class TestStreamEndpoint(unittest.TestCase):
+    """
+    Test GET /orders/stream.
+    """
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_feed_not_running(self):
+        with patch("main.get_order_feed", return_value=None):
+            self.assertEqual(self.client.get("/orders/stream").status_code, 503)
+
+    def test_too_many_subscribers(self):
+        feed = OrderFeed(max_subscribers=0)
+        with patch("main.get_order_feed", return_value=feed):
+            response = self.client.get("/orders/stream")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["retry-after"], "30")
+
+    def test_streams_events(self):
+        feed = OrderFeed()
+        subscribe = feed.subscribe
+        event = encode_orders([ORDER])
+
+        def subscribe_and_close():
+            subscriber = subscribe()
+            subscriber.put(event)
+            subscriber.put(order_feed._CLOSE)  # pylint: disable=protected-access
+            return subscriber
+
+        with patch("main.get_order_feed", return_value=feed), \
+                patch.object(feed, "subscribe", side_effect=subscribe_and_close):
+            response = self.client.get("/orders/stream", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.content, RETRY_EVENT + event)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Test file to test the outbox module.
+"""
+
+import json
+import unittest
+from unittest.mock import MagicMock
+from outbox import (
+    CLAIM_OUTBOX_SQL,
+    INSERT_OUTBOX_SQL,
+    MARK_FAILED_SQL,
+    MARK_SENT_SQL,
+    OutboxRelay,
+    write_notification,
+)
+from send_sms import FakeSMSBackend, SendSMS
+from sms_dispatcher import SMSJob
+
+
+def outbox_row(outbox_id, telephone, attempts=0):
+    """
+    Build a claimed outbox row as returned by a RealDictCursor.
+    """
+    payload = {"telephone": telephone, "item": "Pizza", "amount": 20.0, "order_time": None}
+    return {"outbox_id": outbox_id, "payload": payload, "attempts": attempts}
+
+
+class TestOutbox(unittest.TestCase):
+    """
+    Class containing test methods for the outbox writer and relay.
+    """
+
+    def setUp(self):
+        self.cursor = MagicMock()
+        self.conn = MagicMock()
+        self.conn.closed = 0
+        self.conn.cursor.return_value.__enter__.return_value = self.cursor
+        self.backend = FakeSMSBackend()
+        self.relay = OutboxRelay(
+            connect=lambda: self.conn, sms_service=SendSMS(backend=self.backend)
+        )
+
+    def test_write_notification(self):
+        """
+        Function to test that the notification is inserted with the order id.
+        """
+        write_notification(self.cursor, 7, SMSJob("+254700000000", "Pizza", 20.0, None))
+
+        sql, params = self.cursor.execute.call_args[0]
+        self.assertEqual(sql, INSERT_OUTBOX_SQL)
+        self.assertEqual(params[:2], (7, "+254700000000"))
+        self.assertEqual(json.loads(params[2]), {
+            "telephone": "+254700000000", "item": "Pizza", "amount": 20.0, "order_time": None
+        })
+
+    def test_relay_batch_sends_and_marks_rows(self):
+        """
+        Function to test that claimed rows are sent and marked sent in one transaction.
+        """
+        self.cursor.fetchall.return_value = [
+            outbox_row(1, "+254700000000"), outbox_row(2, "+254700000001")
+        ]
+
+        claimed = self.relay.relay_batch()
+
+        self.assertEqual(claimed, 2)
+        self.cursor.execute.assert_any_call(CLAIM_OUTBOX_SQL, (50,))
+        self.cursor.execute.assert_any_call(MARK_SENT_SQL, ([1, 2],))
+        self.assertEqual([recipients for _, recipients, _ in self.backend.sent],
+                         [["+254700000000"], ["+254700000001"]])
+        self.conn.commit.assert_called_once()
+
+    def test_relay_batch_reschedules_failures(self):
+        """
+        Function to test that a failed send is rescheduled with backoff.
+        """
+        self.backend.failure_rate = 1.0
+        self.cursor.fetchall.return_value = [outbox_row(3, "+254700000000", attempts=2)]
+
+        self.relay.relay_batch()
+
+        self.cursor.execute.assert_any_call(
+            MARK_FAILED_SQL, ("Simulated SMS gateway failure", 5, 8.0, 3)
+        )
+        self.conn.commit.assert_called_once()
+
+    def test_run_once_stops_when_empty(self):
+        """
+        Function to test that run(once=True) returns when nothing is pending.
+        """
+        self.cursor.fetchall.side_effect = [[outbox_row(1, "+254700000000")], []]
+
+        self.relay.run(once=True)
+
+        self.assertEqual(len(self.backend.sent), 1)
+        self.assertEqual(self.conn.commit.call_count, 2)
+
+    def test_database_error_resets_connection(self):
+        """
+        Function to test that a failing batch closes the connection for a fresh one.
+        """
+        self.cursor.execute.side_effect = Exception("connection lost")
+
+        with self.assertRaises(Exception):
+            self.relay.relay_batch()
+
+        self.conn.close.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
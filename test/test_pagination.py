@@ -0,0 +1,116 @@
+"""
+Test file to test the pagination module.
+"""
+
+import unittest
+from datetime import datetime
+from models import CustomerListQuery, OrderListQuery
+from pagination import (
+    PageTokenError,
+    customer_page,
+    customer_page_query,
+    decode_page_token,
+    encode_page_token,
+    order_page,
+    order_page_query,
+)
+
+
+class TestPagination(unittest.TestCase):
+    """
+    Class containing test methods for keyset pagination helpers.
+    """
+
+    def test_token_round_trip(self):
+        """
+        Function to test that tokens decode to the encoded sort key.
+        """
+        when = datetime(2024, 11, 16, 12, 0)
+        token = encode_page_token("order_time", [when, 42])
+
+        self.assertEqual(decode_page_token(token, "order_time"), [when, 42])
+
+    def test_token_sort_mismatch(self):
+        """
+        Function to test that a token cannot be reused with another sort.
+        """
+        token = encode_page_token("order_id", [42])
+
+        with self.assertRaises(PageTokenError):
+            decode_page_token(token, "order_time")
+
+    def test_garbage_token(self):
+        """
+        Function to test that malformed tokens raise PageTokenError.
+        """
+        with self.assertRaises(PageTokenError):
+            decode_page_token("%%%", "order_id")
+
+    def test_customer_query_with_token(self):
+        """
+        Function to test the customer query continues after the token's id.
+        """
+        params = CustomerListQuery(limit=10, page_token=encode_page_token("customer_id", [5]))
+
+        query, args = customer_page_query(params)
+
+        self.assertEqual(
+            query, "SELECT * FROM customers WHERE customer_id > %s ORDER BY customer_id LIMIT %s;"
+        )
+        self.assertEqual(args, [5, 11])
+
+    def test_order_query_filters(self):
+        """
+        Function to test that every order filter becomes a bound condition.
+        """
+        params = OrderListQuery(
+            from_time=datetime(2024, 1, 1), to_time=datetime(2024, 2, 1),
+            min_amount=10, max_amount=100, item_prefix="50%_off",
+        )
+
+        query, args = order_page_query(params)
+
+        self.assertIn(
+            "WHERE order_time >= %s AND order_time < %s AND amount >= %s "
+            "AND amount <= %s AND item LIKE %s", query
+        )
+        self.assertEqual(args[4], "50\\%\\_off%")
+
+    def test_order_time_descending_keyset(self):
+        """
+        Function to test the row comparison used for descending order_time pages.
+        """
+        when = datetime(2024, 11, 16, 12, 0)
+        params = OrderListQuery(
+            sort="order_time", descending=True,
+            page_token=encode_page_token("order_time", [when, 9]),
+        )
+
+        query, args = order_page_query(params)
+
+        self.assertIn("WHERE (order_time, order_id) < (%s, %s)", query)
+        self.assertIn("ORDER BY order_time DESC, order_id DESC", query)
+        self.assertEqual(args, [when, 9, 51])
+
+    def test_page_trims_extra_row(self):
+        """
+        Function to test that the look-ahead row is dropped and yields a token.
+        """
+        rows = [{"customer_id": 1}, {"customer_id": 2}, {"customer_id": 3}]
+
+        page = customer_page(rows, 2)
+
+        self.assertEqual(page["items"], rows[:2])
+        self.assertEqual(decode_page_token(page["next_page_token"], "customer_id"), [2])
+
+    def test_last_page_has_no_token(self):
+        """
+        Function to test that a short page ends the listing.
+        """
+        page = order_page([{"order_id": 1}], OrderListQuery(limit=2))
+
+        self.assertIsNone(page["next_page_token"])
+
+
+if __name__ == "__main__":
+    unittest.main()
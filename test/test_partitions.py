@@ -0,0 +1,142 @@
+"""
+Module for testing the orders partition maintenance.
+"""
+
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+from partitions import (
+    add_months,
+    archive_partitions,
+    ensure_partitions,
+    list_partitions,
+    maintain_partitions,
+    partition_name,
+)
+
+PARTITIONS = [
+    ("orders_p2024_12", "FOR VALUES FROM ('2024-12-01 00:00:00') TO ('2025-01-01 00:00:00')"),
+    ("orders_legacy", "FOR VALUES FROM (MINVALUE) TO ('2024-12-01 00:00:00')"),
+    ("orders_default", "DEFAULT"),
+    ("orders_p2025_01", "FOR VALUES FROM ('2025-01-01 00:00:00') TO ('2025-02-01 00:00:00')"),
+]
+
+NOW = datetime(2024, 12, 15, 9, 30)
+
+
+def mock_cursor(partitions=None):
+    """
+    Build a cursor listing the given orders partitions.
+    """
+    cur = MagicMock()
+    cur.fetchall.return_value = PARTITIONS if partitions is None else partitions
+    return cur
+
+
+def statements(cur):
+    """
+    List the SQL strings a mock cursor executed, after the partition listing.
+    """
+    return [call[0] for call in cur.execute.call_args_list[1:]]
+
+
+class TestPartitions(unittest.TestCase):
+    """
+    Class containing the test functions for the partitions module.
+    """
+
+    def test_month_arithmetic(self):
+        """
+        Function to test month stepping across year boundaries.
+        """
+        self.assertEqual(add_months(datetime(2024, 11, 20), 2), datetime(2025, 1, 1))
+        self.assertEqual(add_months(datetime(2025, 1, 5), -1), datetime(2024, 12, 1))
+        self.assertEqual(partition_name(datetime(2025, 3, 1)), "orders_p2025_03")
+
+    def test_list_partitions(self):
+        """
+        Function to test bound parsing, ordering and that the default partition is skipped.
+        """
+        self.assertEqual(list_partitions(mock_cursor()), [
+            ("orders_legacy", None, datetime(2024, 12, 1)),
+            ("orders_p2024_12", datetime(2024, 12, 1), datetime(2025, 1, 1)),
+            ("orders_p2025_01", datetime(2025, 1, 1), datetime(2025, 2, 1)),
+        ])
+
+    def test_ensure_partitions_creates_missing_months(self):
+        """
+        Function to test that partitions are added after the newest one up to the horizon.
+        """
+        cur = mock_cursor()
+
+        created = ensure_partitions(cur, NOW, months_ahead=3)
+
+        self.assertEqual(created, ["orders_p2025_02", "orders_p2025_03"])
+        self.assertEqual(statements(cur)[0], (
+            'CREATE TABLE IF NOT EXISTS "orders_p2025_02" PARTITION OF orders '
+            "FOR VALUES FROM (%s) TO (%s);",
+            (datetime(2025, 2, 1), datetime(2025, 3, 1)),
+        ))
+
+    def test_ensure_partitions_up_to_date(self):
+        """
+        Function to test that nothing is created when the horizon is covered.
+        """
+        cur = mock_cursor()
+
+        self.assertEqual(ensure_partitions(cur, NOW, months_ahead=1), [])
+        self.assertEqual(statements(cur), [])
+
+    def test_archive_partitions(self):
+        """
+        Function to test that partitions past retention are detached and archived.
+        """
+        cur = mock_cursor()
+
+        detached = archive_partitions(cur, datetime(2025, 2, 10), retention_months=2, archive_schema="archive")
+
+        self.assertEqual(detached, ["orders_legacy"])
+        self.assertEqual([s[0] for s in statements(cur)], [
+            'CREATE SCHEMA IF NOT EXISTS "archive";',
+            'ALTER TABLE orders DETACH PARTITION "orders_legacy";',
+            'ALTER TABLE "orders_legacy" SET SCHEMA "archive";',
+        ])
+
+    def test_archive_partitions_drop(self):
+        """
+        Function to test that partitions are dropped without an archive schema.
+        """
+        cur = mock_cursor()
+
+        archive_partitions(cur, datetime(2025, 2, 10), retention_months=1, archive_schema="")
+
+        executed = [s[0] for s in statements(cur)]
+        self.assertIn('DROP TABLE "orders_p2024_12";', executed)
+        self.assertNotIn('DROP TABLE "orders_p2025_01";', executed)
+
+    def test_retention_disabled(self):
+        """
+        Function to test that a retention of 0 keeps every partition.
+        """
+        cur = mock_cursor()
+
+        self.assertEqual(archive_partitions(cur, NOW, retention_months=0), [])
+        cur.execute.assert_not_called()
+
+    def test_maintain_partitions_autocommit(self):
+        """
+        Function to test that a maintenance pass runs in autocommit and closes its connection.
+        """
+        conn = MagicMock()
+        conn.cursor.return_value.__enter__.return_value.fetchall.return_value = PARTITIONS
+
+        created, detached = maintain_partitions(lambda: conn, NOW)
+
+        self.assertTrue(conn.autocommit)
+        self.assertTrue(created)
+        self.assertEqual(detached, [])
+        conn.close.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
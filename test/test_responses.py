@@ -0,0 +1,47 @@
+"""
+Module to test the typed JSON response of the list endpoints.
+"""
+
+import json
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from models import CustomerPage, OrderPage
+from responses import TypedJSONResponse, type_adapter
+
+ORDER = {
+    "order_id": 1, "customer_id": 7, "telephone": "1234567890", "item": "Pizza",
+    "amount": Decimal("20.50"), "order_time": datetime(2024, 11, 16, 12, 30),
+}
+
+
+class TestTypedJSONResponse(unittest.TestCase):
+    """
+    Test that TypedJSONResponse renders what the default encoder would.
+    """
+
+    def test_order_page_matches_default_encoding(self):
+        page = {"items": [ORDER], "next_page_token": "abc"}
+        response = TypedJSONResponse(page, OrderPage)
+        self.assertEqual(json.loads(response.body), jsonable_encoder(page))
+        self.assertEqual(json.loads(response.body)["items"][0]["amount"], 20.5)
+
+    def test_customer_page_allows_null_location(self):
+        customer = {"customer_id": 1, "customer_code": "C1", "name": "Jane", "telephone": "1", "location": None}
+        response = TypedJSONResponse({"items": [customer], "next_page_token": None}, CustomerPage)
+        self.assertEqual(json.loads(response.body), {"items": [customer], "next_page_token": None})
+        self.assertEqual(response.headers["content-type"], "application/json")
+
+    def test_status_code_and_headers(self):
+        response = TypedJSONResponse({"items": [], "next_page_token": None}, OrderPage,
+                                     status_code=201, headers={"X-Test": "1"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.headers["x-test"], "1")
+
+    def test_type_adapter_is_cached(self):
+        self.assertIs(type_adapter(OrderPage), type_adapter(OrderPage))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,9 +2,11 @@
 Test file to test the send_sms module.
 """
 
+import threading
 import unittest
 from unittest.mock import patch
-from send_sms import SendSMS
+import httpx
+from send_sms import BatchingSender, FakeSMSBackend, GatewaySMSBackend, SendSMS
 
 
 class TestSendSMS(unittest.TestCase):
@@ -78,5 +80,161 @@ class TestSendSMS(unittest.TestCase):
 
         print("Test passed: SMS sending failed as expected due to network error")
 
+    def test_send_order_with_fake_backend(self):
+        """
+        Function to test send_order against the offline fake backend.
+        """
+        backend = FakeSMSBackend()
+        sms_service = SendSMS(backend=backend)
+
+        response = sms_service.send_order("+254759505343", "Pizza Margherita", 10.99, "2024-11-14 13:45")
+
+        self.assertEqual(len(backend.sent), 1)
+        message, recipients, sender = backend.sent[0]
+        self.assertIn("Item: Pizza Margherita", message)
+        self.assertEqual(recipients, ["+254759505343"])
+        self.assertEqual(sender, "KBenedict")
+        self.assertEqual(
+            response["SMSMessageData"]["Recipients"][0]["status"], "Success"
+        )
+
+    def test_send_order_raises_on_failure(self):
+        """
+        Function to test that send_order propagates gateway errors for retrying.
+        """
+        sms_service = SendSMS(backend=FakeSMSBackend(failure_rate=1.0))
+
+        with self.assertRaises(ConnectionError):
+            sms_service.send_order("+254759505343", "Pizza Margherita", 10.99, "2024-11-14 13:45")
+
+    def test_gateway_backend_request(self):
+        """
+        Function to test the gateway request sent through the shared HTTP client.
+        """
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(201, json={"SMSMessageData": {"Recipients": []}})
+
+        client = httpx.Client(transport=httpx.MockTransport(handler))
+        backend = GatewaySMSBackend("sandbox", "key", "https://gateway.test/messaging", client)
+
+        response = backend.send("Hello", ["+254700000001", "+254700000002"], "KBenedict")
+
+        self.assertEqual(response, {"SMSMessageData": {"Recipients": []}})
+        request = requests[0]
+        self.assertEqual(request.headers["apiKey"], "key")
+        self.assertEqual(
+            dict(httpx.QueryParams(request.content.decode())),
+            {"username": "sandbox", "to": "+254700000001,+254700000002", "message": "Hello",
+             "bulkSMSMode": "1", "from": "KBenedict"},
+        )
+
+    def test_gateway_backend_raises_on_error_status(self):
+        """
+        Function to test that gateway error responses raise for the dispatcher to retry.
+        """
+        client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(401, text="bad key")))
+        backend = GatewaySMSBackend("sandbox", "key", "https://gateway.test/messaging", client)
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            backend.send("Hello", ["+254700000001"])
+
+
+class TestBatchingSender(unittest.TestCase):
+    """
+    Class containing test methods for the BatchingSender class.
+    """
+
+    def test_identical_messages_share_one_call(self):
+        """
+        Function to test that identical bodies are coalesced up to the batch size.
+        """
+        backend = FakeSMSBackend()
+        sender = BatchingSender(backend, max_batch_size=3, max_delay=10)
+        futures = [sender.submit("Sale today", f"+25470000000{i}") for i in range(3)]
+
+        statuses = [future.result(timeout=1) for future in futures]
+
+        self.assertEqual(backend.calls, 1)
+        self.assertEqual(backend.sent[0][1], ["+254700000000", "+254700000001", "+254700000002"])
+        self.assertEqual([status["status"] for status in statuses], ["Success"] * 3)
+        sender.close()
+
+    def test_deadline_flushes_partial_batch(self):
+        """
+        Function to test that a partial batch is sent once its deadline passes.
+        """
+        backend = FakeSMSBackend()
+        sender = BatchingSender(backend, max_batch_size=100, max_delay=0.02)
+
+        status = sender.submit("Hello", "+254700000000").result(timeout=1)
+
+        self.assertEqual(status["number"], "+254700000000")
+        self.assertEqual(backend.calls, 1)
+        sender.close()
+
+    def test_different_bodies_are_sent_separately(self):
+        """
+        Function to test that different bodies never share a gateway call.
+        """
+        backend = FakeSMSBackend()
+        sender = BatchingSender(backend, max_batch_size=100, max_delay=10)
+        sender.submit("A", "+254700000000")
+        sender.submit("B", "+254700000001")
+        sender.close()
+
+        self.assertEqual(sorted(message for message, _, _ in backend.sent), ["A", "B"])
+
+    def test_per_recipient_status(self):
+        """
+        Function to test that rejected recipients get their own failed status.
+        """
+        backend = FakeSMSBackend(rejected_numbers={"+254700000001"})
+        sender = BatchingSender(backend, max_batch_size=2, max_delay=10)
+        ok = sender.submit("Hi", "+254700000000")
+        bad = sender.submit("Hi", "+254700000001")
+
+        self.assertEqual(ok.result(timeout=1)["statusCode"], 101)
+        self.assertEqual(bad.result(timeout=1)["status"], "InvalidPhoneNumber")
+        stats = sender.stats()
+        self.assertEqual((stats["delivered"], stats["rejected"], stats["batches"]), (1, 1, 1))
+        sender.close()
+
+    def test_gateway_error_fails_every_future(self):
+        """
+        Function to test that a failed call propagates to every waiting recipient.
+        """
+        sender = BatchingSender(FakeSMSBackend(failure_rate=1.0), max_batch_size=2, max_delay=10)
+        futures = [sender.submit("Hi", "+254700000000"), sender.submit("Hi", "+254700000001")]
+
+        for future in futures:
+            with self.assertRaises(ConnectionError):
+                future.result(timeout=1)
+        sender.close()
+
+    def test_send_order_from_concurrent_workers(self):
+        """
+        Function to test that concurrent send_order calls with the same body coalesce.
+        """
+        backend = FakeSMSBackend()
+        sender = BatchingSender(backend, max_batch_size=10, max_delay=0.05)
+        threads = [
+            threading.Thread(
+                target=sender.send_order,
+                args=(f"+25470000000{i}", "Pizza", 10.0, "2024-11-14 13:45"),
+            )
+            for i in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(backend.calls, 1)
+        self.assertEqual(sender.stats()["delivered"], 10)
+        sender.close()
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,50 @@
+"""
+Module to test the multi-worker server entry point.
+"""
+
+import sys
+import unittest
+from unittest.mock import patch
+import server
+
+
+class TestServer(unittest.TestCase):
+    """
+    Class containing test cases for server.py.
+    """
+
+    def test_uvicorn_options(self):
+        """
+        The workers, address and tuning settings are passed to uvicorn.
+        """
+        options = server.uvicorn_options(workers=3, host="127.0.0.1", port=9000)
+        self.assertEqual(options["workers"], 3)
+        self.assertEqual((options["host"], options["port"]), ("127.0.0.1", 9000))
+        self.assertEqual(options["backlog"], server.SERVER_BACKLOG)
+        self.assertEqual(options["timeout_graceful_shutdown"], server.SERVER_GRACEFUL_TIMEOUT)
+
+    @patch("server.os.chdir")
+    @patch("server.uvicorn.run")
+    def test_main_runs_import_string(self, mock_run, _mock_chdir):
+        """
+        The application is passed as an import string so each worker imports it.
+        """
+        with patch.object(sys, "argv", ["server.py", "--workers", "2", "--port", "9001"]), \
+                patch("builtins.print"):
+            server.main()
+        args, kwargs = mock_run.call_args
+        self.assertEqual(args, ("main:app",))
+        self.assertEqual(kwargs["workers"], 2)
+        self.assertEqual(kwargs["port"], 9001)
+
+    def test_rejects_zero_workers(self):
+        """
+        At least one worker is required.
+        """
+        with patch.object(sys, "argv", ["server.py", "--workers", "0"]), \
+                patch("sys.stderr"), self.assertRaises(SystemExit):
+            server.main()
+
+
+if __name__ == "__main__":
+    unittest.main()
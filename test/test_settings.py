@@ -0,0 +1,49 @@
+"""
+Module to test the typed environment reads of settings.py.
+"""
+
+import os
+import unittest
+from unittest.mock import patch
+from settings import env
+
+
+class TestEnvironment(unittest.TestCase):
+    """
+    Class containing test cases for settings.Environment.
+    """
+
+    def test_defaults_when_unset(self):
+        """
+        Unset variables return the default.
+        """
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(env.str("NAME", "x"), "x")
+            self.assertEqual(env.int("SIZE", 4), 4)
+            self.assertEqual(env.float("DELAY", 0.5), 0.5)
+            self.assertTrue(env.bool("ENABLED", True))
+            self.assertIsNone(env.str("NAME"))
+
+    def test_typed_values(self):
+        """
+        Set variables are converted to the requested type.
+        """
+        values = {"NAME": "sync", "SIZE": "12", "DELAY": "0.25", "ON": "Yes", "OFF": "0"}
+        with patch.dict(os.environ, values, clear=True):
+            self.assertEqual(env.str("NAME"), "sync")
+            self.assertEqual(env.int("SIZE", 4), 12)
+            self.assertEqual(env.float("DELAY"), 0.25)
+            self.assertTrue(env.bool("ON"))
+            self.assertFalse(env.bool("OFF", True))
+
+    def test_invalid_number(self):
+        """
+        A malformed number fails loudly instead of falling back to the default.
+        """
+        with patch.dict(os.environ, {"SIZE": "many"}):
+            with self.assertRaises(ValueError):
+                env.int("SIZE", 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
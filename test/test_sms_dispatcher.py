@@ -0,0 +1,177 @@
+"""
+Test file to test the sms_dispatcher module.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from send_sms import FakeSMSBackend, SendSMS
+from sms_dispatcher import SMSDispatcher, SMSJob
+
+
+class FlakySMS:
+    """
+    SendSMS stand-in that fails a fixed number of times before succeeding.
+    """
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def send_order(self, *_args):
+        """
+        Fail the first `failures` calls.
+        """
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("gateway down")
+
+
+class TestSMSDispatcher(unittest.TestCase):
+    """
+    Class containing test methods for the SMSDispatcher class.
+    """
+
+    def setUp(self):
+        self.backend = FakeSMSBackend()
+        self.sms_service = SendSMS(backend=self.backend)
+
+    def wait_for(self, predicate, timeout=2.0):
+        """
+        Poll until predicate() is true or the timeout expires.
+        """
+        deadline = time.monotonic() + timeout
+        while not predicate() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return predicate()
+
+    def test_jobs_are_sent_in_background(self):
+        """
+        Function to test that queued jobs are delivered through the backend.
+        """
+        dispatcher = SMSDispatcher(self.sms_service, workers=2)
+        dispatcher.start()
+        for index in range(20):
+            self.assertTrue(dispatcher.enqueue(SMSJob(f"+2547000000{index:02d}", "Pizza", 10.0)))
+        dispatcher.stop(timeout=2)
+        self.assertEqual(len(self.backend.sent), 20)
+        self.assertEqual(dispatcher.stats()["sent"], 20)
+
+    def test_enqueue_does_not_wait_for_gateway(self):
+        """
+        Function to test that enqueue returns while the gateway is still slow.
+        """
+        self.backend.latency = 0.2
+        dispatcher = SMSDispatcher(self.sms_service, workers=1)
+        dispatcher.start()
+        started = time.monotonic()
+        dispatcher.enqueue(SMSJob("+254700000000", "Pizza", 10.0))
+        self.assertLess(time.monotonic() - started, 0.1)
+        dispatcher.stop(timeout=2)
+        self.assertEqual(len(self.backend.sent), 1)
+
+    def test_failed_send_is_retried(self):
+        """
+        Function to test that failed sends are retried with backoff.
+        """
+        flaky = FlakySMS(failures=2)
+        dispatcher = SMSDispatcher(flaky, workers=1, max_retries=3, backoff_base=0.01)
+        dispatcher.start()
+        dispatcher.enqueue(SMSJob("+254700000000", "Pizza", 10.0))
+        self.assertTrue(self.wait_for(lambda: dispatcher.stats()["sent"] == 1))
+        dispatcher.stop()
+        self.assertEqual(flaky.calls, 3)
+        self.assertEqual(dispatcher.stats()["retried"], 2)
+
+    def test_gives_up_after_max_retries(self):
+        """
+        Function to test that a job is marked failed once retries run out.
+        """
+        flaky = FlakySMS(failures=10)
+        dispatcher = SMSDispatcher(flaky, workers=1, max_retries=1, backoff_base=0.01)
+        dispatcher.start()
+        dispatcher.enqueue(SMSJob("+254700000000", "Pizza", 10.0))
+        self.assertTrue(self.wait_for(lambda: dispatcher.stats()["failed"] == 1))
+        dispatcher.stop()
+        self.assertEqual(flaky.calls, 2)
+
+    def test_drop_policy_when_full(self):
+        """
+        Function to test that the drop policy rejects jobs once the queue is full.
+        """
+        dispatcher = SMSDispatcher(self.sms_service, max_queue_size=1, policy="drop")
+        self.assertTrue(dispatcher.enqueue(SMSJob("+254700000000", "Pizza", 10.0)))
+        self.assertFalse(dispatcher.enqueue(SMSJob("+254700000001", "Pizza", 10.0)))
+        self.assertEqual(dispatcher.stats()["dropped"], 1)
+
+    def test_spill_policy_reloads_jobs(self):
+        """
+        Function to test that spilled jobs are written to disk and sent later.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            spill_path = os.path.join(tmp, "spill.jsonl")
+            dispatcher = SMSDispatcher(
+                self.sms_service, workers=1, max_queue_size=1, policy="spill", spill_path=spill_path
+            )
+            for index in range(3):
+                self.assertTrue(dispatcher.enqueue(SMSJob(f"+25470000000{index}", "Pizza", 10.0)))
+            self.assertEqual(dispatcher.stats()["spilled"], 2)
+            self.assertTrue(os.path.exists(spill_path))
+
+            dispatcher.start()
+            self.assertTrue(self.wait_for(lambda: len(self.backend.sent) == 3))
+            dispatcher.stop()
+            self.assertFalse(os.path.exists(spill_path))
+
+    def test_enqueue_many_spills_overflow_once(self):
+        """
+        Function to test that a bulk enqueue spills everything that does not fit in one write.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            spill_path = os.path.join(tmp, "spill.jsonl")
+            dispatcher = SMSDispatcher(
+                self.sms_service, max_queue_size=2, policy="spill", spill_path=spill_path
+            )
+            jobs = [SMSJob(f"+25470000000{index}", "Pizza", 10.0) for index in range(5)]
+
+            self.assertEqual(dispatcher.enqueue_many(jobs), 5)
+            stats = dispatcher.stats()
+            self.assertEqual((stats["enqueued"], stats["spilled"]), (2, 3))
+            with open(spill_path, encoding="utf-8") as spill_file:
+                self.assertEqual(len(spill_file.readlines()), 3)
+
+    def test_block_policy_waits_for_room(self):
+        """
+        Function to test that the block policy waits for a worker to free a slot.
+        """
+        self.backend.latency = 0.05
+        dispatcher = SMSDispatcher(
+            self.sms_service, workers=1, max_queue_size=1, policy="block", block_timeout=2
+        )
+        dispatcher.start()
+        results = [dispatcher.enqueue(SMSJob(f"+25470000000{i}", "Pizza", 10.0)) for i in range(4)]
+        dispatcher.stop(timeout=2)
+        self.assertEqual(results, [True] * 4)
+        self.assertEqual(len(self.backend.sent), 4)
+
+    def test_fake_backend_throughput(self):
+        """
+        Function to test that many workers overlap slow gateway calls.
+        """
+        self.backend.latency = 0.02
+        dispatcher = SMSDispatcher(self.sms_service, workers=10)
+        dispatcher.start()
+        started = time.monotonic()
+        for index in range(50):
+            dispatcher.enqueue(SMSJob(f"+2547000000{index:02d}", "Pizza", 10.0))
+        dispatcher.stop(timeout=5)
+        elapsed = time.monotonic() - started
+        self.assertEqual(len(self.backend.sent), 50)
+        # 50 sequential sends would take at least 1s
+        self.assertLess(elapsed, 0.5)
+        self.assertFalse(any(t.name.startswith("sms-worker") for t in threading.enumerate()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Module for testing the order statistics queries.
+"""
+
+import unittest
+from datetime import date
+from decimal import Decimal
+from models import CustomerListQuery, DailyRevenueQuery
+from pagination import encode_page_token
+from stats import customer_stats_page_query, daily_revenue_page, daily_revenue_range
+
+
+class TestStats(unittest.TestCase):
+    """
+    Class containing the test functions for the stats module.
+    """
+
+    def test_customer_stats_page_query(self):
+        """
+        Function to test that the statistics page continues after the page token.
+        """
+        token = encode_page_token("customer_id", [7])
+
+        query, args = customer_stats_page_query(CustomerListQuery(limit=10, page_token=token))
+
+        self.assertIn("LEFT JOIN customer_order_stats", query)
+        self.assertTrue(query.endswith("WHERE c.customer_id > %s ORDER BY c.customer_id LIMIT %s;"))
+        self.assertEqual(args, [7, 11])
+
+    def test_daily_revenue_default_range(self):
+        """
+        Function to test that the range defaults to the last 30 days including today.
+        """
+        self.assertEqual(
+            daily_revenue_range(DailyRevenueQuery(), today=date(2024, 11, 30)),
+            (date(2024, 11, 1), date(2024, 12, 1)),
+        )
+        self.assertEqual(
+            daily_revenue_range(DailyRevenueQuery(from_date=date(2024, 1, 1), to_date=date(2024, 2, 1))),
+            (date(2024, 1, 1), date(2024, 2, 1)),
+        )
+
+    def test_daily_revenue_page_totals(self):
+        """
+        Function to test that the range totals add up the days.
+        """
+        rows = [
+            {"day": date(2024, 11, 1), "order_count": 2, "revenue": Decimal("30.00")},
+            {"day": date(2024, 11, 2), "order_count": 1, "revenue": Decimal("12.50")},
+        ]
+
+        page = daily_revenue_page(rows, date(2024, 11, 1), date(2024, 11, 3))
+
+        self.assertEqual(page["order_count"], 3)
+        self.assertEqual(page["revenue"], Decimal("42.50"))
+        self.assertEqual(page["items"], rows)
+
+
+if __name__ == "__main__":
+    unittest.main()